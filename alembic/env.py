@@ -11,7 +11,7 @@ sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 load_dotenv()
 
 from app.database import Base
-from app.models import User, Author, BookV1, BookV2, IdempotencyKey, RateLimit
+from app.models import User, Author, BookV1, BookV2, IdempotencyKey, RateLimit, ChangeLog, Job
 
 config = context.config
 
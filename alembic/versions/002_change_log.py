@@ -0,0 +1,40 @@
+"""Change log for delta sync
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '002'
+down_revision: Union[str, None] = '001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.create_table(
+        'change_log',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('entity_type', sa.String(length=20), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('operation', sa.String(length=10), nullable=False),
+        sa.Column('changed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_change_log_id'), 'change_log', ['id'], unique=False)
+    op.create_index(op.f('ix_change_log_changed_at'), 'change_log', ['changed_at'], unique=False)
+
+    op.create_index(op.f('ix_books_v2_created_at'), 'books_v2', ['created_at'], unique=False)
+    op.create_index(op.f('ix_books_v2_updated_at'), 'books_v2', ['updated_at'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_books_v2_updated_at'), table_name='books_v2')
+    op.drop_index(op.f('ix_books_v2_created_at'), table_name='books_v2')
+
+    op.drop_index(op.f('ix_change_log_changed_at'), table_name='change_log')
+    op.drop_index(op.f('ix_change_log_id'), table_name='change_log')
+    op.drop_table('change_log')
\ No newline at end of file
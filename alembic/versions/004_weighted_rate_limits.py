@@ -0,0 +1,34 @@
+"""Cost-weighted rate limits
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '004'
+down_revision: Union[str, None] = '003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.add_column('rate_limits', sa.Column('cost', sa.Integer(), nullable=False, server_default='1'))
+    op.alter_column(
+        'rate_limits', 'client_ip',
+        existing_type=sa.String(length=50),
+        type_=sa.String(length=100),
+        existing_nullable=False
+    )
+
+def downgrade() -> None:
+    op.alter_column(
+        'rate_limits', 'client_ip',
+        existing_type=sa.String(length=100),
+        type_=sa.String(length=50),
+        existing_nullable=False
+    )
+    op.drop_column('rate_limits', 'cost')
\ No newline at end of file
@@ -0,0 +1,37 @@
+"""Denormalized author book counts
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '005'
+down_revision: Union[str, None] = '004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.add_column('authors', sa.Column('books_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('authors', sa.Column('latest_book_year', sa.Integer(), nullable=True))
+
+    op.create_index('ix_books_v2_author_id_id', 'books_v2', ['author_id', 'id'], unique=False)
+
+    # Заполнение счетчиков по существующим книгам
+    op.execute(
+        "UPDATE authors SET "
+        "books_count = (SELECT COUNT(*) FROM books_v2 WHERE books_v2.author_id = authors.id), "
+        "latest_book_year = (SELECT MAX(year) FROM books_v2 WHERE books_v2.author_id = authors.id)"
+    )
+
+    op.create_index('ix_authors_books_count_id', 'authors', ['books_count', 'id'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index('ix_authors_books_count_id', table_name='authors')
+    op.drop_index('ix_books_v2_author_id_id', table_name='books_v2')
+    op.drop_column('authors', 'latest_book_year')
+    op.drop_column('authors', 'books_count')
\ No newline at end of file
@@ -0,0 +1,63 @@
+"""Tenant dimension for catalog tables
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '006'
+down_revision: Union[str, None] = '005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TENANT_TABLES = ('users', 'authors', 'books_v1', 'books_v2', 'change_log')
+
+def upgrade() -> None:
+    # Существующие записи относятся к арендатору по умолчанию
+    for table in TENANT_TABLES:
+        op.add_column(table, sa.Column('tenant_id', sa.String(length=50), nullable=False, server_default='default'))
+
+    # Индексы с ведущим tenant_id: выборки арендатора не читают чужие строки
+    op.create_index('ix_authors_tenant_id_id', 'authors', ['tenant_id', 'id'], unique=False)
+    op.drop_index('ix_authors_books_count_id', table_name='authors')
+    op.create_index('ix_authors_tenant_books_count_id', 'authors', ['tenant_id', 'books_count', 'id'], unique=False)
+
+    # ISBN уникален в пределах арендатора
+    op.drop_index(op.f('ix_books_v1_isbn'), table_name='books_v1')
+    op.create_index('ix_books_v1_tenant_isbn', 'books_v1', ['tenant_id', 'isbn'], unique=True)
+    op.create_index('ix_books_v1_tenant_id_id', 'books_v1', ['tenant_id', 'id'], unique=False)
+
+    op.drop_index(op.f('ix_books_v2_isbn'), table_name='books_v2')
+    op.create_index('ix_books_v2_tenant_isbn', 'books_v2', ['tenant_id', 'isbn'], unique=True)
+    op.create_index('ix_books_v2_tenant_id_id', 'books_v2', ['tenant_id', 'id'], unique=False)
+    op.create_index('ix_books_v2_tenant_genre_year', 'books_v2', ['tenant_id', 'genre', 'year'], unique=False)
+    op.drop_index('ix_books_v2_author_id_id', table_name='books_v2')
+    op.create_index('ix_books_v2_tenant_author_id_id', 'books_v2', ['tenant_id', 'author_id', 'id'], unique=False)
+
+    op.create_index('ix_change_log_tenant_id_id', 'change_log', ['tenant_id', 'id'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index('ix_change_log_tenant_id_id', table_name='change_log')
+
+    op.drop_index('ix_books_v2_tenant_author_id_id', table_name='books_v2')
+    op.create_index('ix_books_v2_author_id_id', 'books_v2', ['author_id', 'id'], unique=False)
+    op.drop_index('ix_books_v2_tenant_genre_year', table_name='books_v2')
+    op.drop_index('ix_books_v2_tenant_id_id', table_name='books_v2')
+    op.drop_index('ix_books_v2_tenant_isbn', table_name='books_v2')
+    op.create_index(op.f('ix_books_v2_isbn'), 'books_v2', ['isbn'], unique=True)
+
+    op.drop_index('ix_books_v1_tenant_id_id', table_name='books_v1')
+    op.drop_index('ix_books_v1_tenant_isbn', table_name='books_v1')
+    op.create_index(op.f('ix_books_v1_isbn'), 'books_v1', ['isbn'], unique=True)
+
+    op.drop_index('ix_authors_tenant_books_count_id', table_name='authors')
+    op.create_index('ix_authors_books_count_id', 'authors', ['books_count', 'id'], unique=False)
+    op.drop_index('ix_authors_tenant_id_id', table_name='authors')
+
+    for table in reversed(TENANT_TABLES):
+        op.drop_column(table, 'tenant_id')
\ No newline at end of file
@@ -0,0 +1,33 @@
+"""books_v1 as a projection of books_v2
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '007'
+down_revision: Union[str, None] = '006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    # Строки books_v1 переносятся в books_v2 заданием backfill_books_v1
+    # (POST /internal/migrations/books-v1), таблица books_v1 остается до
+    # переключения BOOKS_V1_PROJECTION
+    op.add_column('books_v2', sa.Column('v1_id', sa.Integer(), nullable=True))
+    op.create_index('ix_books_v2_v1_id', 'books_v2', ['v1_id'], unique=True)
+    op.create_index('ix_books_v2_tenant_v1_id', 'books_v2', ['tenant_id', 'v1_id'], unique=False)
+
+    # Поиск автора V2 по имени из V1
+    op.create_index('ix_authors_tenant_name', 'authors', ['tenant_id', 'name'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index('ix_authors_tenant_name', table_name='authors')
+    op.drop_index('ix_books_v2_tenant_v1_id', table_name='books_v2')
+    op.drop_index('ix_books_v2_v1_id', table_name='books_v2')
+    op.drop_column('books_v2', 'v1_id')
\ No newline at end of file
@@ -0,0 +1,121 @@
+"""
+Адаптивный лимит параллельных запросов (AIMD по задержке).
+
+Лимит растет на 1/limit за каждый успешно завершенный запрос (если
+занята хотя бы половина лимита), пока кратковременная средняя задержка
+не превышает долговременную более чем в CONCURRENCY_LATENCY_TOLERANCE раз. При превышении или ответе 5xx лимит
+умножается на CONCURRENCY_BACKOFF (не чаще раза за текущую задержку).
+
+Запросы сверх лимита не ждут в очереди, а сразу получают 503. Классы
+приоритета различаются долей лимита, которую они могут занять: служебный
+трафик допускается до полного лимита, обычный - до
+CONCURRENCY_NORMAL_SHARE, тяжелые запросы - до CONCURRENCY_LOW_SHARE.
+
+Ограничитель используется только из цикла событий, блокировки не нужны.
+"""
+import math
+import os
+import time
+from app.metrics import metrics
+from app.params import query_flag
+
+CONCURRENCY_LIMIT_ENABLED = os.getenv("CONCURRENCY_LIMIT_ENABLED", "true").lower() == "true"
+CONCURRENCY_INITIAL_LIMIT = float(os.getenv("CONCURRENCY_INITIAL_LIMIT", "20"))
+CONCURRENCY_MIN_LIMIT = float(os.getenv("CONCURRENCY_MIN_LIMIT", "4"))
+CONCURRENCY_MAX_LIMIT = float(os.getenv("CONCURRENCY_MAX_LIMIT", "200"))
+CONCURRENCY_LATENCY_TOLERANCE = float(os.getenv("CONCURRENCY_LATENCY_TOLERANCE", "2.0"))
+CONCURRENCY_BACKOFF = float(os.getenv("CONCURRENCY_BACKOFF", "0.9"))
+CONCURRENCY_NORMAL_SHARE = float(os.getenv("CONCURRENCY_NORMAL_SHARE", "0.8"))
+CONCURRENCY_LOW_SHARE = float(os.getenv("CONCURRENCY_LOW_SHARE", "0.5"))
+
+CRITICAL = "critical"
+NORMAL = "normal"
+LOW = "low"
+
+# Пути служебного трафика и тяжелых запросов (полный путь, с префиксом монтирования)
+CRITICAL_PATHS = ("/health", "/internal/")
+LOW_PATHS = ("/internal/statistics",)
+
+_SHORT_SMOOTHING = 0.2
+_LONG_SMOOTHING = 0.01
+
+
+def classify(path: str, query_string: bytes) -> str:
+    """Класс приоритета запроса по пути и параметрам"""
+    if path.startswith(LOW_PATHS) or query_flag(query_string, "include_author"):
+        return LOW
+    if path == "/" or path.startswith(CRITICAL_PATHS):
+        return CRITICAL
+    return NORMAL
+
+
+class AdaptiveLimiter:
+    """Лимит параллельности, подстраиваемый по наблюдаемой задержке"""
+
+    def __init__(
+        self,
+        initial: float,
+        min_limit: float,
+        max_limit: float,
+        tolerance: float,
+        backoff: float,
+        enabled: bool = True
+    ):
+        self.limit = initial
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.enabled = enabled
+        self.shares = {CRITICAL: 1.0, NORMAL: CONCURRENCY_NORMAL_SHARE, LOW: CONCURRENCY_LOW_SHARE}
+        self.inflight = 0
+        self.short_latency = None
+        self.long_latency = None
+        self._last_decrease = 0.0
+        metrics.set_gauge("concurrency_limit", self.limit)
+
+    def try_acquire(self, priority: str) -> bool:
+        """Занять слот; False - запрос нужно отклонить"""
+        if self.enabled and self.inflight >= max(1.0, self.limit * self.shares[priority]):
+            metrics.inc("concurrency_rejected_total", priority=priority)
+            return False
+        self.inflight += 1
+        metrics.set_gauge("concurrency_inflight", self.inflight)
+        return True
+
+    def release(self, latency: float, failed: bool):
+        """Освободить слот и скорректировать лимит по задержке запроса"""
+        self.inflight -= 1
+        metrics.set_gauge("concurrency_inflight", self.inflight)
+
+        if self.short_latency is None:
+            self.short_latency = self.long_latency = latency
+        else:
+            self.short_latency += _SHORT_SMOOTHING * (latency - self.short_latency)
+            self.long_latency += _LONG_SMOOTHING * (latency - self.long_latency)
+
+        now = time.monotonic()
+        overloaded = failed or self.short_latency > self.long_latency * self.tolerance
+        if overloaded:
+            if now - self._last_decrease >= self.short_latency:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._last_decrease = now
+                metrics.inc("concurrency_limit_decreases_total")
+        elif self.inflight + 1 >= self.limit / 2:
+            # рост только при заметной загрузке: без нее задержка не проверяет лимит
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+        metrics.set_gauge("concurrency_limit", round(self.limit, 2))
+
+    def retry_after(self) -> int:
+        """Рекомендуемая пауза перед повтором, секунды"""
+        return max(1, math.ceil(self.short_latency or 0))
+
+
+limiter = AdaptiveLimiter(
+    CONCURRENCY_INITIAL_LIMIT,
+    CONCURRENCY_MIN_LIMIT,
+    CONCURRENCY_MAX_LIMIT,
+    CONCURRENCY_LATENCY_TOLERANCE,
+    CONCURRENCY_BACKOFF,
+    enabled=CONCURRENCY_LIMIT_ENABLED
+)
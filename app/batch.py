@@ -0,0 +1,145 @@
+"""
+Пакетное выполнение запросов API (POST /api/v2/batch).
+
+Подзапросы выполняются в процессе: каждый передается маршрутизатору
+приложения как ASGI-вызов, минуя внешние слои (профилирование, квоты,
+ограничитель параллельности, сжатие) - их один раз проходит сам пакет.
+Проверенный при входе пакета пользователь и сессия БД передаются
+подзапросам в scope (BATCH_USER, BATCH_SESSION), поэтому verify_token
+не декодирует JWT повторно, а get_db не открывает новую сессию.
+
+Операции выполняются по порядку в одной сессии пакета: обработчики
+обращаются к БД синхронно в цикле событий, поэтому параллельный запуск
+подзапросов не дал бы перекрытия, а лишь занял бы дополнительные
+соединения пула. Чтение после записи видит ее результат.
+"""
+import json
+import logging
+import os
+from typing import List, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.database import BATCH_SESSION
+from app.metrics import metrics
+
+BATCH_MAX_OPERATIONS = int(os.getenv("BATCH_MAX_OPERATIONS", "20"))
+
+BATCH_PATH = "/api/v2/batch"
+BATCH_USER = "batch.user"
+
+ALLOWED_PREFIXES = ("/api/v1/", "/api/v2/")
+# потоковые ответы (SSE, файлы) не завершаются в пределах пакета
+DENIED_SUFFIXES = ("/events", "/file")
+# заголовки подзапроса, которые можно передать из операции
+FORWARDED_HEADERS = ("idempotency-key",)
+
+logger = logging.getLogger("app.batch")
+
+
+def split_path(path: str) -> Tuple[str, bytes]:
+    """Путь и query string операции"""
+    path, _, query = path.partition("?")
+    return path, query.encode("latin-1")
+
+
+def path_allowed(path: str) -> bool:
+    path, _ = split_path(path)
+    return (
+        path.startswith(ALLOWED_PREFIXES)
+        and not path.startswith(BATCH_PATH)
+        and not path.endswith(DENIED_SUFFIXES)
+    )
+
+
+def sub_scope(parent: dict, operation, user, session: Session) -> dict:
+    """ASGI scope подзапроса: адрес клиента и авторизация - из запроса пакета"""
+    path, query_string = split_path(operation.path)
+    headers = [
+        (name, value) for name, value in parent["headers"]
+        if name in (b"authorization", b"host", b"user-agent")
+    ]
+    headers.append((b"content-type", b"application/json"))
+    for name, value in operation.headers.items():
+        if name.lower() in FORWARDED_HEADERS:
+            headers.append((name.lower().encode("latin-1"), value.encode("latin-1")))
+    return {
+        "type": "http",
+        "asgi": parent.get("asgi", {"version": "3.0"}),
+        "http_version": parent.get("http_version", "1.1"),
+        "method": operation.method,
+        "scheme": parent.get("scheme", "http"),
+        "server": parent.get("server"),
+        "client": parent.get("client"),
+        "root_path": "",
+        "path": path,
+        "raw_path": path.encode("latin-1"),
+        "query_string": query_string,
+        "headers": headers,
+        BATCH_USER: user,
+        BATCH_SESSION: session,
+    }
+
+
+async def call(app, scope: dict, body: bytes) -> dict:
+    """Выполнить подзапрос и собрать ответ в результат операции"""
+    status_code = None
+    response_headers = {}
+    chunks = []
+    body_sent = False
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status_code
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+            for name, value in message.get("headers", []):
+                response_headers[name.decode("latin-1")] = value.decode("latin-1")
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    try:
+        await app(scope, receive, send)
+    except Exception:
+        # ServerErrorMiddleware вложенного приложения уже отправил 500
+        logger.exception("Batch operation %s %s failed", scope["method"], scope["path"])
+        if status_code is None:
+            status_code, chunks = 500, [b'{"detail":"Internal Server Error"}']
+            response_headers["content-type"] = "application/json"
+
+    content = b"".join(chunks)
+    content_type = response_headers.pop("content-type", "")
+    response_headers.pop("content-length", None)
+    if not content:
+        data = None
+    elif content_type.startswith("application/json"):
+        data = json.loads(content)
+    else:
+        data = content.decode("utf-8", errors="replace")
+    return {"status": status_code, "headers": response_headers, "body": data}
+
+
+async def run(app, parent_scope: dict, operations: List, user, session: Session) -> List[dict]:
+    """Выполнить операции пакета по порядку; результаты в порядке операций"""
+    results = []
+    for operation in operations:
+        if not path_allowed(operation.path):
+            result = {"status": 400, "headers": {}, "body": {"detail": "Path is not allowed in batch"}}
+        else:
+            if operation.method != "GET":
+                # чтения сессии пакета могли уйти на реплику; запись читает с primary
+                session.info.pop("replica", None)
+            body = b"" if operation.body is None else json.dumps(operation.body).encode("utf-8")
+            result = await call(app, sub_scope(parent_scope, operation, user, session), body)
+            # незафиксированные изменения неуспешной операции не должны попасть в следующую
+            if result["status"] >= 400 and session.in_transaction():
+                session.rollback()
+        metrics.inc("batch_operations_total", method=operation.method, status=result["status"])
+        results.append(result)
+    return results
@@ -0,0 +1,137 @@
+"""
+Кэш результатов списочных запросов с инвалидацией по поколениям.
+
+Для каждой таблицы хранится счетчик поколения. Ключ записи включает
+поколения всех таблиц, от которых зависит результат, поэтому изменение
+данных инвалидирует записи простым увеличением счетчика (bump) - без
+перебора ключей. Устаревшие записи вытесняются по LRU при превышении
+лимита памяти или по TTL.
+
+Поколения и записи разделены по арендаторам (tenant): запись одного
+арендатора не инвалидирует списки других, а у каждого арендатора свой
+LRU с лимитом LIST_CACHE_TENANT_MAX_BYTES. При превышении общего лимита
+вытесняются записи самого большого раздела, поэтому активный арендатор
+вытесняет прежде всего собственные записи.
+
+Кэш локален для процесса: при нескольких воркерах запись в одном
+воркере не увеличивает поколения в других, их записи устаревают по
+LIST_CACHE_TTL.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, Optional, Tuple
+
+from pydantic import BaseModel
+
+from app.metrics import metrics
+
+LIST_CACHE_ENABLED = os.getenv("LIST_CACHE_ENABLED", "true").lower() == "true"
+LIST_CACHE_MAX_BYTES = int(os.getenv("LIST_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+LIST_CACHE_TENANT_MAX_BYTES = int(os.getenv("LIST_CACHE_TENANT_MAX_BYTES", str(LIST_CACHE_MAX_BYTES // 4)))
+LIST_CACHE_TTL = float(os.getenv("LIST_CACHE_TTL", "30"))
+
+
+def estimate_size(value) -> int:
+    """Приблизительный размер результата в байтах (по JSON-представлению)"""
+    if isinstance(value, BaseModel):
+        return len(value.model_dump_json())
+    return len(json.dumps(value, default=str))
+
+
+class GenerationalCache:
+    """LRU-кэш с лимитом по памяти и поколениями таблиц, разделенный по арендаторам"""
+
+    def __init__(self, max_bytes: int, ttl: float, enabled: bool = True, tenant_max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.tenant_max_bytes = tenant_max_bytes or max_bytes
+        self.ttl = ttl
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        # (арендатор, таблица) -> поколение; арендатор None - изменения любого арендатора
+        self._generations = {}
+        # арендатор -> (ключ -> (значение, размер, момент истечения))
+        self._partitions: "Dict[Optional[str], OrderedDict[Hashable, Tuple[object, int, float]]]" = {}
+        self._partition_bytes: Dict[Optional[str], int] = {}
+        self._bytes = 0
+
+    def bump(self, *tables: str, tenant: Optional[str] = None):
+        """Инвалидировать записи арендатора, зависящие от таблиц"""
+        with self._lock:
+            for table in tables:
+                self._generations[(None, table)] = self._generations.get((None, table), 0) + 1
+                if tenant is not None:
+                    self._generations[(tenant, table)] = self._generations.get((tenant, table), 0) + 1
+        for table in tables:
+            metrics.inc("list_cache_invalidations_total", table=table)
+
+    def generation(self, tables: Iterable[str], tenant: Optional[str] = None) -> Tuple:
+        """Поколения таблиц арендатора; без tenant - с учетом изменений всех арендаторов"""
+        with self._lock:
+            return tuple((table, self._generations.get((tenant, table), 0)) for table in tables)
+
+    def get(self, key: Hashable, generation: Tuple, endpoint: str, tenant: Optional[str] = None) -> Optional[object]:
+        if not self.enabled:
+            return None
+        full_key = (key, generation)
+        with self._lock:
+            entries = self._partitions.get(tenant)
+            entry = entries.get(full_key) if entries is not None else None
+            if entry is not None and entry[2] > time.monotonic():
+                entries.move_to_end(full_key)
+                metrics.inc("list_cache_hits_total", endpoint=endpoint)
+                return entry[0]
+            if entry is not None:
+                self._remove(tenant, full_key)
+        metrics.inc("list_cache_misses_total", endpoint=endpoint)
+        return None
+
+    def put(self, key: Hashable, generation: Tuple, value, tenant: Optional[str] = None):
+        if not self.enabled:
+            return
+        size = estimate_size(value)
+        if size > self.tenant_max_bytes:
+            return
+        full_key = (key, generation)
+        with self._lock:
+            entries = self._partitions.setdefault(tenant, OrderedDict())
+            if full_key in entries:
+                self._remove(tenant, full_key)
+            entries[full_key] = (value, size, time.monotonic() + self.ttl)
+            self._partition_bytes[tenant] = self._partition_bytes.get(tenant, 0) + size
+            self._bytes += size
+            # сначала лимит раздела, затем общий - за счет самого большого раздела
+            while self._partition_bytes[tenant] > self.tenant_max_bytes:
+                self._evict(tenant)
+            while self._bytes > self.max_bytes:
+                self._evict(max(self._partition_bytes, key=self._partition_bytes.get))
+            metrics.set_gauge("list_cache_bytes", self._bytes)
+            metrics.set_gauge("list_cache_entries", sum(len(entries) for entries in self._partitions.values()))
+            metrics.set_gauge("list_cache_partitions", len(self._partitions))
+
+    def clear(self):
+        with self._lock:
+            self._partitions.clear()
+            self._partition_bytes.clear()
+            self._bytes = 0
+
+    def _evict(self, tenant: Optional[str]):
+        oldest = next(iter(self._partitions[tenant]))
+        self._remove(tenant, oldest)
+        metrics.inc("list_cache_evictions_total")
+
+    def _remove(self, tenant: Optional[str], full_key):
+        entries = self._partitions[tenant]
+        _, size, _ = entries.pop(full_key)
+        self._bytes -= size
+        self._partition_bytes[tenant] -= size
+        if not entries:
+            del self._partitions[tenant]
+            del self._partition_bytes[tenant]
+
+
+list_cache = GenerationalCache(
+    LIST_CACHE_MAX_BYTES, LIST_CACHE_TTL, enabled=LIST_CACHE_ENABLED, tenant_max_bytes=LIST_CACHE_TENANT_MAX_BYTES
+)
@@ -1,22 +1,341 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.sql import Insert, Update, Delete
+from fastapi import Depends, HTTPException, Request
+from datetime import datetime, timedelta
+import itertools
+import threading
+import time
 import os
 from dotenv import load_dotenv
 
+from app.metrics import metrics
+
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://library_user:library_pass@db:5432/library_db")
+# Реплики только для чтения (через запятую), например postgresql://...@replica1/library_db
+DATABASE_REPLICA_URLS = [
+    url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()
+]
+READ_YOUR_WRITES_WINDOW = float(os.getenv("READ_YOUR_WRITES_WINDOW", "5"))
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", "10"))
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv("REPLICA_LAG_CHECK_INTERVAL", "5"))
+# Сколько соединений открыть заранее при старте (не больше размера пула)
+POOL_WARMUP_CONNECTIONS = int(os.getenv("POOL_WARMUP_CONNECTIONS", "5"))
+# Автоматический выключатель: сколько ошибок подключения подряд размыкают его
+# и через сколько секунд пропускается пробный запрос
+DB_BREAKER_FAILURE_THRESHOLD = int(os.getenv("DB_BREAKER_FAILURE_THRESHOLD", "3"))
+DB_BREAKER_RESET_TIMEOUT = float(os.getenv("DB_BREAKER_RESET_TIMEOUT", "10"))
+# За сколько секунд транзакция, записавшая change_log, гарантированно фиксируется
+CHANGE_LOG_COMMIT_LAG = float(os.getenv("CHANGE_LOG_COMMIT_LAG", "5"))
+
+# ключ ASGI scope с сессией, общей для подзапросов пакета (app/batch.py): get_db отдает ее
+BATCH_SESSION = "batch.session"
 
 engine = create_engine(DATABASE_URL)
+replica_engines = [create_engine(url) for url in DATABASE_REPLICA_URLS]
+
+
+class ReplicaRouter:
+    """
+    Выбор движка для читающих запросов.
+
+    Запрос уходит на реплику по кругу, кроме случаев:
+    - клиент недавно писал (окно read-your-writes) - читаем с primary;
+    - отставание реплики больше REPLICA_MAX_LAG - реплика пропускается.
+    """
+
+    def __init__(self, engines, sticky_window: float, max_lag: float, lag_check_interval: float):
+        self.engines = engines
+        self.sticky_window = sticky_window
+        self.max_lag = max_lag
+        self.lag_check_interval = lag_check_interval
+        self._lock = threading.Lock()
+        self._recent_writes = {}
+        self._lag = {}
+        self._lag_checked_at = 0.0
+        self._round_robin = itertools.count()
+
+    def note_write(self, client_key: str):
+        """Клиент записал данные: его чтения идут на primary в течение окна"""
+        if not client_key or not self.engines:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._recent_writes[client_key] = now + self.sticky_window
+            if len(self._recent_writes) > 10000:
+                self._recent_writes = {
+                    k: deadline for k, deadline in self._recent_writes.items() if deadline > now
+                }
+
+    def _is_sticky(self, client_key: str) -> bool:
+        if not client_key:
+            return False
+        with self._lock:
+            deadline = self._recent_writes.get(client_key)
+            if deadline is None:
+                return False
+            if deadline <= time.monotonic():
+                del self._recent_writes[client_key]
+                return False
+            return True
+
+    @staticmethod
+    def _measure_lag(replica_engine) -> float:
+        """Отставание реплики в секундах (для SQLite и primary всегда 0)"""
+        if replica_engine.dialect.name != "postgresql":
+            return 0.0
+        with replica_engine.connect() as conn:
+            lag = conn.execute(text(
+                "SELECT EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())"
+            )).scalar()
+        return max(float(lag), 0.0) if lag is not None else 0.0
+
+    def refresh_lag(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._lag_checked_at < self.lag_check_interval:
+            return
+        self._lag_checked_at = now
+        for index, replica_engine in enumerate(self.engines):
+            try:
+                lag = self._measure_lag(replica_engine)
+            except Exception:
+                lag = float("inf")
+                metrics.inc("db_replica_lag_check_errors_total", replica=index)
+            self._lag[index] = lag
+            metrics.set_gauge("db_replica_lag_seconds", lag, replica=index)
+
+    def choose(self, client_key: str = None):
+        """
+        Движок реплики (None - выполнить на primary) и цель маршрута для
+        ключей объединения и кэша: чтения разных целей видят разные данные.
+        Чтение в окне read-your-writes привязано к клиенту - оно не должно
+        получить результат, вычисленный до его записи.
+        """
+        if not self.engines:
+            return None, "primary"
+        if self._is_sticky(client_key):
+            metrics.inc("db_route_total", target="primary", reason="read_your_writes")
+            return None, ("read_your_writes", client_key)
+
+        self.refresh_lag()
+        start = next(self._round_robin)
+        for offset in range(len(self.engines)):
+            index = (start + offset) % len(self.engines)
+            if self._lag.get(index, 0.0) <= self.max_lag:
+                metrics.inc("db_route_total", target="replica", reason="read", replica=index)
+                return self.engines[index], ("replica", index)
+
+        metrics.inc("db_route_total", target="primary", reason="replica_lag")
+        return None, "primary"
+
+
+router = ReplicaRouter(
+    replica_engines,
+    sticky_window=READ_YOUR_WRITES_WINDOW,
+    max_lag=REPLICA_MAX_LAG,
+    lag_check_interval=REPLICA_LAG_CHECK_INTERVAL
+)
+
+
+def is_read_your_writes(route) -> bool:
+    """Цель маршрута (ReplicaRouter.choose) - чтение с primary в окне read-your-writes клиента"""
+    return isinstance(route, tuple) and route[0] == "read_your_writes"
+
+
+def change_log_horizon() -> datetime:
+    """Строки change_log не позже этой отметки зафиксированы вместе со всеми предшественниками"""
+    return datetime.utcnow() - timedelta(seconds=CHANGE_LOG_COMMIT_LAG)
+
+
+def committed_prefix(rows) -> int:
+    """
+    Сколько первых строк change_log (по возрастанию id) водяной знак может пройти.
+
+    id выдается при flush, а строка видна после commit, поэтому транзакция
+    с меньшим id может зафиксироваться позже строки с большим. Строки
+    моложе CHANGE_LOG_COMMIT_LAG секунд еще могут иметь незафиксированных
+    предшественников: водяной знак останавливается перед первой такой строкой.
+    """
+    horizon = change_log_horizon()
+    for index, row in enumerate(rows):
+        if row.changed_at > horizon:
+            return index
+    return len(rows)
+
+
+class RoutingSession(Session):
+    """Сессия, отправляющая чтения на реплику, а любые записи - на primary"""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        replica = self.info.get("replica")
+        if replica is None or self._flushing or isinstance(clause, (Insert, Update, Delete)):
+            return engine
+        return replica
+
+
+class CircuitBreaker:
+    """
+    Автоматический выключатель обращений к primary.
+
+    closed - запросы идут в БД; после failure_threshold ошибок подключения
+    подряд (отказ при подключении или разрыв соединения) выключатель
+    размыкается (open), и get_db сразу отвечает 503, не дожидаясь таймаутов
+    подключения. Через reset_timeout он переходит в half_open и пропускает
+    один пробный запрос за reset_timeout; успешное подключение (пробного
+    запроса или фоновой проверки app/dbhealth.py) замыкает его, ошибка -
+    снова размыкает.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_until = 0.0
+
+    def allow(self) -> bool:
+        """Можно ли обращаться к БД; в half_open - только пробный запрос"""
+        if self.state == self.CLOSED:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            if self.state == self.OPEN and now - self._opened_at >= self.reset_timeout:
+                self._set_state(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN and now >= self._trial_until:
+                self._trial_until = now + self.reset_timeout
+                return True
+        metrics.inc("db_circuit_rejected_total")
+        return False
+
+    def retry_after(self) -> int:
+        remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+        return max(int(remaining + 0.999), 1)
+
+    def record_success(self):
+        if self.state == self.CLOSED and not self._failures:
+            return
+        with self._lock:
+            self._failures = 0
+            self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._trial_until = 0.0
+                self._set_state(self.OPEN)
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            self.state = state
+            metrics.inc("db_circuit_transitions_total", state=state)
+
+
+db_breaker = CircuitBreaker(DB_BREAKER_FAILURE_THRESHOLD, DB_BREAKER_RESET_TIMEOUT)
+
+
+@event.listens_for(engine, "handle_error")
+def _record_connection_error(context):
+    # connection is None - ошибка при подключении
+    if context.connection is None or context.is_disconnect:
+        db_breaker.record_failure()
+
+
+@event.listens_for(engine, "connect")
+def _record_connection_success(dbapi_connection, connection_record):
+    db_breaker.record_success()
+
+
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=engine)
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _mark_flush_write(session, flush_context):
+    session.info["wrote"] = True
+    session.info.pop("replica", None)
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _mark_bulk_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+        orm_execute_state.session.info.pop("replica", None)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _note_committed_write(session):
+    if session.info.pop("wrote", False):
+        router.note_write(session.info.get("client_key"))
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
-def get_db():
+
+def warm_up_pool(count: int = POOL_WARMUP_CONNECTIONS):
+    """
+    Открыть соединения с primary и репликами до первых запросов.
+
+    Соединения сразу возвращаются в пул и переиспользуются обработчиками,
+    поэтому первые запросы после старта не платят за подключение к БД.
+    """
+    for target in [engine] + replica_engines:
+        size = target.pool.size() if hasattr(target.pool, "size") else 1
+        connections = []
+        try:
+            for _ in range(min(count, size)):
+                connection = target.connect()
+                connection.execute(text("SELECT 1"))
+                connections.append(connection)
+        finally:
+            for connection in connections:
+                connection.close()
+
+
+def client_key(request: Request) -> str:
+    """Идентификатор клиента для окна read-your-writes"""
+    authorization = request.headers.get("authorization")
+    if authorization:
+        return authorization
+    return request.client.host if request.client else None
+
+
+def get_db(request: Request = None):
+    shared = request.scope.get(BATCH_SESSION) if request is not None else None
+    if shared is not None:
+        # подзапрос пакета: сессией владеет POST /api/v2/batch
+        yield shared
+        return
+    if not db_breaker.allow():
+        raise HTTPException(
+            status_code=503,
+            detail="Database unavailable",
+            headers={"Retry-After": str(db_breaker.retry_after())}
+        )
     db = SessionLocal()
+    if request is not None:
+        db.info["client_key"] = client_key(request)
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def get_read_db(request: Request, db: Session = Depends(get_db)):
+    """
+    Сессия для GET-обработчиков: чтение с реплики, если она доступна.
+
+    Использует ту же сессию, что и get_db (например, в verify_token),
+    чтобы запрос держал не больше одного соединения с каждой базой.
+    """
+    db.info["replica"], request.state.db_route = router.choose(db.info.get("client_key"))
+    return db
@@ -0,0 +1,150 @@
+"""
+Состояние БД для эндпоинтов здоровья.
+
+/health и /internal/health/detailed не обращаются к БД, а отдают снимок,
+который фоновая задача обновляет раз в DB_HEALTH_INTERVAL секунд
+(SELECT 1 и число записей rate_limits / idempotency_keys). Проверка идет
+в обход выключателя db_breaker (app/database.py) и служит его пробой:
+успешная проверка замыкает выключатель после сбоя.
+
+FaultInjector - локальная замена отказа БД для проверок: в режиме down
+новые подключения к primary завершаются ошибкой драйвера, а пул
+сбрасывается, так что запросы видят тот же отказ, что и при недоступном
+сервере. Режим задается DB_FAULT_INJECTION=down или fault_injector.set().
+"""
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event, func, select, text
+
+from app import models
+from app.database import engine, db_breaker
+from app.metrics import metrics
+
+DB_HEALTH_INTERVAL = float(os.getenv("DB_HEALTH_INTERVAL", "5"))
+DB_FAULT_INJECTION = os.getenv("DB_FAULT_INJECTION", "")
+
+logger = logging.getLogger("app.dbhealth")
+
+
+@dataclass
+class HealthSnapshot:
+    """Результат последней проверки БД"""
+    database: str
+    checked_at: Optional[datetime] = None
+    latency_ms: Optional[float] = None
+    rate_limit_records: int = 0
+    idempotency_records: int = 0
+
+
+class FaultInjector:
+    """Имитация недоступной БД: режим "" - без отказов, "down" - подключения отклоняются"""
+
+    MODES = ("", "down")
+
+    def __init__(self, mode: str = ""):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown fault injection mode: {mode}")
+        self.mode = mode
+
+    @property
+    def down(self) -> bool:
+        return self.mode == "down"
+
+    def set(self, mode: str):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown fault injection mode: {mode}")
+        self.mode = mode
+        if self.down:
+            # соединения пула иначе продолжили бы работать
+            engine.dispose()
+
+
+fault_injector = FaultInjector(DB_FAULT_INJECTION)
+
+
+@event.listens_for(engine, "do_connect")
+def _inject_connect_fault(dialect, connection_record, cargs, cparams):
+    if fault_injector.down:
+        raise dialect.dbapi.OperationalError("connection refused (fault injection)")
+
+
+class DatabaseHealth:
+    """Периодическая проверка БД; эндпоинты здоровья читают снимок"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.snapshot = HealthSnapshot(database="unknown")
+        self._task: Optional[asyncio.Task] = None
+
+    def check(self) -> HealthSnapshot:
+        """Одна проверка (блокирующая, выполняется в пуле потоков)"""
+        started = time.perf_counter()
+        try:
+            with engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+                latency_ms = (time.perf_counter() - started) * 1000
+                rate_limit_records = connection.execute(
+                    select(func.count()).select_from(models.RateLimit)
+                ).scalar()
+                idempotency_records = connection.execute(
+                    select(func.count()).select_from(models.IdempotencyKey)
+                ).scalar()
+        except Exception as exc:
+            metrics.inc("db_health_checks_total", status="error")
+            previous = self.snapshot
+            self.snapshot = HealthSnapshot(
+                database=f"error: {getattr(exc, 'orig', None) or exc}",
+                checked_at=datetime.utcnow(),
+                rate_limit_records=previous.rate_limit_records,
+                idempotency_records=previous.idempotency_records
+            )
+            return self.snapshot
+
+        db_breaker.record_success()
+        metrics.inc("db_health_checks_total", status="ok")
+        metrics.set_gauge("db_health_latency_ms", latency_ms)
+        self.snapshot = HealthSnapshot(
+            database="connected",
+            checked_at=datetime.utcnow(),
+            latency_ms=round(latency_ms, 2),
+            rate_limit_records=rate_limit_records,
+            idempotency_records=idempotency_records
+        )
+        return self.snapshot
+
+    async def current(self) -> HealthSnapshot:
+        """Последний снимок; до первой фоновой проверки - проверка сейчас"""
+        if self.snapshot.checked_at is None:
+            return await run_in_threadpool(self.check)
+        return self.snapshot
+
+    async def _run(self):
+        while True:
+            try:
+                await run_in_threadpool(self.check)
+            except Exception:
+                logger.exception("Database health check failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+db_health = DatabaseHealth(DB_HEALTH_INTERVAL)
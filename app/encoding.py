@@ -0,0 +1,95 @@
+"""
+Согласование формата ответа списочных эндпоинтов по заголовку Accept.
+
+- application/json (по умолчанию, а также */* и отсутствие Accept) -
+  обычный ответ FastAPI без изменений;
+- application/vnd.library.columnar+json - колоночный JSON: имена полей
+  один раз в "columns", строки - массивы значений в "rows";
+- application/msgpack (application/x-msgpack) - тот же объект, что и в
+  JSON, в MessagePack.
+
+Закэшированный результат не зависит от формата: кодирование выполняется
+для каждого ответа, поэтому Accept не входит в ключ кэша и singleflight.
+"""
+import json
+from typing import Optional
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
+
+MEDIA_JSON = "application/json"
+MEDIA_COLUMNAR = "application/vnd.library.columnar+json"
+MEDIA_MSGPACK = "application/msgpack"
+
+_ALIASES = {
+    MEDIA_JSON: MEDIA_JSON,
+    MEDIA_COLUMNAR: MEDIA_COLUMNAR,
+    MEDIA_MSGPACK: MEDIA_MSGPACK,
+    "application/x-msgpack": MEDIA_MSGPACK,
+    "application/*": MEDIA_JSON,
+    "*/*": MEDIA_JSON,
+}
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """Формат с наибольшим q из поддерживаемых; при равенстве - первый в заголовке"""
+    if not accept:
+        return MEDIA_JSON
+    best, best_q = None, 0.0
+    for part in accept.split(","):
+        media, _, params = part.strip().partition(";")
+        media = _ALIASES.get(media.strip().lower())
+        if media is None:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > best_q:
+            best, best_q = media, q
+    return best or MEDIA_JSON
+
+
+def to_columnar(data: dict) -> dict:
+    """Заменить список items на columns + rows; остальные поля без изменений"""
+    items = data.get("items") or []
+    columns = []
+    seen = set()
+    for item in items:
+        for name in item:
+            if name not in seen:
+                seen.add(name)
+                columns.append(name)
+    columnar = {key: value for key, value in data.items() if key != "items"}
+    columnar["columns"] = columns
+    columnar["rows"] = [[item.get(name) for name in columns] for item in items]
+    return columnar
+
+
+def encode(data: dict, media: str) -> bytes:
+    """Сериализовать подготовленный (jsonable) объект в выбранный формат"""
+    if media == MEDIA_MSGPACK:
+        import msgpack
+        return msgpack.packb(data)
+    if media == MEDIA_COLUMNAR:
+        data = to_columnar(data)
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def negotiated_response(request: Request, result):
+    """
+    Ответ списочного эндпоинта в формате из Accept.
+    JSON сериализуется так же, как это делает FastAPI для возвращенного
+    объекта (jsonable_encoder + JSONResponse), тело ответа не меняется.
+    Результат cached_read уже подготовлен и не преобразуется повторно.
+    """
+    data = result if isinstance(result, dict) else jsonable_encoder(result)
+    media = negotiate(request.headers.get("accept"))
+    if media == MEDIA_JSON:
+        return JSONResponse(content=data, headers={"Vary": "Accept"})
+    return Response(content=encode(data, media), media_type=media, headers={"Vary": "Accept"})
@@ -0,0 +1,149 @@
+import asyncio
+import itertools
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Optional
+
+from app.metrics import metrics
+
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "100"))
+EVENT_HEARTBEAT_SECONDS = float(os.getenv("EVENT_HEARTBEAT_SECONDS", "15"))
+
+
+class Subscription:
+    """Подписчик с ограниченной очередью и фильтрами по арендатору, жанру и автору"""
+
+    def __init__(
+        self,
+        loop,
+        genre: Optional[str],
+        author_id: Optional[int],
+        queue_size: int,
+        tenant: Optional[str] = None
+    ):
+        self.loop = loop
+        self.tenant = tenant
+        self.genre = genre
+        self.author_id = author_id
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = False
+
+    def matches(self, event: dict) -> bool:
+        data = event.get("data") or {}
+        if self.tenant is not None and event.get("tenant") != self.tenant:
+            return False
+        if self.genre is not None and data.get("genre") != self.genre:
+            return False
+        if self.author_id is not None:
+            author_id = data.get("author_id") if event["entity"] == "book" else data.get("id")
+            if author_id != self.author_id:
+                return False
+        return True
+
+    def offer(self, event: dict):
+        """Неблокирующая доставка; переполненная очередь - подписчик отключается"""
+        if self.dropped:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped = True
+            metrics.inc("events_dropped_subscribers_total")
+            # освобождаем место под маркер завершения, чтобы поток закрылся сразу
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+class EventBroker:
+    """
+    Внутрипроцессный pub/sub изменений каталога.
+
+    Публикация не ждет подписчиков: каждому событие кладется в его
+    очередь, а медленный подписчик с заполненной очередью отключается.
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._ids = itertools.count(1)
+
+    def subscribe(
+        self,
+        genre: Optional[str] = None,
+        author_id: Optional[int] = None,
+        tenant: Optional[str] = None
+    ) -> Subscription:
+        subscription = Subscription(asyncio.get_running_loop(), genre, author_id, self.queue_size, tenant)
+        with self._lock:
+            self._subscribers.add(subscription)
+            metrics.set_gauge("events_subscribers", len(self._subscribers))
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+            metrics.set_gauge("events_subscribers", len(self._subscribers))
+
+    def publish(self, entity: str, operation: str, data: dict, tenant: Optional[str] = None):
+        """Опубликовать событие; безопасно вызывать из любого потока"""
+        event = {
+            "id": next(self._ids),
+            "tenant": tenant,
+            "entity": entity,
+            "operation": operation,
+            "timestamp": datetime.utcnow().isoformat(),
+            "data": data
+        }
+        metrics.inc("events_published_total", entity=entity, operation=operation)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        try:
+            current_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            current_loop = None
+        for subscription in subscribers:
+            if not subscription.matches(event):
+                continue
+            if subscription.loop is current_loop:
+                subscription.offer(event)
+                if subscription.dropped:
+                    self.unsubscribe(subscription)
+            else:
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+
+
+broker = EventBroker(EVENT_QUEUE_SIZE)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def format_sse(event: dict) -> str:
+    name = f"{event['entity']}.{event['operation']}"
+    payload = json.dumps(event, ensure_ascii=False, default=_json_default)
+    return f"id: {event['id']}\nevent: {name}\ndata: {payload}\n\n"
+
+
+async def stream(subscription: Subscription):
+    """Генератор SSE-кадров для подписчика с периодическим heartbeat"""
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), EVENT_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                continue
+            if event is None:
+                yield "event: dropped\ndata: {\"detail\": \"Subscriber too slow\"}\n\n"
+                return
+            yield format_sse(event)
+    finally:
+        broker.unsubscribe(subscription)
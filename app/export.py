@@ -0,0 +1,250 @@
+"""
+Выгрузка каталога (books_v2 + имя автора) в Parquet или Arrow IPC.
+
+Выгрузка выполняется фоновым заданием (app/jobs.py): каждый чанк
+задания читает следующие EXPORT_BATCH_SIZE строк по id и дописывает их
+в файл одним record batch, поэтому память ограничена размером порции, а
+heartbeat задания обновляется после каждой порции. Файл пишется во
+временный и переименовывается после завершения, так что недописанный
+файл никогда не отдается. Открытый файл хранится в процессе между
+чанками; если задание продолжается после перезапуска процесса,
+выгрузка начинается заново.
+
+Порции читаются в разных транзакциях, поэтому выгрузка не один снимок:
+книга, измененная во время выгрузки, может попасть в файл с новыми
+данными или не попасть (если ее id уже пройден).
+
+Инкрементальная выгрузка (updated_since) берет книги, созданные или
+измененные после отметки; в результате задания возвращается
+max_changed_at - отметка для следующей выгрузки. Она не позже начала
+выгрузки, так что пропущенные во время выгрузки изменения попадут в
+следующую (возможно, вместе с повторами уже выгруженных книг). Удаления
+в инкремент не попадают, их можно получить из /api/v2/changes.
+"""
+import os
+import uuid
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app import models
+
+EXPORT_DIR = os.getenv("EXPORT_DIR", "exports")
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "10000"))
+EXPORT_READ_CHUNK = 64 * 1024
+
+FORMATS = {
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+    "arrow": ("arrow", "application/vnd.apache.arrow.file"),
+}
+
+
+def export_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("id", pa.int64()),
+        ("title", pa.string()),
+        ("author_id", pa.int64()),
+        ("author_name", pa.string()),
+        ("year", pa.int32()),
+        ("isbn", pa.string()),
+        ("pages", pa.int32()),
+        ("genre", pa.string()),
+        ("created_at", pa.timestamp("us")),
+        ("updated_at", pa.timestamp("us")),
+    ])
+
+
+def export_path(export_format: str) -> str:
+    """Уникальный путь файла выгрузки (задается при постановке задания)"""
+    return os.path.join(EXPORT_DIR, f"books_v2-{uuid.uuid4().hex}.{FORMATS[export_format][0]}")
+
+
+class _Writer:
+    """Единый интерфейс записи record batch для Parquet и Arrow IPC"""
+
+    def __init__(self, path: str, export_format: str, schema):
+        import pyarrow as pa
+        self._sink = None
+        if export_format == "parquet":
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(path, schema, compression="zstd")
+        else:
+            self._sink = pa.OSFile(path, "wb")
+            self._writer = pa.ipc.new_file(self._sink, schema)
+
+    def write(self, batch):
+        self._writer.write_batch(batch)
+
+    def close(self):
+        self._writer.close()
+        if self._sink is not None:
+            self._sink.close()
+
+
+def _export_query(updated_since: Optional[datetime], tenant: Optional[str]):
+    changed_at = func.coalesce(models.BookV2.updated_at, models.BookV2.created_at)
+    query = (
+        select(
+            models.BookV2.id, models.BookV2.title, models.BookV2.author_id, models.Author.name,
+            models.BookV2.year, models.BookV2.isbn, models.BookV2.pages, models.BookV2.genre,
+            models.BookV2.created_at, models.BookV2.updated_at, changed_at
+        )
+        .outerjoin(models.Author, models.Author.id == models.BookV2.author_id)
+        .order_by(models.BookV2.id)
+    )
+    if tenant is not None:
+        query = query.where(models.BookV2.tenant_id == tenant)
+    if updated_since is not None:
+        query = query.where(changed_at > updated_since)
+    return query
+
+
+# файлы, которые дописывают задания этого процесса: путь выгрузки -> _Writer
+_open_writers: Dict[str, _Writer] = {}
+
+
+def _discard(path: str):
+    writer = _open_writers.pop(path, None)
+    if writer is not None:
+        writer.close()
+    if os.path.exists(f"{path}.part"):
+        os.remove(f"{path}.part")
+
+
+def write_export_chunk(
+    db: Session,
+    path: str,
+    export_format: str,
+    state: dict,
+    updated_since: Optional[datetime] = None,
+    tenant: Optional[str] = None
+) -> Tuple[dict, int, Optional[dict]]:
+    """
+    Дописать в выгрузку каталога арендатора следующую порцию. Возвращает
+    новое состояние, прирост числа строк и итог (число строк и отметку
+    инкремента), если выгрузка завершена, иначе None.
+    """
+    import pyarrow as pa
+
+    schema = export_schema()
+    writer = _open_writers.get(path)
+    discarded = 0
+    if writer is None:
+        # первая порция или продолжение в другом процессе: недописанный файл пишется заново
+        discarded = state.get("rows", 0)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        writer = _open_writers[path] = _Writer(f"{path}.part", export_format, schema)
+        state = {"after_id": 0, "rows": 0, "max_changed_at": None, "as_of": datetime.utcnow().isoformat()}
+
+    try:
+        rows = db.execute(
+            _export_query(updated_since, tenant).where(models.BookV2.id > state["after_id"]).limit(EXPORT_BATCH_SIZE)
+        ).all()
+        max_changed_at = datetime.fromisoformat(state["max_changed_at"]) if state["max_changed_at"] else None
+        if rows:
+            columns = list(zip(*rows))
+            # последняя колонка - отметка изменения для инкремента, в файл не пишется
+            batch_max = max((value for value in columns.pop() if value is not None), default=None)
+            if batch_max is not None and (max_changed_at is None or batch_max > max_changed_at):
+                max_changed_at = batch_max
+            writer.write(pa.record_batch(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema
+            ))
+    except Exception:
+        _discard(path)
+        raise
+
+    state = {
+        "after_id": rows[-1][0] if rows else state["after_id"],
+        "rows": state["rows"] + len(rows),
+        "max_changed_at": max_changed_at.isoformat() if max_changed_at else None,
+        "as_of": state["as_of"],
+    }
+    if len(rows) == EXPORT_BATCH_SIZE:
+        return state, len(rows) - discarded, None
+
+    del _open_writers[path]
+    writer.close()
+    os.replace(f"{path}.part", path)
+    if max_changed_at is not None:
+        max_changed_at = min(max_changed_at, datetime.fromisoformat(state["as_of"]))
+    return state, len(rows) - discarded, {
+        "rows": state["rows"],
+        "tenant": tenant,
+        "format": export_format,
+        "bytes": os.path.getsize(path),
+        "updated_since": updated_since.isoformat() if updated_since else None,
+        "max_changed_at": max_changed_at.isoformat() if max_changed_at else None,
+    }
+
+
+def _parse_range(header: str, size: int):
+    """Диапазон 'bytes=start-end' (один); None - заголовок не поддерживается"""
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None
+    start_text, _, end_text = spec.strip().partition("-")
+    if start_text:
+        start = int(start_text)
+        end = int(end_text) if end_text else size - 1
+    else:
+        # суффикс: последние N байт
+        start = max(size - int(end_text), 0)
+        end = size - 1
+    return start, min(end, size - 1)
+
+
+def file_response(request: Request, path: str, media_type: str) -> Response:
+    """
+    Отдача файла с поддержкой Range (один диапазон) и If-Range,
+    чтобы прерванную загрузку большого файла можно было продолжить.
+    """
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Content-Disposition": f'attachment; filename="{os.path.basename(path)}"',
+    }
+
+    start, end = 0, size - 1
+    status_code = status.HTTP_200_OK
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range == etag):
+        try:
+            parsed = _parse_range(range_header, size)
+        except ValueError:
+            parsed = None
+        if parsed is not None:
+            start, end = parsed
+            if start > end or start >= size:
+                raise HTTPException(
+                    status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                    detail="Range not satisfiable",
+                    headers={"Content-Range": f"bytes */{size}"}
+                )
+            status_code = status.HTTP_206_PARTIAL_CONTENT
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    headers["Content-Length"] = str(end - start + 1)
+
+    def read_range():
+        with open(path, "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(EXPORT_READ_CHUNK, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    return StreamingResponse(read_range(), status_code=status_code, media_type=media_type, headers=headers)
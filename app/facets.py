@@ -0,0 +1,115 @@
+"""
+Фасеты списка книг V2: количество книг по жанру и по десятилетию
+издания для текущего набора фильтров (genre, author_id, year_from, year_to).
+
+Оба фасета считаются одним запросом GROUP BY (genre, десятилетие), из
+которого суммированием получаются отдельные распределения. При
+включенной модели чтения подсчет выполняется по ее колонкам в памяти.
+
+Десятилетие - год, округленный вниз до кратного 10 (1995 -> 1990,
+-1995 -> -2000), одинаково в SQL и в модели чтения (year // 10 * 10).
+
+Результат кэшируется в list_cache по арендатору и набору фильтров (без
+page, sort, fields), поэтому листание страниц не пересчитывает фасеты,
+а запись в books_v2 арендатора инвалидирует их вместе со списками.
+"""
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app import models
+from app.cache import list_cache
+from app.read_model import books_read_model
+
+FACETS = ("genre", "year")
+FACET_TABLES = ("books_v2",)
+
+
+def parse_facets(facets: Optional[str]) -> Tuple[str, ...]:
+    """Запрошенные фасеты в каноническом порядке"""
+    if not facets:
+        return ()
+    names = {name.strip() for name in facets.split(",") if name.strip()}
+    unknown = names - set(FACETS)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown facets: {', '.join(sorted(unknown))} (available: {', '.join(FACETS)})"
+        )
+    return tuple(name for name in FACETS if name in names)
+
+
+def facet_counts(groups: Iterable[Tuple[Optional[str], Optional[int], int]], names: Tuple[str, ...]) -> Dict[str, List[dict]]:
+    """Распределения по жанру и десятилетию из групп (genre, decade, count)"""
+    genres = Counter()
+    decades = Counter()
+    for genre, decade, count in groups:
+        genres[genre] += count
+        decades[decade] += count
+
+    result = {}
+    if "genre" in names:
+        result["genre"] = [
+            {"value": genre, "count": count}
+            for genre, count in sorted(genres.items(), key=lambda item: (-item[1], item[0] is None, item[0] or ""))
+        ]
+    if "year" in names:
+        result["year"] = [
+            {"value": decade, "count": count}
+            for decade, count in sorted(decades.items(), key=lambda item: (item[0] is None, item[0] or 0))
+        ]
+    return result
+
+
+def _sql_groups(
+    db: Session,
+    genre: Optional[str],
+    author_id: Optional[int],
+    year_from: Optional[int],
+    year_to: Optional[int],
+    tenant: Optional[str] = None
+):
+    # % в PostgreSQL и SQLite сохраняет знак делимого: остаток приводится к 0..9,
+    # чтобы отрицательные годы попадали в то же десятилетие, что и year // 10 * 10
+    decade = models.BookV2.year - (models.BookV2.year % 10 + 10) % 10
+    query = db.query(models.BookV2.genre, decade, func.count(models.BookV2.id))
+    if tenant is not None:
+        query = query.filter(models.BookV2.tenant_id == tenant)
+    if genre:
+        query = query.filter(models.BookV2.genre == genre)
+    if author_id is not None:
+        query = query.filter(models.BookV2.author_id == author_id)
+    if year_from is not None:
+        query = query.filter(models.BookV2.year >= year_from)
+    if year_to is not None:
+        query = query.filter(models.BookV2.year <= year_to)
+    return query.group_by(models.BookV2.genre, decade).all()
+
+
+def book_facets(
+    db: Session,
+    tenant: str,
+    names: Tuple[str, ...],
+    genre: Optional[str] = None,
+    author_id: Optional[int] = None,
+    year_from: Optional[int] = None,
+    year_to: Optional[int] = None,
+    use_read_model: bool = False
+) -> Dict[str, List[dict]]:
+    """Фасеты для набора фильтров (из кэша или одним групповым подсчетом)"""
+    key = ("facets", names, genre, author_id, year_from, year_to)
+    generation = list_cache.generation(FACET_TABLES, tenant)
+    cached = list_cache.get(key, generation, "facets", tenant)
+    if cached is not None:
+        return cached
+
+    if use_read_model:
+        groups = books_read_model.facet_groups(genre, author_id, year_from, year_to, tenant)
+    else:
+        groups = _sql_groups(db, genre, author_id, year_from, year_to, tenant)
+    result = facet_counts(groups, names)
+    list_cache.put(key, generation, result, tenant)
+    return result
@@ -0,0 +1,276 @@
+"""
+Индекс занятых ISBN в памяти процесса.
+
+Для books_v1 и books_v2 хранится фильтр Блума по ключу (арендатор, ISBN).
+Отрицательный ответ фильтра точный: ISBN свободен, и проверочный SELECT
+перед вставкой не выполняется. Положительный ответ означает "возможно
+занят" и проверяется запросом; доля ложных срабатываний при заполнении
+фильтра до расчетной емкости - ISBN_INDEX_FP_RATE.
+
+Фильтр не видит вставок других воркеров и вставок, сделанных во время
+загрузки, поэтому "свободный" ISBN может оказаться занятым. Такую
+вставку отклоняет уникальный индекс (tenant_id, isbn), и IntegrityError
+превращается в ответ 400, как и при проверке запросом.
+
+Удалить ключ из фильтра нельзя: удаления и смены ISBN только
+учитываются как устаревшие ключи (они дают лишние SELECT, но не ошибки).
+Когда устаревших ключей больше ISBN_INDEX_STALE_RATIO от емкости или
+ключей больше емкости, фильтр перестраивается по таблице в фоновом
+потоке. Пока фильтр таблицы не загружен, все проверки идут в БД.
+"""
+import hashlib
+import logging
+import math
+import os
+import struct
+import threading
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app import models, queries
+from app.database import SessionLocal
+from app.metrics import metrics
+
+ISBN_INDEX_ENABLED = os.getenv("ISBN_INDEX_ENABLED", "true").lower() == "true"
+ISBN_INDEX_FP_RATE = float(os.getenv("ISBN_INDEX_FP_RATE", "0.01"))
+ISBN_INDEX_MIN_CAPACITY = int(os.getenv("ISBN_INDEX_MIN_CAPACITY", "100000"))
+# запас емкости при загрузке относительно числа строк таблицы
+ISBN_INDEX_HEADROOM = float(os.getenv("ISBN_INDEX_HEADROOM", "2"))
+ISBN_INDEX_STALE_RATIO = float(os.getenv("ISBN_INDEX_STALE_RATIO", "0.25"))
+ISBN_INDEX_RETRY_INTERVAL = float(os.getenv("ISBN_INDEX_RETRY_INTERVAL", "30"))
+
+TABLES = {"books_v1": models.BookV1, "books_v2": models.BookV2}
+PROBES = {"books_v1": queries.book_v1_isbn_exists, "books_v2": queries.book_v2_isbn_exists}
+
+_LOAD_CHUNK = 50_000
+
+logger = logging.getLogger("app.isbn_index")
+
+# NumPy импортируется при первой загрузке: при выключенном индексе старт процесса его не ждет
+np = None
+
+
+def _import_numpy():
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+
+
+def index_key(tenant: str, isbn: str) -> bytes:
+    return f"{tenant}\x00{isbn}".encode("utf-8")
+
+
+class BloomFilter:
+    """
+    Фильтр Блума: m бит и k позиций на ключ (двойное хеширование blake2b).
+    m и k рассчитываются по емкости и допустимой доле ложных срабатываний.
+    """
+
+    def __init__(self, capacity: int, fp_rate: float):
+        _import_numpy()
+        self.capacity = max(capacity, 1)
+        self.size = math.ceil(-self.capacity * math.log(fp_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        # одиночные операции работают с bytearray (быстрее скаляров NumPy), пакетные - с его представлением
+        self.bits = bytearray((self.size + 7) // 8)
+        self._view = np.frombuffer(self.bits, dtype=np.uint8)
+        self.count = 0
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.bits)
+
+    def _base(self, key: bytes):
+        """Первая позиция и шаг: позиции ключа - (h1 + i * h2) mod m, i < k"""
+        h1, h2 = struct.unpack("<QQ", hashlib.blake2b(key, digest_size=16).digest())
+        return h1 % self.size, h2 % self.size | 1
+
+    def add(self, key: bytes):
+        position, step = self._base(key)
+        bits, size = self.bits, self.size
+        for _ in range(self.hashes):
+            bits[position >> 3] |= 1 << (position & 7)
+            position = (position + step) % size
+        self.count += 1
+
+    def add_many(self, keys: List[bytes]):
+        """Пачка ключей: позиции и установка битов векторно"""
+        if not keys:
+            return
+        digests = np.frombuffer(
+            b"".join([hashlib.blake2b(key, digest_size=16).digest() for key in keys]), dtype="<u8"
+        ).reshape(-1, 2)
+        size = np.uint64(self.size)
+        h1 = digests[:, 0] % size
+        h2 = digests[:, 1] % size | np.uint64(1)
+        for i in range(self.hashes):
+            # h1, h2 < m, поэтому h1 + i * h2 не переполняет uint64
+            positions = (h1 + np.uint64(i) * h2) % size
+            np.bitwise_or.at(
+                self._view, positions >> np.uint64(3),
+                np.left_shift(1, positions & np.uint64(7)).astype(np.uint8)
+            )
+        self.count += len(keys)
+
+    def __contains__(self, key: bytes) -> bool:
+        position, step = self._base(key)
+        bits, size = self.bits, self.size
+        for _ in range(self.hashes):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+            position = (position + step) % size
+        return True
+
+    def fill_ratio(self) -> float:
+        """Доля установленных битов"""
+        return float(np.unpackbits(self._view).sum()) / self.size
+
+
+class IsbnIndex:
+    """Фильтры занятых ISBN по таблицам книг"""
+
+    def __init__(self, enabled: bool, fp_rate: float, min_capacity: int):
+        self.enabled = enabled
+        self.fp_rate = fp_rate
+        self.min_capacity = min_capacity
+        self._lock = threading.Lock()
+        self.filters: Dict[str, BloomFilter] = {}
+        self.stale: Dict[str, int] = {}
+        # ключи, добавленные во время (пере)загрузки таблицы; переносятся в новый фильтр
+        self._pending: Dict[str, List[bytes]] = {}
+
+    # --- загрузка ---
+
+    def load(self, table: str):
+        """Построить фильтр таблицы по БД и заменить им текущий"""
+        model = TABLES[table]
+        with self._lock:
+            self._pending.setdefault(table, [])
+        try:
+            with SessionLocal() as db:
+                rows = db.query(func.count(model.id)).scalar()
+                bloom = BloomFilter(max(self.min_capacity, int(rows * ISBN_INDEX_HEADROOM)), self.fp_rate)
+                result = db.execute(
+                    select(model.tenant_id, model.isbn).execution_options(yield_per=_LOAD_CHUNK)
+                )
+                for chunk in result.partitions():
+                    bloom.add_many([index_key(tenant, isbn) for tenant, isbn in chunk])
+        except Exception:
+            with self._lock:
+                self._pending.pop(table, None)
+            raise
+        with self._lock:
+            bloom.add_many(self._pending.pop(table))
+            self.filters[table] = bloom
+            self.stale[table] = 0
+        metrics.inc("isbn_index_loads_total", table=table)
+        self._update_gauges(table)
+        logger.info("ISBN index for %s loaded: %d keys, %d bytes", table, bloom.count, bloom.nbytes)
+
+    def load_all(self, tables=tuple(TABLES)) -> List[str]:
+        """Загрузить фильтры таблиц; возвращает таблицы, загрузка которых не удалась"""
+        failed = []
+        for table in tables:
+            try:
+                self.load(table)
+            except Exception:
+                logger.exception("ISBN index load for %s failed", table)
+                failed.append(table)
+        return failed
+
+    def _load_until_ready(self):
+        # при недоступной на старте БД загрузка повторяется, проверки тем временем идут в БД
+        failed = self.load_all()
+        while failed:
+            time.sleep(ISBN_INDEX_RETRY_INTERVAL)
+            failed = self.load_all(failed)
+
+    def start(self):
+        """Загрузка в фоновом потоке: старт не ждет чтения таблиц"""
+        if self.enabled:
+            threading.Thread(target=self._load_until_ready, name="isbn-index-load", daemon=True).start()
+
+    def _reload_in_background(self, table: str):
+        """Перестроить фильтр в фоне (вызывающий уже зарегистрировал _pending таблицы)"""
+        def run():
+            try:
+                self.load(table)
+            except Exception:
+                logger.exception("ISBN index reload for %s failed", table)
+        threading.Thread(target=run, name=f"isbn-index-{table}", daemon=True).start()
+
+    # --- изменения ---
+
+    def add(self, table: str, tenant: str, isbn: str):
+        """ISBN занят (вызывается до фиксации: при откате ключ просто станет устаревшим)"""
+        if not self.enabled:
+            return
+        key = index_key(tenant, isbn)
+        with self._lock:
+            pending = self._pending.get(table)
+            if pending is not None:
+                pending.append(key)
+            bloom = self.filters.get(table)
+            if bloom is None:
+                return
+            bloom.add(key)
+            reload = pending is None and bloom.count > bloom.capacity
+            if reload:
+                self._pending[table] = []
+        self._update_gauges(table)
+        if reload:
+            self._reload_in_background(table)
+
+    def mark_stale(self, table: str, count: int = 1):
+        """count ключей таблицы освобождены (удаление или смена ISBN)"""
+        if not self.enabled or not count:
+            return
+        with self._lock:
+            bloom = self.filters.get(table)
+            if bloom is None:
+                return
+            self.stale[table] += count
+            reload = table not in self._pending and self.stale[table] > ISBN_INDEX_STALE_RATIO * bloom.capacity
+            if reload:
+                self._pending[table] = []
+        self._update_gauges(table)
+        if reload:
+            self._reload_in_background(table)
+
+    # --- проверка ---
+
+    def might_contain(self, table: str, tenant: str, isbn: str) -> Optional[bool]:
+        """False - ISBN точно свободен, True - возможно занят, None - фильтр не загружен"""
+        bloom = self.filters.get(table) if self.enabled else None
+        if bloom is None:
+            return None
+        return index_key(tenant, isbn) in bloom
+
+    def exists(self, db: Session, table: str, tenant: str, isbn: str) -> bool:
+        """Занят ли ISBN; при точном промахе фильтра запрос к БД не выполняется"""
+        if not self.enabled:
+            return PROBES[table](db, tenant, isbn)
+        candidate = self.might_contain(table, tenant, isbn)
+        if candidate is False:
+            metrics.inc("isbn_index_lookups_total", table=table, result="miss")
+            return False
+        found = PROBES[table](db, tenant, isbn)
+        if candidate is None:
+            result = "not_loaded"
+        else:
+            result = "hit" if found else "false_positive"
+        metrics.inc("isbn_index_lookups_total", table=table, result=result)
+        return found
+
+    def _update_gauges(self, table: str):
+        bloom = self.filters[table]
+        metrics.set_gauge("isbn_index_keys", bloom.count, table=table)
+        metrics.set_gauge("isbn_index_stale_keys", self.stale[table], table=table)
+        metrics.set_gauge("isbn_index_bytes", bloom.nbytes, table=table)
+
+
+isbn_index = IsbnIndex(ISBN_INDEX_ENABLED, ISBN_INDEX_FP_RATE, ISBN_INDEX_MIN_CAPACITY)
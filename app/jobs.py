@@ -0,0 +1,285 @@
+"""
+Фоновые задания внутреннего API.
+
+Задание хранится в таблице jobs и выполняется пулом потоков процесса
+частями (чанками). Каждый чанк - отдельная транзакция, в которой вместе
+с данными сохраняются курсор продолжения (state), прогресс и результат,
+поэтому после перезапуска задание продолжается с последнего
+зафиксированного чанка без повторной обработки.
+
+Задание захватывается воркером атомарным UPDATE по статусу, так что
+при нескольких процессах его выполняет только один. Задание со статусом
+running, у которого heartbeat_at старше JOB_STALE_SECONDS, считается
+брошенным (процесс упал) и захватывается заново.
+
+Чанк может запросить паузу перед следующим (ChunkResult.delay, например
+для ограничения нагрузки на БД): продолжение планируется таймером, и
+поток воркера на время паузы не занят.
+"""
+import json
+import logging
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import func, or_, update
+
+from app import models
+from app.database import SessionLocal
+from app.metrics import metrics
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_CHUNK_SIZE = int(os.getenv("JOB_CHUNK_SIZE", "500"))
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "300"))
+
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+logger = logging.getLogger("app.jobs")
+
+
+@dataclass
+class ChunkResult:
+    """Итог одного чанка задания"""
+    state: dict
+    processed: int
+    done: bool
+    result: dict = field(default_factory=dict)
+    total: Optional[int] = None
+    # побочные эффекты после фиксации чанка (инвалидация кэша, события)
+    after_commit: Optional[Callable[[], None]] = None
+    # пауза перед следующим чанком, секунды: поток воркера на это время освобождается
+    delay: float = 0.0
+
+
+@dataclass
+class JobType:
+    # step(db, params, state, result) -> ChunkResult; фиксацию выполняет JobRunner
+    step: Callable
+    max_concurrency: int
+
+
+def to_response(job: models.Job) -> dict:
+    return {
+        "id": job.id,
+        "job_type": job.job_type,
+        "status": job.status,
+        "processed": job.processed,
+        "total": job.total,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+class JobRunner:
+    """Очередь заданий процесса с лимитом параллельности по типу"""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.types: Dict[str, JobType] = {}
+        self._lock = threading.Lock()
+        self._queue = deque()
+        self._running: Dict[str, int] = {}
+        self._executor = None
+        self._stopping = threading.Event()
+        # задания в паузе между чанками: id -> (тип, таймер продолжения)
+        self._paused: Dict[int, tuple] = {}
+
+    def job_type(self, name: str, max_concurrency: int = 1):
+        """Декоратор регистрации функции чанка для типа задания"""
+        def register(step: Callable):
+            self.types[name] = JobType(step, max_concurrency)
+            return step
+        return register
+
+    def submit(self, db, job_type: str, params: dict) -> models.Job:
+        """Сохранить задание и поставить его в очередь процесса"""
+        if job_type not in self.types:
+            raise ValueError(f"Unknown job type: {job_type}")
+        job = models.Job(job_type=job_type, status=PENDING, params=json.dumps(params), state="{}")
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        metrics.inc("jobs_submitted_total", job_type=job_type)
+        self._enqueue(job.id, job_type)
+        return job
+
+    def resume(self):
+        """Поставить в очередь незавершенные задания (при старте процесса)"""
+        stale_before = datetime.utcnow() - timedelta(seconds=JOB_STALE_SECONDS)
+        db = SessionLocal()
+        try:
+            jobs = db.query(models.Job.id, models.Job.job_type).filter(
+                or_(
+                    models.Job.status == PENDING,
+                    (models.Job.status == RUNNING) & (models.Job.heartbeat_at < stale_before)
+                )
+            ).order_by(models.Job.id).all()
+        finally:
+            db.close()
+        for job_id, job_type in jobs:
+            if job_type in self.types:
+                self._enqueue(job_id, job_type)
+        return len(jobs)
+
+    def shutdown(self):
+        """Остановить задания после текущего чанка; они вернутся в pending"""
+        self._stopping.set()
+        with self._lock:
+            paused, self._paused = self._paused, {}
+        for job_id, (_, timer) in paused.items():
+            timer.cancel()
+            self._set_status(job_id, PENDING)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _enqueue(self, job_id: int, job_type: str):
+        with self._lock:
+            self._queue.append((job_id, job_type))
+        self._dispatch()
+
+    def _dispatch(self):
+        """Запустить задания из очереди, для типов которых есть свободные слоты"""
+        with self._lock:
+            if self._stopping.is_set():
+                return
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+            for item in list(self._queue):
+                job_id, job_type = item
+                if self._running.get(job_type, 0) >= self.types[job_type].max_concurrency:
+                    continue
+                # задания в паузе держат слот своего типа, но не поток
+                if sum(self._running.values()) - len(self._paused) >= self.workers:
+                    break
+                self._queue.remove(item)
+                self._running[job_type] = self._running.get(job_type, 0) + 1
+                self._executor.submit(self._run, job_id, job_type)
+
+    def _claim(self, job_id: int) -> bool:
+        """Атомарно перевести задание в running; False - его выполняет другой процесс"""
+        now = datetime.utcnow()
+        stale_before = now - timedelta(seconds=JOB_STALE_SECONDS)
+        db = SessionLocal()
+        try:
+            claimed = db.execute(
+                update(models.Job)
+                .where(
+                    models.Job.id == job_id,
+                    or_(
+                        models.Job.status == PENDING,
+                        (models.Job.status == RUNNING) & (models.Job.heartbeat_at < stale_before)
+                    )
+                )
+                .values(
+                    status=RUNNING,
+                    started_at=func.coalesce(models.Job.started_at, now),
+                    heartbeat_at=now
+                )
+            ).rowcount
+            db.commit()
+            return claimed == 1
+        finally:
+            db.close()
+
+    def _run(self, job_id: int, job_type: str, claimed: bool = False):
+        delay = None
+        try:
+            if claimed or self._claim(job_id):
+                delay = self._run_chunks(job_id, job_type)
+        except Exception:
+            logger.exception("Job %s failed to run", job_id)
+        finally:
+            if delay is not None:
+                # слот типа остается занятым до продолжения, чтобы пауза не пропускала другие задания типа
+                timer = threading.Timer(delay, self._continue, (job_id, job_type))
+                timer.daemon = True
+                with self._lock:
+                    self._paused[job_id] = (job_type, timer)
+                timer.start()
+            else:
+                with self._lock:
+                    self._running[job_type] -= 1
+            self._dispatch()
+
+    def _continue(self, job_id: int, job_type: str):
+        """Продолжить задание после паузы между чанками"""
+        with self._lock:
+            # нет в _paused - shutdown уже вернул задание в pending
+            if self._paused.pop(job_id, None) is None:
+                return
+            try:
+                self._executor.submit(self._run, job_id, job_type, True)
+                return
+            except RuntimeError:
+                # пул останавливается
+                pass
+        self._set_status(job_id, PENDING)
+
+    def _run_chunks(self, job_id: int, job_type: str) -> Optional[float]:
+        """Выполнять чанки до завершения; пауза перед следующим чанком, если он ее запросил"""
+        spec = self.types[job_type]
+        while True:
+            if self._stopping.is_set():
+                self._set_status(job_id, PENDING)
+                return None
+
+            db = SessionLocal()
+            try:
+                job = db.get(models.Job, job_id)
+                chunk = spec.step(
+                    db,
+                    json.loads(job.params),
+                    json.loads(job.state),
+                    json.loads(job.result) if job.result else {}
+                )
+                job.state = json.dumps(chunk.state)
+                job.result = json.dumps(chunk.result, default=str)
+                job.processed += chunk.processed
+                if chunk.total is not None:
+                    job.total = chunk.total
+                job.heartbeat_at = datetime.utcnow()
+                if chunk.done:
+                    job.status = COMPLETED
+                    job.finished_at = job.heartbeat_at
+                db.commit()
+            except Exception as exc:
+                db.rollback()
+                logger.exception("Job %s chunk failed", job_id)
+                self._set_status(job_id, FAILED, error=str(exc))
+                metrics.inc("jobs_finished_total", job_type=job_type, status=FAILED)
+                return None
+            finally:
+                db.close()
+
+            metrics.inc("job_chunks_total", job_type=job_type)
+            if chunk.after_commit is not None:
+                chunk.after_commit()
+            if chunk.done:
+                metrics.inc("jobs_finished_total", job_type=job_type, status=COMPLETED)
+                return None
+            if chunk.delay > 0:
+                return chunk.delay
+
+    def _set_status(self, job_id: int, status: str, error: Optional[str] = None):
+        db = SessionLocal()
+        try:
+            values = {"status": status, "error": error}
+            if status == FAILED:
+                values["finished_at"] = datetime.utcnow()
+            db.execute(update(models.Job).where(models.Job.id == job_id).values(**values))
+            db.commit()
+        finally:
+            db.close()
+
+
+job_runner = JobRunner(JOB_WORKERS)
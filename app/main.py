@@ -1,39 +1,109 @@
 from fastapi import FastAPI, Depends, HTTPException, Header, Request, Query, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials, APIKeyHeader
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, update, insert, exists, select, tuple_
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime, timedelta
-from typing import Optional, List
-import jwt
+from typing import Optional, List, Tuple
+from functools import lru_cache
+from contextlib import asynccontextmanager, contextmanager
 import json
 import time
 import os
+import logging
 from dotenv import load_dotenv
-from passlib.context import CryptContext
 
-from app.database import get_db
-from app import models, schemas
+from app.security import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.database import get_db, get_read_db, router, warm_up_pool, db_breaker, is_read_your_writes, committed_prefix
+from app.dbhealth import db_health
+from app.metrics import metrics
+from app import models, schemas, profiler, events, queries, jobs, export, facets, batch, quotas
+from app.singleflight import read_coalescer, request_key
+from app.cache import list_cache
+from app.encoding import negotiated_response
+from app.read_model import books_read_model
+from app.isbn_index import isbn_index
+from app.memprofile import (
+    memory_profiler, PROFILE_MEMORY_TRACING, PROFILE_MEMORY_FRAMES, GROUP_BY as MEMORY_GROUP_BY
+)
+from app.facets import parse_facets
+from app.tenancy import DEFAULT_TENANT, user_tenant
+from app.jobs import job_runner, ChunkResult, JOB_CHUNK_SIZE
+from app.middleware import (
+    RateLimitMiddleware, ConcurrencyLimitMiddleware, ProfilingMiddleware, CompressionMiddleware,
+    SkipRules, DOCS_SUFFIXES, STREAM_SUFFIXES, charge_quota, rate_limited_response
+)
 
 load_dotenv()
 
-SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
-ALGORITHM = os.getenv("ALGORITHM", "HS256")
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
-RATE_LIMIT_REQUESTS = int(os.getenv("RATE_LIMIT_REQUESTS", "10"))
-RATE_LIMIT_WINDOW = int(os.getenv("RATE_LIMIT_WINDOW", "60"))
 INTERNAL_API_KEY = os.getenv("INTERNAL_API_KEY", "internal-secret-key-12345")
+MULTI_GET_MAX_IDS = int(os.getenv("MULTI_GET_MAX_IDS", "500"))
+BULK_DELETE_JOB_CONCURRENCY = int(os.getenv("BULK_DELETE_JOB_CONCURRENCY", "2"))
+# Изменения книг V1 пишутся и в books_v2 (включается на время переноса books_v1, до BOOKS_V1_PROJECTION)
+BOOKS_V1_DUAL_WRITE = os.getenv("BOOKS_V1_DUAL_WRITE", "false").lower() == "true"
+# /api/v1/books читает и пишет books_v2 (после переноса books_v1 заданием backfill_books_v1)
+BOOKS_V1_PROJECTION = os.getenv("BOOKS_V1_PROJECTION", "false").lower() == "true"
+# Пауза между чанками переноса books_v1, секунды
+BOOKS_V1_BACKFILL_THROTTLE = float(os.getenv("BOOKS_V1_BACKFILL_THROTTLE", "0.05"))
+BOOKS_V1_CREATE_ATTEMPTS = 3
+# Каталог с заранее сгенерированными схемами OpenAPI (scripts/export_openapi.py)
+OPENAPI_DIR = os.getenv("OPENAPI_DIR", "")
+
+logger = logging.getLogger("app.startup")
+
+# Таблицы, от которых зависят закэшированные списки
+BOOKS_V1_TABLES = ("books_v2", "authors") if BOOKS_V1_PROJECTION else ("books_v1",)
+# Изменение книги V1 затрагивает и ее проекцию в books_v2, если она ведется
+BOOKS_V1_WRITE_TABLES = (
+    ("books_v1", "books_v2", "authors") if BOOKS_V1_DUAL_WRITE or BOOKS_V1_PROJECTION else ("books_v1",)
+)
+AUTHORS_TABLES = ("authors",)
+BOOKS_V2_TABLES = ("books_v2", "authors")
+
+# Поля, которые нельзя обнулить через PATCH (NOT NULL в БД)
+BOOK_V1_REQUIRED_FIELDS = ("title", "author", "year", "isbn")
+BOOK_V2_REQUIRED_FIELDS = ("title", "author_id", "year", "isbn")
 
 START_TIME = datetime.utcnow()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 api_key_header = APIKeyHeader(name="X-Internal-API-Key", auto_error=False)
 
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    """
+    Прогрев при старте: соединения пула и модель чтения; продолжение
+    незавершенных фоновых заданий, запуск фоновой проверки БД и загрузки
+    индекса ISBN (проверки ISBN идут в БД, пока он не загружен). При
+    остановке задания прерываются после текущего чанка и возвращаются
+    в очередь.
+
+    Ошибка прогрева не останавливает запуск - соединения будут открыты
+    первыми запросами, как без прогрева.
+    """
+    try:
+        await run_in_threadpool(warm_up_pool)
+        if books_read_model.enabled:
+            await run_in_threadpool(books_read_model.warm_up)
+        await run_in_threadpool(job_runner.resume)
+    except Exception:
+        logger.exception("Startup warm-up failed")
+    db_health.start()
+    isbn_index.start()
+    if PROFILE_MEMORY_TRACING:
+        memory_profiler.start()
+    yield
+    await db_health.stop()
+    await run_in_threadpool(job_runner.shutdown)
+
 app = FastAPI(
     title="Library Management API",
     description="REST API для управления библиотекой с поддержкой версионирования, пагинации и опциональных полей",
-    version="2.1.0"
+    version="2.1.0",
+    lifespan=lifespan
 )
 
 app_v1 = FastAPI(
@@ -55,71 +125,47 @@ app_internal = FastAPI(
 )
 
 
-@app.middleware("http")
-async def rate_limit_middleware(request: Request, call_next):
-    if request.url.path.startswith("/internal"):
-        return await call_next(request)
-    
-    client_ip = request.client.host
-    current_time = datetime.utcnow()
-    
-    db = next(get_db())
-    
-    try:
-        old_time = current_time - timedelta(seconds=RATE_LIMIT_WINDOW)
-        db.query(models.RateLimit).filter(
-            models.RateLimit.client_ip == client_ip,
-            models.RateLimit.request_time < old_time
-        ).delete()
-        
-        request_count = db.query(models.RateLimit).filter(
-            models.RateLimit.client_ip == client_ip
-        ).count()
-        
-        if request_count >= RATE_LIMIT_REQUESTS:
-            oldest_request = db.query(models.RateLimit).filter(
-                models.RateLimit.client_ip == client_ip
-            ).order_by(models.RateLimit.request_time).first()
-            
-            retry_after = int(RATE_LIMIT_WINDOW - (current_time - oldest_request.request_time).total_seconds())
-            
-            return JSONResponse(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                content={"detail": "Rate limit exceeded"},
-                headers={
-                    "X-Limit-Remaining": "0",
-                    "Retry-After": str(retry_after)
-                }
-            )
-        
-        rate_limit = models.RateLimit(
-            client_ip=client_ip,
-            request_time=current_time,
-            endpoint=str(request.url.path)
-        )
-        db.add(rate_limit)
-        db.commit()
-        
-        response = await call_next(request)
-        
-        remaining = RATE_LIMIT_REQUESTS - request_count - 1
-        response.headers["X-Limit-Remaining"] = str(remaining)
-        
-        return response
-        
-    finally:
-        db.close()
+# Последний добавленный слой - внешний: профилирование охватывает и rate limiting.
+# Ограничитель параллельности стоит перед rate limiting, чтобы при перегрузке
+# отклонять запросы до обращения к БД; сжатие - внутренний слой
+app.add_middleware(CompressionMiddleware, skip=SkipRules(suffixes=STREAM_SUFFIXES))
+app.add_middleware(
+    RateLimitMiddleware,
+    # квоту пакета учитывает сам обработчик по стоимости операций; проверки
+    # балансировщика (/health) не расходуют квоту: учет квоты обращается к БД,
+    # и при ее отказе /health отвечал бы 503 ограничителя вместо отчета degraded
+    skip=SkipRules(prefixes=("/internal", "/health", batch.BATCH_PATH), suffixes=DOCS_SUFFIXES)
+)
+app.add_middleware(
+    ConcurrencyLimitMiddleware,
+    skip=SkipRules(suffixes=DOCS_SUFFIXES + STREAM_SUFFIXES)
+)
+app.add_middleware(ProfilingMiddleware, skip=SkipRules(suffixes=DOCS_SUFFIXES + STREAM_SUFFIXES))
+
+# passlib (bcrypt) и PyJWT импортируются при первом использовании, а не при старте процесса
+
+@lru_cache(maxsize=1)
+def get_pwd_context():
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def create_access_token(data: dict):
+    import jwt
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 def verify_token(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
 ) -> models.User:
+    import jwt
+    # подзапрос пакета: токен уже проверен при входе POST /api/v2/batch
+    batch_user = request.scope.get(batch.BATCH_USER)
+    if batch_user is not None:
+        return batch_user
     try:
         token = credentials.credentials
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -127,7 +173,7 @@ def verify_token(
         if username is None:
             raise HTTPException(status_code=401, detail="Invalid authentication credentials")
         
-        user = db.query(models.User).filter(models.User.username == username).first()
+        user = queries.user_by_username(db, username)
         if user is None:
             raise HTTPException(status_code=401, detail="User not found")
         
@@ -146,16 +192,26 @@ def verify_internal_api_key(api_key: str = Depends(api_key_header)):
         )
     return True
 
+def tenant_key(tenant: str, idempotency_key: str) -> str:
+    """Ключ идемпотентности в пространстве арендатора"""
+    return f"{tenant}:{idempotency_key}"
+
 def check_idempotency(
     idempotency_key: Optional[str],
     resource_type: str,
-    db: Session
+    db: Session,
+    tenant: str
 ) -> Optional[dict]:
     if not idempotency_key:
         return None
     
+    keys = [tenant_key(tenant, idempotency_key)]
+    # ключи, сохраненные до разделения по арендаторам (без префикса), принадлежат
+    # арендатору по умолчанию; ключ с ":" мог бы совпасть с ключом другого арендатора
+    if tenant == DEFAULT_TENANT and ":" not in idempotency_key:
+        keys.append(idempotency_key)
     stored = db.query(models.IdempotencyKey).filter(
-        models.IdempotencyKey.key == idempotency_key,
+        models.IdempotencyKey.key.in_(keys),
         models.IdempotencyKey.resource_type == resource_type
     ).first()
     
@@ -172,7 +228,8 @@ def store_idempotency(
     idempotency_key: str,
     resource_type: str,
     response: dict,
-    db: Session
+    db: Session,
+    tenant: str
 ):
     if idempotency_key:
         response_copy = response.copy()
@@ -181,13 +238,56 @@ def store_idempotency(
                 response_copy[key] = value.isoformat()
         
         idempotency = models.IdempotencyKey(
-            key=idempotency_key,
+            key=tenant_key(tenant, idempotency_key),
             resource_type=resource_type,
             response_data=json.dumps(response_copy)
         )
         db.add(idempotency)
         db.commit()
 
+def record_change(db: Session, tenant: str, entity_type: str, entity_id: int, operation: str):
+    """Запись в журнал изменений в той же транзакции, что и само изменение"""
+    db.add(models.ChangeLog(
+        tenant_id=tenant,
+        entity_type=entity_type,
+        entity_id=entity_id,
+        operation=operation
+    ))
+
+def patch_changes(patch, required_fields) -> dict:
+    """Переданные в PATCH поля; обязательные поля нельзя обнулить"""
+    changes = patch.dict(exclude_unset=True)
+    null_fields = [field for field in required_fields if field in changes and changes[field] is None]
+    if null_fields:
+        raise HTTPException(status_code=400, detail=f"Fields cannot be null: {', '.join(null_fields)}")
+    return changes
+
+async def cached_read(request: Request, tenant: str, tables, fn, *args):
+    """
+    Чтение списка через кэш поколений и объединение одинаковых запросов.
+    Поколение фиксируется до вычисления: если во время вычисления
+    произошла запись, результат сохранится под устаревшим поколением.
+    
+    В кэше хранится уже подготовленный для сериализации объект
+    (jsonable_encoder), чтобы попадания не повторяли преобразование.
+    Кэш и объединение запросов разделены по арендаторам.
+    
+    Ключ включает цель маршрута чтения. Чтение в окне read-your-writes
+    идет мимо кэша: запись клиента могла еще не дойти до реплики, с
+    которой другой клиент заполнил кэш под новым поколением.
+    """
+    key = request_key(request)
+    endpoint = request.url.path
+    if is_read_your_writes(key[-1]):
+        return jsonable_encoder(await read_coalescer.run((tenant,) + key, endpoint, fn, *args))
+    generation = list_cache.generation(tables, tenant)
+    cached = list_cache.get(key, generation, endpoint, tenant)
+    if cached is not None:
+        return cached
+    result = jsonable_encoder(await read_coalescer.run((tenant,) + key, endpoint, fn, *args))
+    list_cache.put(key, generation, result, tenant)
+    return result
+
 def create_paginated_response(
     items: List,
     total: int,
@@ -220,6 +320,79 @@ def filter_fields(obj, fields: Optional[str]):
     requested_fields = [f.strip() for f in fields.split(',')]
     return {k: v for k, v in data.items() if k in requested_fields}
 
+def parse_id_list(ids: str) -> List[int]:
+    """Разбор списка ID вида 1,2,3"""
+    try:
+        return [int(part) for part in ids.split(',') if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma-separated list of integers")
+
+def unique_ids(ids: List[int]) -> List[int]:
+    """Уникальные ID в порядке запроса с проверкой лимита"""
+    ordered = list(dict.fromkeys(ids))
+    if not ordered:
+        raise HTTPException(status_code=400, detail="ids must not be empty")
+    if len(ordered) > MULTI_GET_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"Too many ids (max {MULTI_GET_MAX_IDS})")
+    return ordered
+
+def multi_get_books_v2(
+    db: Session,
+    tenant: str,
+    ids: List[int],
+    fields: Optional[str],
+    include_author: bool
+) -> schemas.MultiGetResponse:
+    """Книги V2 по списку ID: один IN-запрос и один пакетный запрос авторов"""
+    ordered = unique_ids(ids)
+    books = {
+        book.id: book
+        for book in db.query(models.BookV2).filter(models.BookV2.tenant_id == tenant, models.BookV2.id.in_(ordered))
+    }
+    
+    authors = {}
+    if include_author and books:
+        author_ids = {book.author_id for book in books.values()}
+        authors = {
+            author.id: schemas.AuthorMinimal.from_orm(author).dict()
+            for author in db.query(models.Author).filter(models.Author.id.in_(author_ids))
+        }
+    
+    items = []
+    missing_ids = []
+    for book_id in ordered:
+        book = books.get(book_id)
+        if book is None:
+            missing_ids.append(book_id)
+            continue
+        if include_author:
+            book_dict = schemas.BookV2Extended.from_orm(book).dict()
+            book_dict['author'] = authors.get(book.author_id)
+        else:
+            book_dict = schemas.BookV2Response.from_orm(book).dict()
+        items.append(filter_fields(book_dict, fields))
+    
+    return schemas.MultiGetResponse(items=items, missing_ids=missing_ids)
+
+def multi_get_authors(db: Session, tenant: str, ids: List[int], fields: Optional[str]) -> schemas.MultiGetResponse:
+    """Авторы по списку ID одним IN-запросом"""
+    ordered = unique_ids(ids)
+    authors = {
+        author.id: author
+        for author in db.query(models.Author).filter(models.Author.tenant_id == tenant, models.Author.id.in_(ordered))
+    }
+    
+    items = []
+    missing_ids = []
+    for author_id in ordered:
+        author = authors.get(author_id)
+        if author is None:
+            missing_ids.append(author_id)
+            continue
+        items.append(filter_fields(schemas.AuthorResponse.from_orm(author).dict(), fields))
+    
+    return schemas.MultiGetResponse(items=items, missing_ids=missing_ids)
+
 @app.post("/auth/login", response_model=schemas.Token, tags=["Authentication"])
 async def login(user: schemas.UserLogin, db: Session = Depends(get_db)):
     """
@@ -231,14 +404,185 @@ async def login(user: schemas.UserLogin, db: Session = Depends(get_db)):
     - Безопасность (цифровая подпись)
     - Стандартизация
     """
-    db_user = db.query(models.User).filter(models.User.username == user.username).first()
+    db_user = queries.user_by_username(db, user.username)
     
-    if not db_user or not pwd_context.verify(user.password, db_user.hashed_password):
+    if not db_user or not get_pwd_context().verify(user.password, db_user.hashed_password):
         raise HTTPException(status_code=401, detail="Incorrect username or password")
     
-    access_token = create_access_token(data={"sub": user.username})
+    access_token = create_access_token(
+        data={"sub": user.username, "role": db_user.role, "tenant": user_tenant(db_user)}
+    )
     return {"access_token": access_token, "token_type": "bearer"}
 
+def v1_author(db: Session, tenant: str, name: str) -> models.Author:
+    """Автор V2 для имени автора книги V1 (создается, если такого нет)"""
+    author = db.query(models.Author).filter(
+        models.Author.tenant_id == tenant, models.Author.name == name
+    ).order_by(models.Author.id).first()
+    if author is None:
+        author = models.Author(name=name, tenant_id=tenant)
+        db.add(author)
+        db.flush()
+        record_change(db, tenant, "author", author.id, "create")
+    return author
+
+def apply_book_v1(
+    db: Session,
+    tenant: str,
+    v1_id: int,
+    book: Optional[models.BookV2],
+    values: dict
+) -> Tuple[models.BookV2, Optional[str]]:
+    """
+    Создать или обновить строку books_v2 книги V1 (без flush).
+    Возвращает книгу и операцию для журнала изменений; None - строка
+    уже совпадает с данными V1 (повторный перенос ничего не меняет).
+    """
+    if book is None:
+        book = models.BookV2(**values, tenant_id=tenant, v1_id=v1_id)
+        db.add(book)
+        isbn_index.add("books_v2", tenant, values["isbn"])
+        return book, "create"
+    if book.v1_id == v1_id and all(getattr(book, key) == value for key, value in values.items()):
+        return book, None
+    if book.isbn != values["isbn"]:
+        isbn_index.add("books_v2", tenant, values["isbn"])
+        isbn_index.mark_stale("books_v2")
+    for key, value in values.items():
+        setattr(book, key, value)
+    book.v1_id = v1_id
+    book.updated_at = datetime.utcnow()
+    return book, "update"
+
+def mirror_book_v1(
+    db: Session,
+    tenant: str,
+    v1_id: int,
+    data: dict,
+    created_at: Optional[datetime] = None
+) -> Optional[models.BookV2]:
+    """
+    Записать книгу V1 в books_v2 (upsert по v1_id) в текущей транзакции.
+    
+    Книга V2 арендатора с тем же ISBN и без v1_id считается той же книгой
+    и получает v1_id, а created_at - из V1, чтобы ответ V1 не изменился.
+    Возвращает None, если строка books_v2 уже совпадает с данными V1.
+    """
+    author = v1_author(db, tenant, data["author"])
+    values = {"title": data["title"], "author_id": author.id, "year": data["year"], "isbn": data["isbn"]}
+    if created_at is not None:
+        values["created_at"] = created_at
+    
+    book = db.query(models.BookV2).filter(models.BookV2.v1_id == v1_id).first()
+    if book is None:
+        book = db.query(models.BookV2).filter(
+            models.BookV2.tenant_id == tenant,
+            models.BookV2.isbn == data["isbn"],
+            models.BookV2.v1_id.is_(None)
+        ).first()
+    previous_author_id = book.author_id if book is not None else None
+    book, operation = apply_book_v1(db, tenant, v1_id, book, values)
+    if operation is None:
+        return None
+    db.flush()
+    record_change(db, tenant, "book", book.id, operation)
+    queries.refresh_author_stats(db, [previous_author_id, author.id])
+    return book
+
+def mirror_books_v1(db: Session, rows: List[models.BookV1]) -> List[models.BookV2]:
+    """
+    Порция строк books_v1 в books_v2 с той же логикой, что и
+    mirror_book_v1, но пачкой: авторы и книги V2 выбираются одним запросом
+    на порцию, запись - одним flush, статистика авторов пересчитывается
+    один раз. Возвращает измененные книги V2.
+    """
+    names = {(row.tenant_id, row.author) for row in rows}
+    authors = {}
+    # по убыванию id: при одноименных авторах остается первый, как в v1_author
+    for author in db.query(models.Author).filter(
+        tuple_(models.Author.tenant_id, models.Author.name).in_(names)
+    ).order_by(models.Author.id.desc()):
+        authors[(author.tenant_id, author.name)] = author
+    new_authors = [models.Author(tenant_id=tenant, name=name) for tenant, name in names - authors.keys()]
+    db.add_all(new_authors)
+    db.flush()
+    for author in new_authors:
+        authors[(author.tenant_id, author.name)] = author
+        record_change(db, author.tenant_id, "author", author.id, "create")
+    
+    by_v1_id = {
+        book.v1_id: book
+        for book in db.query(models.BookV2).filter(models.BookV2.v1_id.in_([row.id for row in rows]))
+    }
+    by_isbn = {
+        (book.tenant_id, book.isbn): book
+        for book in db.query(models.BookV2).filter(
+            models.BookV2.v1_id.is_(None),
+            tuple_(models.BookV2.tenant_id, models.BookV2.isbn).in_({(row.tenant_id, row.isbn) for row in rows})
+        )
+    }
+    
+    changed = []
+    author_ids = set()
+    for row in rows:
+        book = by_v1_id.get(row.id) or by_isbn.pop((row.tenant_id, row.isbn), None)
+        previous_author_id = book.author_id if book is not None else None
+        author = authors[(row.tenant_id, row.author)]
+        book, operation = apply_book_v1(db, row.tenant_id, row.id, book, {
+            "title": row.title, "author_id": author.id, "year": row.year,
+            "isbn": row.isbn, "created_at": row.created_at,
+        })
+        if operation is not None:
+            changed.append((book, operation))
+            author_ids.update((previous_author_id, author.id))
+    db.flush()
+    for book, operation in changed:
+        record_change(db, book.tenant_id, "book", book.id, operation)
+    queries.refresh_author_stats(db, author_ids)
+    return [book for book, _ in changed]
+
+def unmirror_book_v1(db: Session, tenant: str, v1_id: int) -> bool:
+    """Удалить проекцию книги V1 из books_v2 в текущей транзакции"""
+    book = db.query(models.BookV2).filter(
+        models.BookV2.tenant_id == tenant, models.BookV2.v1_id == v1_id
+    ).first()
+    if book is None:
+        return False
+    db.delete(book)
+    isbn_index.mark_stale("books_v2")
+    record_change(db, tenant, "book", book.id, "delete")
+    queries.refresh_author_stats(db, [book.author_id])
+    return True
+
+def v1_response(book: models.BookV2, author_name: str) -> dict:
+    """Книга V2 в схеме ответа V1 (ID книги - v1_id)"""
+    return schemas.BookV1Response(
+        title=book.title,
+        author=author_name,
+        year=book.year,
+        isbn=book.isbn,
+        id=book.v1_id,
+        created_at=book.created_at
+    ).dict()
+
+def next_book_v1_id(db: Session) -> int:
+    """Следующий ID книги V1 в режиме проекции (ID сквозные для всех арендаторов)"""
+    return (db.query(func.max(models.BookV2.v1_id)).scalar() or 0) + 1
+
+@contextmanager
+def book_v1_transaction(db: Session, tenant: str):
+    """
+    Изменение книги V1 (и ее проекции в books_v2 при BOOKS_V1_DUAL_WRITE)
+    одной транзакцией. Занятый ISBN (в books_v1 или books_v2) - ошибка 400.
+    """
+    try:
+        yield
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Book with this ISBN already exists")
+    list_cache.bump(*BOOKS_V1_WRITE_TABLES, tenant=tenant)
+
 @app_v1.post("/books", response_model=schemas.BookV1Response, status_code=201, tags=["Books V1"])
 async def create_book_v1(
     book: schemas.BookV1Create,
@@ -247,31 +591,91 @@ async def create_book_v1(
     db: Session = Depends(get_db)
 ):
     """Создание новой книги (версия 1) с поддержкой идемпотентности."""
-    cached_response = check_idempotency(idempotency_key, "book_v1", db)
+    tenant = user_tenant(user)
+    cached_response = check_idempotency(idempotency_key, "book_v1", db, tenant)
     if cached_response:
         return cached_response
     
-    existing = db.query(models.BookV1).filter(models.BookV1.isbn == book.isbn).first()
-    if existing:
-        raise HTTPException(status_code=400, detail="Book with this ISBN already exists")
+    if BOOKS_V1_PROJECTION:
+        if isbn_index.exists(db, "books_v2", tenant, book.isbn):
+            raise HTTPException(status_code=400, detail="Book with this ISBN already exists")
+        # v1_id выделяется как max + 1: при гонке двух созданий один повторяет попытку
+        for attempt in range(BOOKS_V1_CREATE_ATTEMPTS):
+            db_book = mirror_book_v1(db, tenant, next_book_v1_id(db), book.dict())
+            try:
+                db.commit()
+                break
+            except IntegrityError:
+                db.rollback()
+                if attempt == BOOKS_V1_CREATE_ATTEMPTS - 1 or queries.book_v2_isbn_exists(db, tenant, book.isbn):
+                    raise HTTPException(status_code=400, detail="Book with this ISBN already exists")
+        list_cache.bump(*BOOKS_V1_WRITE_TABLES, tenant=tenant)
+        response = v1_response(db_book, book.author)
+    else:
+        if isbn_index.exists(db, "books_v1", tenant, book.isbn):
+            raise HTTPException(status_code=400, detail="Book with this ISBN already exists")
+        db_book = models.BookV1(**book.dict(), tenant_id=tenant)
+        # ISBN, занятый после проверки (или не попавший в индекс), отклоняет уникальный индекс
+        with book_v1_transaction(db, tenant):
+            db.add(db_book)
+            db.flush()
+            isbn_index.add("books_v1", tenant, book.isbn)
+            if BOOKS_V1_DUAL_WRITE:
+                mirror_book_v1(db, tenant, db_book.id, book.dict(), db_book.created_at)
+        db.refresh(db_book)
+        response = schemas.BookV1Response.from_orm(db_book).dict()
+    
+    store_idempotency(idempotency_key, "book_v1", response, db, tenant)
+    
+    return response
+
+def list_books_v1(db: Session, tenant: str, page: int, page_size: int, fields: Optional[str]):
+    """Страница книг V1 (выполняется в пуле потоков через read_coalescer)"""
+    if BOOKS_V1_PROJECTION:
+        return list_books_v1_projection(db, tenant, page, page_size, fields)
     
-    db_book = models.BookV1(**book.dict())
-    db.add(db_book)
-    db.commit()
-    db.refresh(db_book)
+    query = db.query(models.BookV1).filter(models.BookV1.tenant_id == tenant)
+    total = query.count()
     
-    response = schemas.BookV1Response.from_orm(db_book).dict()
-    store_idempotency(idempotency_key, "book_v1", response, db)
+    offset = (page - 1) * page_size
+    books = query.order_by(models.BookV1.id).offset(offset).limit(page_size).all()
     
-    return db_book
+    if fields:
+        items = [filter_fields(schemas.BookV1Response.from_orm(book), fields) for book in books]
+    else:
+        items = [schemas.BookV1Response.from_orm(book).dict() for book in books]
+    
+    return create_paginated_response(items, total, page, page_size)
+
+def list_books_v1_projection(db: Session, tenant: str, page: int, page_size: int, fields: Optional[str]):
+    """Страница книг V1 из books_v2: строки с v1_id в порядке v1_id, автор - по author_id"""
+    total = db.query(func.count(models.BookV2.id)).filter(
+        models.BookV2.tenant_id == tenant, models.BookV2.v1_id.isnot(None)
+    ).scalar()
+    
+    offset = (page - 1) * page_size
+    # страница выбирается по индексу (tenant_id, v1_id), авторы присоединяются только к ней
+    page_ids = select(models.BookV2.id).where(
+        models.BookV2.tenant_id == tenant, models.BookV2.v1_id.isnot(None)
+    ).order_by(models.BookV2.v1_id).offset(offset).limit(page_size)
+    rows = db.query(models.BookV2, models.Author.name).join(
+        models.Author, models.Author.id == models.BookV2.author_id
+    ).filter(models.BookV2.id.in_(page_ids.scalar_subquery())).order_by(models.BookV2.v1_id).all()
+    
+    items = [v1_response(book, author_name) for book, author_name in rows]
+    if fields:
+        items = [filter_fields(item, fields) for item in items]
+    
+    return create_paginated_response(items, total, page, page_size)
 
 @app_v1.get("/books", tags=["Books V1"])
 async def get_books_v1(
+    request: Request,
     user: models.User = Depends(verify_token),
     page: int = Query(1, ge=1, description="Номер страницы"),
     page_size: int = Query(10, ge=1, le=100, description="Размер страницы"),
     fields: Optional[str] = Query(None, description="Список полей через запятую (id,title,author)"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Получение списка всех книг (версия 1) с пагинацией и опциональными полями.
@@ -282,33 +686,29 @@ async def get_books_v1(
     **Опциональные поля**: Параметр fields позволяет выбрать нужные поля
     **Пример**: ?fields=id,title,author
     """
-    query = db.query(models.BookV1)
-    total = query.count()
-    
-    offset = (page - 1) * page_size
-    books = query.offset(offset).limit(page_size).all()
-    
-    if fields:
-        items = [filter_fields(schemas.BookV1Response.from_orm(book), fields) for book in books]
-    else:
-        items = [schemas.BookV1Response.from_orm(book).dict() for book in books]
-    
-    return create_paginated_response(items, total, page, page_size)
+    tenant = user_tenant(user)
+    return negotiated_response(request, await cached_read(
+        request, tenant, BOOKS_V1_TABLES, list_books_v1, db, tenant, page, page_size, fields
+    ))
 
 @app_v1.get("/books/{book_id}", response_model=schemas.BookV1Response, tags=["Books V1"])
 async def get_book_v1(
     book_id: int,
     user: models.User = Depends(verify_token),
     fields: Optional[str] = Query(None, description="Список полей через запятую"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Получение книги по ID (версия 1) с опциональными полями."""
-    book = db.query(models.BookV1).filter(models.BookV1.id == book_id).first()
+    if BOOKS_V1_PROJECTION:
+        row = queries.book_v1_projection_by_id(db, user_tenant(user), book_id)
+        book = v1_response(*row) if row else None
+    else:
+        book = queries.book_v1_by_id(db, user_tenant(user), book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
     
     if fields:
-        return filter_fields(schemas.BookV1Response.from_orm(book), fields)
+        return filter_fields(book if BOOKS_V1_PROJECTION else schemas.BookV1Response.from_orm(book), fields)
     return book
 
 @app_v1.put("/books/{book_id}", response_model=schemas.BookV1Response, tags=["Books V1"])
@@ -319,17 +719,78 @@ async def update_book_v1(
     db: Session = Depends(get_db)
 ):
     """Обновление книги (версия 1). Идемпотентная операция."""
-    db_book = db.query(models.BookV1).filter(models.BookV1.id == book_id).first()
+    tenant = user_tenant(user)
+    if BOOKS_V1_PROJECTION:
+        row = queries.book_v1_projection_by_id(db, tenant, book_id)
+        if not row:
+            raise HTTPException(status_code=404, detail="Book not found")
+        with book_v1_transaction(db, tenant):
+            db_book = mirror_book_v1(db, tenant, book_id, book.dict()) or row[0]
+        return v1_response(db_book, book.author)
+    
+    db_book = queries.book_v1_by_id(db, tenant, book_id)
     if not db_book:
         raise HTTPException(status_code=404, detail="Book not found")
     
-    for key, value in book.dict().items():
-        setattr(db_book, key, value)
-    
-    db.commit()
+    with book_v1_transaction(db, tenant):
+        if db_book.isbn != book.isbn:
+            isbn_index.add("books_v1", tenant, book.isbn)
+            isbn_index.mark_stale("books_v1")
+        for key, value in book.dict().items():
+            setattr(db_book, key, value)
+        if BOOKS_V1_DUAL_WRITE:
+            mirror_book_v1(db, tenant, book_id, book.dict(), db_book.created_at)
     db.refresh(db_book)
     return db_book
 
+@app_v1.patch("/books/{book_id}", response_model=schemas.BookV1Response, tags=["Books V1"])
+async def patch_book_v1(
+    book_id: int,
+    patch: schemas.BookV1Update,
+    user: models.User = Depends(verify_token),
+    db: Session = Depends(get_db)
+):
+    """
+    Частичное обновление книги (версия 1).
+    
+    Передаются только изменяемые поля. Изменение выполняется одним
+    UPDATE ... RETURNING без предварительного SELECT (при
+    BOOKS_V1_DUAL_WRITE к нему добавляется запись проекции в books_v2).
+    """
+    tenant = user_tenant(user)
+    changes = patch_changes(patch, BOOK_V1_REQUIRED_FIELDS)
+    if BOOKS_V1_PROJECTION:
+        row = queries.book_v1_projection_by_id(db, tenant, book_id)
+        if not row:
+            raise HTTPException(status_code=404, detail="Book not found")
+        data = {**v1_response(*row), **changes}
+        if changes:
+            with book_v1_transaction(db, tenant):
+                mirror_book_v1(db, tenant, book_id, data)
+        return data
+    
+    if not changes:
+        db_book = queries.book_v1_by_id(db, tenant, book_id)
+        if not db_book:
+            raise HTTPException(status_code=404, detail="Book not found")
+        return db_book
+    
+    table = models.BookV1.__table__
+    with book_v1_transaction(db, tenant):
+        row = db.execute(
+            update(table).where(table.c.tenant_id == tenant, table.c.id == book_id)
+            .values(**changes).returning(*table.c)
+        ).mappings().first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Book not found")
+        if "isbn" in changes:
+            isbn_index.add("books_v1", tenant, row["isbn"])
+            isbn_index.mark_stale("books_v1")
+        if BOOKS_V1_DUAL_WRITE:
+            mirror_book_v1(db, tenant, book_id, row, row["created_at"])
+    
+    return dict(row)
+
 @app_v1.delete("/books/{book_id}", status_code=204, tags=["Books V1"])
 async def delete_book_v1(
     book_id: int,
@@ -337,12 +798,22 @@ async def delete_book_v1(
     db: Session = Depends(get_db)
 ):
     """Удаление книги (версия 1). Идемпотентная операция."""
-    db_book = db.query(models.BookV1).filter(models.BookV1.id == book_id).first()
+    tenant = user_tenant(user)
+    if BOOKS_V1_PROJECTION:
+        with book_v1_transaction(db, tenant):
+            if not unmirror_book_v1(db, tenant, book_id):
+                raise HTTPException(status_code=404, detail="Book not found")
+        return None
+    
+    db_book = queries.book_v1_by_id(db, tenant, book_id)
     if not db_book:
         raise HTTPException(status_code=404, detail="Book not found")
     
-    db.delete(db_book)
-    db.commit()
+    with book_v1_transaction(db, tenant):
+        db.delete(db_book)
+        isbn_index.mark_stale("books_v1")
+        if BOOKS_V1_DUAL_WRITE:
+            unmirror_book_v1(db, tenant, book_id)
     return None
 
 @app_v2.post("/authors", response_model=schemas.AuthorResponse, status_code=201, tags=["Authors V2"])
@@ -353,31 +824,46 @@ async def create_author(
     db: Session = Depends(get_db)
 ):
     """Создание нового автора (только в версии 2)."""
-    cached_response = check_idempotency(idempotency_key, "author", db)
+    tenant = user_tenant(user)
+    cached_response = check_idempotency(idempotency_key, "author", db, tenant)
     if cached_response:
         return cached_response
     
-    db_author = models.Author(**author.dict())
+    db_author = models.Author(**author.dict(), tenant_id=tenant)
     db.add(db_author)
+    db.flush()
+    record_change(db, tenant, "author", db_author.id, "create")
     db.commit()
+    list_cache.bump("authors", tenant=tenant)
     db.refresh(db_author)
     
     response = schemas.AuthorResponse.from_orm(db_author).dict()
-    store_idempotency(idempotency_key, "author", response, db)
+    store_idempotency(idempotency_key, "author", response, db, tenant)
+    events.broker.publish("author", "create", response, tenant)
     
     return db_author
 
-@app_v2.get("/authors", tags=["Authors V2"])
-async def get_authors(
-    user: models.User = Depends(verify_token),
-    page: int = Query(1, ge=1),
-    page_size: int = Query(10, ge=1, le=100),
-    fields: Optional[str] = Query(None, description="Опциональные поля"),
-    db: Session = Depends(get_db)
+def list_authors(
+    db: Session,
+    tenant: str,
+    page: int,
+    page_size: int,
+    fields: Optional[str],
+    ids: Optional[str],
+    sort: str = "id"
 ):
-    """Получение списка всех авторов с пагинацией."""
-    query = db.query(models.Author)
+    """Страница авторов или выборка по ID (выполняется через read_coalescer)"""
+    if ids is not None:
+        return multi_get_authors(db, tenant, parse_id_list(ids), fields)
+    
+    query = db.query(models.Author).filter(models.Author.tenant_id == tenant)
     total = query.count()
+    # порядок (books_count, id) совпадает с индексом ix_authors_tenant_books_count_id
+    sort_column = getattr(models.Author, sort.lstrip("-"))
+    if sort.startswith("-"):
+        query = query.order_by(sort_column.desc(), models.Author.id.desc())
+    else:
+        query = query.order_by(sort_column, models.Author.id)
     
     offset = (page - 1) * page_size
     authors = query.offset(offset).limit(page_size).all()
@@ -389,15 +875,50 @@ async def get_authors(
     
     return create_paginated_response(items, total, page, page_size)
 
+@app_v2.get("/authors", tags=["Authors V2"])
+async def get_authors(
+    request: Request,
+    user: models.User = Depends(verify_token),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(10, ge=1, le=100),
+    fields: Optional[str] = Query(None, description="Опциональные поля"),
+    ids: Optional[str] = Query(None, description="Выборка по списку ID через запятую (1,2,3)"),
+    sort: str = Query("id", pattern=r"^-?(id|books_count)$", description="Сортировка: id, books_count; '-' - по убыванию"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Получение списка всех авторов с пагинацией.
+    
+    С параметром ids возвращает авторов в порядке запроса и список
+    ненайденных ID (missing_ids) вместо страницы.
+    
+    **Популярность:** books_count и latest_book_year хранятся в таблице
+    authors и обновляются при изменении книг V2, поэтому sort=-books_count
+    выполняется по индексу без агрегации по books_v2
+    """
+    tenant = user_tenant(user)
+    return negotiated_response(request, await cached_read(
+        request, tenant, AUTHORS_TABLES, list_authors, db, tenant, page, page_size, fields, ids, sort
+    ))
+
+@app_v2.post("/authors/multi-get", response_model=schemas.MultiGetResponse, tags=["Authors V2"])
+async def multi_get_authors_post(
+    request: schemas.MultiGetRequest,
+    user: models.User = Depends(verify_token),
+    db: Session = Depends(get_read_db)
+):
+    """Получение авторов по списку ID (вариант для длинных списков)."""
+    return multi_get_authors(db, user_tenant(user), request.ids, request.fields)
+
 @app_v2.get("/authors/{author_id}", response_model=schemas.AuthorResponse, tags=["Authors V2"])
 async def get_author(
     author_id: int,
     user: models.User = Depends(verify_token),
     fields: Optional[str] = Query(None),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Получение автора по ID."""
-    author = db.query(models.Author).filter(models.Author.id == author_id).first()
+    author = queries.author_by_id(db, user_tenant(user), author_id)
     if not author:
         raise HTTPException(status_code=404, detail="Author not found")
     
@@ -405,6 +926,60 @@ async def get_author(
         return filter_fields(schemas.AuthorResponse.from_orm(author), fields)
     return author
 
+def list_author_books(
+    db: Session,
+    tenant: str,
+    author_id: int,
+    cursor: Optional[str],
+    limit: int,
+    fields: Optional[str]
+):
+    """Страница книг автора после курсора (выполняется через read_coalescer)"""
+    try:
+        after_id = int(cursor) if cursor else 0
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    if not queries.author_exists(db, tenant, author_id):
+        raise HTTPException(status_code=404, detail="Author not found")
+    
+    books = db.query(models.BookV2).filter(
+        models.BookV2.tenant_id == tenant,
+        models.BookV2.author_id == author_id,
+        models.BookV2.id > after_id
+    ).order_by(models.BookV2.id).limit(limit + 1).all()
+    
+    has_more = len(books) > limit
+    books = books[:limit]
+    items = [filter_fields(schemas.BookV2Response.from_orm(book).dict(), fields) for book in books]
+    
+    return schemas.CursorPage(
+        items=items,
+        next_cursor=str(books[-1].id) if has_more else None,
+        has_more=has_more
+    )
+
+@app_v2.get("/authors/{author_id}/books", tags=["Authors V2"])
+async def get_author_books(
+    request: Request,
+    author_id: int,
+    user: models.User = Depends(verify_token),
+    cursor: Optional[str] = Query(None, description="Курсор из next_cursor предыдущего ответа"),
+    limit: int = Query(20, ge=1, le=100),
+    fields: Optional[str] = Query(None, description="Опциональные поля"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Книги автора с курсорной пагинацией (по возрастанию ID).
+    
+    Курсор - ID последней полученной книги; страница читается по индексу
+    (tenant_id, author_id, id) без OFFSET, поэтому стоимость не растет с номером страницы.
+    """
+    tenant = user_tenant(user)
+    return negotiated_response(request, await cached_read(
+        request, tenant, BOOKS_V2_TABLES, list_author_books, db, tenant, author_id, cursor, limit, fields
+    ))
+
 @app_v2.post("/books", response_model=schemas.BookV2Response, status_code=201, tags=["Books V2"])
 async def create_book_v2(
     book: schemas.BookV2Create,
@@ -413,52 +988,86 @@ async def create_book_v2(
     db: Session = Depends(get_db)
 ):
     """Создание новой книги (версия 2) с расширенными полями."""
-    cached_response = check_idempotency(idempotency_key, "book_v2", db)
+    tenant = user_tenant(user)
+    cached_response = check_idempotency(idempotency_key, "book_v2", db, tenant)
     if cached_response:
         return cached_response
     
-    author = db.query(models.Author).filter(models.Author.id == book.author_id).first()
-    if not author:
+    if not queries.author_exists(db, tenant, book.author_id):
         raise HTTPException(status_code=400, detail="Author not found")
     
-    existing = db.query(models.BookV2).filter(models.BookV2.isbn == book.isbn).first()
-    if existing:
+    if isbn_index.exists(db, "books_v2", tenant, book.isbn):
         raise HTTPException(status_code=400, detail="Book with this ISBN already exists")
     
-    db_book = models.BookV2(**book.dict())
-    db.add(db_book)
+    db_book = models.BookV2(**book.dict(), tenant_id=tenant)
+    # ISBN, занятый после проверки (или не попавший в индекс), отклоняет уникальный индекс
+    try:
+        db.add(db_book)
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Book with this ISBN already exists")
+    isbn_index.add("books_v2", tenant, book.isbn)
+    record_change(db, tenant, "book", db_book.id, "create")
+    queries.refresh_author_stats(db, [db_book.author_id])
     db.commit()
+    list_cache.bump("books_v2", "authors", tenant=tenant)
     db.refresh(db_book)
     
     response = schemas.BookV2Response.from_orm(db_book).dict()
-    store_idempotency(idempotency_key, "book_v2", response, db)
+    store_idempotency(idempotency_key, "book_v2", response, db, tenant)
+    events.broker.publish("book", "create", response, tenant)
     
     return db_book
 
-@app_v2.get("/books", tags=["Books V2"])
-async def get_books_v2(
-    user: models.User = Depends(verify_token),
-    page: int = Query(1, ge=1),
-    page_size: int = Query(10, ge=1, le=100),
-    genre: Optional[str] = Query(None),
-    fields: Optional[str] = Query(None, description="Опциональные поля"),
-    include_author: bool = Query(False, description="Включить информацию об авторе"),
-    db: Session = Depends(get_db)
+def list_books_v2(
+    db: Session,
+    tenant: str,
+    page: int,
+    page_size: int,
+    genre: Optional[str],
+    fields: Optional[str],
+    include_author: bool,
+    ids: Optional[str],
+    author_id: Optional[int] = None,
+    year_from: Optional[int] = None,
+    year_to: Optional[int] = None,
+    sort: str = "id",
+    facet_names: tuple = ()
 ):
-    """
-    Получение списка всех книг (версия 2) с пагинацией, фильтрацией и опциональными полями.
+    """Страница книг V2 или выборка по ID (выполняется через read_coalescer)"""
+    if ids is not None:
+        return multi_get_books_v2(db, tenant, parse_id_list(ids), fields, include_author)
     
-    **Опциональные поля:**
-    - fields: выбор конкретных полей (id,title,year)
-    - include_author: включение данных об авторе в ответ
+    if books_read_model.enabled and books_read_model.ensure_fresh(db):
+        items, total = books_read_model.query(
+            page, page_size, genre, author_id, year_from, year_to, sort, include_author, tenant
+        )
+        metrics.inc("read_model_queries_total", source="memory")
+        if fields:
+            items = [filter_fields(item, fields) for item in items]
+        return with_facets(
+            create_paginated_response(items, total, page, page_size),
+            db, tenant, facet_names, genre, author_id, year_from, year_to, use_read_model=True
+        )
+    metrics.inc("read_model_queries_total", source="sql")
     
-    **Обоснование**: Позволяет клиентам получать только нужные данные, снижая объем трафика
-    """
-    query = db.query(models.BookV2)
+    query = db.query(models.BookV2).filter(models.BookV2.tenant_id == tenant)
     if genre:
         query = query.filter(models.BookV2.genre == genre)
+    if author_id is not None:
+        query = query.filter(models.BookV2.author_id == author_id)
+    if year_from is not None:
+        query = query.filter(models.BookV2.year >= year_from)
+    if year_to is not None:
+        query = query.filter(models.BookV2.year <= year_to)
     
     total = query.count()
+    sort_column = getattr(models.BookV2, sort.lstrip("-"))
+    if sort.startswith("-"):
+        query = query.order_by(sort_column.desc().nulls_last(), models.BookV2.id.desc())
+    else:
+        query = query.order_by(sort_column.asc().nulls_first(), models.BookV2.id)
     offset = (page - 1) * page_size
     books = query.offset(offset).limit(page_size).all()
     
@@ -466,7 +1075,7 @@ async def get_books_v2(
     for book in books:
         if include_author:
             book_dict = schemas.BookV2Extended.from_orm(book).dict()
-            author = db.query(models.Author).filter(models.Author.id == book.author_id).first()
+            author = queries.author_by_id(db, tenant, book.author_id)
             if author:
                 book_dict['author'] = schemas.AuthorMinimal.from_orm(author).dict()
         else:
@@ -477,7 +1086,90 @@ async def get_books_v2(
         
         items.append(book_dict)
     
-    return create_paginated_response(items, total, page, page_size)
+    return with_facets(
+        create_paginated_response(items, total, page, page_size),
+        db, tenant, facet_names, genre, author_id, year_from, year_to
+    )
+
+def with_facets(
+    page_response: schemas.PaginatedResponse,
+    db: Session,
+    tenant: str,
+    facet_names: tuple,
+    *filters,
+    use_read_model: bool = False
+):
+    """Добавить к странице запрошенные фасеты (без facets страница не меняется)"""
+    if not facet_names:
+        return page_response
+    return schemas.FacetedPaginatedResponse(
+        **page_response.dict(),
+        facets=facets.book_facets(db, tenant, facet_names, *filters, use_read_model=use_read_model)
+    )
+
+@app_v2.get("/books", tags=["Books V2"])
+async def get_books_v2(
+    request: Request,
+    user: models.User = Depends(verify_token),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(10, ge=1, le=100),
+    genre: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None, description="Опциональные поля"),
+    include_author: bool = Query(False, description="Включить информацию об авторе"),
+    ids: Optional[str] = Query(None, description="Выборка по списку ID через запятую (1,2,3)"),
+    author_id: Optional[int] = Query(None),
+    year_from: Optional[int] = Query(None),
+    year_to: Optional[int] = Query(None),
+    sort: str = Query("id", pattern=r"^-?(id|year|pages)$", description="Сортировка: id, year, pages; '-' - по убыванию"),
+    facets: Optional[str] = Query(None, description="Фасеты через запятую: genre, year"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Получение списка всех книг (версия 2) с пагинацией, фильтрацией и опциональными полями.
+    
+    **Опциональные поля:**
+    - fields: выбор конкретных полей (id,title,year)
+    - include_author: включение данных об авторе в ответ
+    
+    **Обоснование**: Позволяет клиентам получать только нужные данные, снижая объем трафика
+    
+    **Выборка по ID:** ids=1,2,3 возвращает книги в порядке запроса
+    и список ненайденных ID (missing_ids) одним запросом к БД
+    
+    **Объединение запросов:** одинаковые одновременные запросы (путь и
+    все параметры, включая fields и include_author) выполняются один раз
+    
+    **Кэширование:** результат кэшируется до ближайшего изменения книг
+    или авторов (поколения таблиц в app/cache.py)
+    
+    **Модель чтения:** при READ_MODEL_ENABLED фильтры (genre, author_id,
+    year_from, year_to) и сортировка выполняются по колоночной копии
+    таблицы в памяти (app/read_model.py); если копия отстала, запрос
+    выполняется через SQL
+    
+    **Формат ответа:** по заголовку Accept - JSON (по умолчанию),
+    колоночный JSON (application/vnd.library.columnar+json) или
+    MessagePack (application/msgpack), см. app/encoding.py
+    
+    **Фасеты:** facets=genre,year добавляет в ответ количество книг по
+    жанру и по десятилетию издания для текущих фильтров (app/facets.py);
+    фасеты кэшируются по набору фильтров и не пересчитываются при листании
+    """
+    facet_names = parse_facets(facets)
+    tenant = user_tenant(user)
+    return negotiated_response(request, await cached_read(
+        request, tenant, BOOKS_V2_TABLES, list_books_v2, db, tenant, page, page_size, genre, fields, include_author,
+        ids, author_id, year_from, year_to, sort, facet_names
+    ))
+
+@app_v2.post("/books/multi-get", response_model=schemas.MultiGetResponse, tags=["Books V2"])
+async def multi_get_books_v2_post(
+    request: schemas.MultiGetRequest,
+    user: models.User = Depends(verify_token),
+    db: Session = Depends(get_read_db)
+):
+    """Получение книг по списку ID (вариант для длинных списков)."""
+    return multi_get_books_v2(db, user_tenant(user), request.ids, request.fields, request.include_author)
 
 @app_v2.get("/books/{book_id}", tags=["Books V2"])
 async def get_book_v2(
@@ -485,16 +1177,17 @@ async def get_book_v2(
     user: models.User = Depends(verify_token),
     fields: Optional[str] = Query(None),
     include_author: bool = Query(False),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Получение книги по ID (версия 2) с опциональными полями."""
-    book = db.query(models.BookV2).filter(models.BookV2.id == book_id).first()
+    tenant = user_tenant(user)
+    book = queries.book_v2_by_id(db, tenant, book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
     
     if include_author:
         book_dict = schemas.BookV2Extended.from_orm(book).dict()
-        author = db.query(models.Author).filter(models.Author.id == book.author_id).first()
+        author = queries.author_by_id(db, tenant, book.author_id)
         if author:
             book_dict['author'] = schemas.AuthorMinimal.from_orm(author).dict()
     else:
@@ -512,22 +1205,103 @@ async def update_book_v2(
     db: Session = Depends(get_db)
 ):
     """Обновление книги (версия 2). Идемпотентная операция."""
-    db_book = db.query(models.BookV2).filter(models.BookV2.id == book_id).first()
+    tenant = user_tenant(user)
+    db_book = queries.book_v2_by_id(db, tenant, book_id)
     if not db_book:
         raise HTTPException(status_code=404, detail="Book not found")
     
-    author = db.query(models.Author).filter(models.Author.id == book.author_id).first()
-    if not author:
+    if not queries.author_exists(db, tenant, book.author_id):
         raise HTTPException(status_code=400, detail="Author not found")
     
+    previous_author_id = db_book.author_id
+    if db_book.isbn != book.isbn:
+        isbn_index.add("books_v2", tenant, book.isbn)
+        isbn_index.mark_stale("books_v2")
     for key, value in book.dict().items():
         setattr(db_book, key, value)
     
     db_book.updated_at = datetime.utcnow()
+    record_change(db, tenant, "book", db_book.id, "update")
+    queries.refresh_author_stats(db, [previous_author_id, book.author_id])
     db.commit()
+    list_cache.bump("books_v2", "authors", tenant=tenant)
     db.refresh(db_book)
+    events.broker.publish("book", "update", schemas.BookV2Response.from_orm(db_book).dict(), tenant)
     return db_book
 
+@app_v2.patch("/books/{book_id}", response_model=schemas.BookV2Response, tags=["Books V2"])
+async def patch_book_v2(
+    book_id: int,
+    patch: schemas.BookV2Update,
+    user: models.User = Depends(verify_token),
+    db: Session = Depends(get_db)
+):
+    """
+    Частичное обновление книги (версия 2).
+    
+    Передаются только изменяемые поля. Изменение выполняется одним
+    UPDATE ... RETURNING; существование нового автора проверяется
+    условием EXISTS в том же запросе. При смене автора прежний автор
+    (для пересчета его счетчиков) возвращается тем же запросом: подзапрос
+    в RETURNING видит снимок до изменения. SQLite вычисляет RETURNING
+    после изменения строки, поэтому на нем прежний автор читается
+    отдельным SELECT. Дополнительные запросы нужны только для ответа
+    об ошибке (404 или неизвестный автор).
+    """
+    tenant = user_tenant(user)
+    changes = patch_changes(patch, BOOK_V2_REQUIRED_FIELDS)
+    if not changes:
+        db_book = queries.book_v2_by_id(db, tenant, book_id)
+        if not db_book:
+            raise HTTPException(status_code=404, detail="Book not found")
+        return db_book
+    
+    changes["updated_at"] = datetime.utcnow()
+    table = models.BookV2.__table__
+    conditions = [table.c.tenant_id == tenant, table.c.id == book_id]
+    returning = list(table.c)
+    stats_author_ids = set()
+    if "author_id" in changes:
+        conditions.append(exists().where(
+            models.Author.tenant_id == tenant, models.Author.id == changes["author_id"]
+        ))
+        if db.get_bind().dialect.name == "postgresql":
+            previous = table.alias("previous")
+            returning.append(
+                select(previous.c.author_id)
+                .where(previous.c.tenant_id == tenant, previous.c.id == book_id)
+                .scalar_subquery().label("previous_author_id")
+            )
+        else:
+            stats_author_ids = queries.book_v2_author_ids(db, tenant, [book_id])
+    
+    try:
+        row = db.execute(
+            update(table).where(*conditions).values(**changes).returning(*returning)
+        ).mappings().first()
+        if row is None:
+            db.rollback()
+            if not queries.book_v2_by_id(db, tenant, book_id):
+                raise HTTPException(status_code=404, detail="Book not found")
+            raise HTTPException(status_code=400, detail="Author not found")
+        if "isbn" in changes:
+            isbn_index.add("books_v2", tenant, changes["isbn"])
+            isbn_index.mark_stale("books_v2")
+        record_change(db, tenant, "book", book_id, "update")
+        stats_changed = "author_id" in changes or "year" in changes
+        if stats_changed:
+            queries.refresh_author_stats(db, stats_author_ids | {row["author_id"], row.get("previous_author_id")})
+        db.commit()
+        list_cache.bump("books_v2", *(("authors",) if stats_changed else ()), tenant=tenant)
+    except IntegrityError:
+        db.rollback()
+        detail = "Book with this ISBN already exists" if "isbn" in changes else "Author not found"
+        raise HTTPException(status_code=400, detail=detail)
+    
+    response = schemas.BookV2Response(**row).dict()
+    events.broker.publish("book", "update", response, tenant)
+    return response
+
 @app_v2.delete("/books/{book_id}", status_code=204, tags=["Books V2"])
 async def delete_book_v2(
     book_id: int,
@@ -535,19 +1309,210 @@ async def delete_book_v2(
     db: Session = Depends(get_db)
 ):
     """Удаление книги (версия 2). Идемпотентная операция."""
-    db_book = db.query(models.BookV2).filter(models.BookV2.id == book_id).first()
+    tenant = user_tenant(user)
+    db_book = queries.book_v2_by_id(db, tenant, book_id)
     if not db_book:
         raise HTTPException(status_code=404, detail="Book not found")
     
+    deleted = schemas.BookV2Response.from_orm(db_book).dict()
     db.delete(db_book)
+    isbn_index.mark_stale("books_v2")
+    record_change(db, tenant, "book", book_id, "delete")
+    queries.refresh_author_stats(db, [db_book.author_id])
     db.commit()
+    list_cache.bump("books_v2", "authors", tenant=tenant)
+    events.broker.publish("book", "delete", deleted, tenant)
     return None
 
+@app_v2.get("/changes", response_model=schemas.ChangesResponse, tags=["Sync V2"])
+async def get_changes(
+    user: models.User = Depends(verify_token),
+    since: str = Query("0", description="Водяной знак из предыдущего ответа (next_since)"),
+    limit: int = Query(100, ge=1, le=1000, description="Максимальный размер пакета"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Дельта-синхронизация: изменения книг и авторов после водяного знака.
+
+    Водяной знак - номер последнего полученного изменения. Клиент
+    сохраняет next_since и передает его в следующем запросе, пока
+    has_more не станет false. Для create/update в data возвращается
+    текущее состояние сущности, для delete - только ее ID.
+
+    Изменения отдаются с задержкой CHANGE_LOG_COMMIT_LAG секунд: пока
+    транзакция с меньшим номером может быть не зафиксирована, водяной
+    знак не переходит более поздние номера.
+
+    **Обоснование**: стоимость синхронизации зависит от числа изменений,
+    а не от размера каталога (выборка по первичному ключу журнала)
+    """
+    try:
+        since_id = int(since)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid since token")
+    
+    tenant = user_tenant(user)
+    rows = db.query(models.ChangeLog).filter(
+        models.ChangeLog.tenant_id == tenant,
+        models.ChangeLog.id > since_id
+    ).order_by(models.ChangeLog.id).limit(limit + 1).all()
+    
+    committed = committed_prefix(rows)
+    has_more = committed > limit
+    rows = rows[:min(committed, limit)]
+    
+    live_ids = {"book": set(), "author": set()}
+    for row in rows:
+        if row.operation != "delete":
+            live_ids[row.entity_type].add(row.entity_id)
+    
+    current = {}
+    if live_ids["book"]:
+        for book in db.query(models.BookV2).filter(
+            models.BookV2.tenant_id == tenant, models.BookV2.id.in_(live_ids["book"])
+        ):
+            current[("book", book.id)] = schemas.BookV2Response.from_orm(book).dict()
+    if live_ids["author"]:
+        for author in db.query(models.Author).filter(
+            models.Author.tenant_id == tenant, models.Author.id.in_(live_ids["author"])
+        ):
+            current[("author", author.id)] = schemas.AuthorResponse.from_orm(author).dict()
+    
+    changes = [
+        schemas.ChangeEvent(
+            change_id=row.id,
+            entity_type=row.entity_type,
+            entity_id=row.entity_id,
+            operation=row.operation,
+            changed_at=row.changed_at,
+            data=current.get((row.entity_type, row.entity_id)) if row.operation != "delete" else None
+        )
+        for row in rows
+    ]
+    
+    return schemas.ChangesResponse(
+        changes=changes,
+        next_since=str(rows[-1].id if rows else since_id),
+        has_more=has_more
+    )
+
+@app_v2.get("/events", tags=["Sync V2"])
+async def stream_events(
+    user: models.User = Depends(verify_token),
+    genre: Optional[str] = Query(None, description="Только события книг этого жанра"),
+    author_id: Optional[int] = Query(None, description="Только события этого автора и его книг"),
+    db: Session = Depends(get_db)
+):
+    """
+    Поток изменений каталога (Server-Sent Events).
+
+    События: book.create, book.update, book.delete, author.create.
+    Каждый подписчик получает собственную ограниченную очередь; если
+    клиент не успевает читать и очередь переполняется, сервер отправляет
+    событие dropped и закрывает поток (клиент может переподключиться).
+
+    **Обоснование**: заменяет частый опрос списков и статистики push-уведомлениями
+    """
+    # соединение с БД нужно только для аутентификации, не держим его весь поток
+    db.close()
+    subscription = events.broker.subscribe(genre=genre, author_id=author_id, tenant=user_tenant(user))
+    return StreamingResponse(
+        events.stream(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app_v2.post("/batch", response_model=schemas.BatchResponse, tags=["Batch V2"])
+async def execute_batch(
+    request: Request,
+    payload: schemas.BatchRequest,
+    user: models.User = Depends(verify_token),
+    db: Session = Depends(get_db)
+):
+    """
+    Выполнение нескольких операций API /api/v1 и /api/v2 за один запрос.
+    
+    Токен проверяется один раз, операции выполняются в процессе по
+    порядку в сессии пакета. Квота списывается одной записью в размере
+    суммы стоимостей операций. Результаты (статус, заголовки, тело)
+    возвращаются в порядке операций; ошибка одной операции не прерывает
+    остальные.
+    
+    **Пример**: {"operations": [{"method": "GET", "path": "/api/v2/books/1"},
+    {"method": "GET", "path": "/api/v2/authors/1"}]}
+    """
+    operations = payload.operations
+    if len(operations) > batch.BATCH_MAX_OPERATIONS:
+        raise HTTPException(status_code=400, detail=f"Too many operations (max {batch.BATCH_MAX_OPERATIONS})")
+    
+    cost = 0
+    for operation in operations:
+        path, query_string = batch.split_path(operation.path)
+        cost += quotas.request_cost(
+            {"method": operation.method, "path": path, "query_string": query_string}, operation.body
+        )
+    allowed, limit_headers = charge_quota(request.scope, cost)
+    if not allowed:
+        return rate_limited_response(limit_headers)
+    
+    results = await batch.run(app.router, request.scope, operations, user, db)
+    return JSONResponse(content={"results": results}, headers=limit_headers)
+
+
+def job_accepted(job: models.Job) -> JSONResponse:
+    """Ответ 202 на запуск фонового задания со ссылкой на его состояние"""
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content=jsonable_encoder(schemas.JobResponse(**jobs.to_response(job))),
+        headers={"Location": f"/internal/jobs/{job.id}"}
+    )
+
+@job_runner.job_type("bulk_delete_books", max_concurrency=BULK_DELETE_JOB_CONCURRENCY)
+def bulk_delete_books_chunk(db: Session, params: dict, state: dict, result: dict) -> ChunkResult:
+    """Чанк фонового массового удаления: следующие JOB_CHUNK_SIZE ID из списка"""
+    ids = params["ids"]
+    tenant = params.get("tenant", DEFAULT_TENANT)
+    offset = state.get("offset", 0)
+    chunk_ids = ids[offset:offset + JOB_CHUNK_SIZE]
+    
+    books = {
+        book.id: book
+        for book in db.query(models.BookV2).filter(models.BookV2.tenant_id == tenant, models.BookV2.id.in_(chunk_ids))
+    }
+    deleted = []
+    failed_ids = result.get("failed_ids", [])
+    for book_id in chunk_ids:
+        book = books.pop(book_id, None)
+        if book:
+            deleted.append(schemas.BookV2Response.from_orm(book).dict())
+            db.delete(book)
+            record_change(db, tenant, "book", book_id, "delete")
+        else:
+            failed_ids.append(book_id)
+    isbn_index.mark_stale("books_v2", len(deleted))
+    queries.refresh_author_stats(db, [book["author_id"] for book in deleted])
+    
+    def after_commit():
+        list_cache.bump("books_v2", "authors", tenant=tenant)
+        for book_data in deleted:
+            events.broker.publish("book", "delete", book_data, tenant)
+    
+    offset += len(chunk_ids)
+    return ChunkResult(
+        state={"offset": offset},
+        processed=len(chunk_ids),
+        done=offset >= len(ids),
+        result={"deleted_count": result.get("deleted_count", 0) + len(deleted), "failed_ids": failed_ids},
+        total=len(ids),
+        after_commit=after_commit if deleted else None
+    )
 
 @app_internal.post("/books/v2/bulk-delete", response_model=schemas.BulkDeleteResponse, tags=["Internal"])
 async def bulk_delete_books(
     request: schemas.BulkDeleteRequest,
     _: bool = Depends(verify_internal_api_key),
+    background: bool = Query(False, description="Выполнить как фоновое задание (ответ 202 с ID задания)"),
+    tenant: str = Query(DEFAULT_TENANT, description="Арендатор"),
     db: Session = Depends(get_db)
 ):
     """
@@ -563,55 +1528,62 @@ async def bulk_delete_books(
     - Нет проверки прав конкретного пользователя
     - Нет подробного логирования каждого удаления
     - Не создает резервные копии
+    
+    **Фоновый режим:** при background=true удаление выполняется заданием
+    частями по JOB_CHUNK_SIZE, прогресс и результат - в /internal/jobs/{id}
     """
+    if background:
+        return job_accepted(job_runner.submit(db, "bulk_delete_books", {"ids": request.ids, "tenant": tenant}))
+    
     deleted_count = 0
     failed_ids = []
+    deleted = []
     
     for book_id in request.ids:
-        book = db.query(models.BookV2).filter(models.BookV2.id == book_id).first()
+        book = queries.book_v2_by_id(db, tenant, book_id)
         if book:
+            deleted.append(schemas.BookV2Response.from_orm(book).dict())
             db.delete(book)
+            record_change(db, tenant, "book", book_id, "delete")
             deleted_count += 1
         else:
             failed_ids.append(book_id)
     
+    isbn_index.mark_stale("books_v2", deleted_count)
+    queries.refresh_author_stats(db, [book["author_id"] for book in deleted])
     db.commit()
+    list_cache.bump("books_v2", "authors", tenant=tenant)
+    for book_data in deleted:
+        events.broker.publish("book", "delete", book_data, tenant)
     
     return schemas.BulkDeleteResponse(
         deleted_count=deleted_count,
         failed_ids=failed_ids
     )
 
-@app_internal.get("/statistics", response_model=schemas.StatisticsResponse, tags=["Internal"])
-async def get_statistics(
-    _: bool = Depends(verify_internal_api_key),
-    db: Session = Depends(get_db)
-):
-    """
-    Получение статистики системы (внутренний API).
-    
-    **Почему внутренний:**
-    - Содержит агрегированные данные для мониторинга
-    - Может быть ресурсоемким при больших объемах данных
-    - Используется для дашбордов и аналитики
-    - Не требует пользовательской аутентификации
-    """
-    total_books_v1 = db.query(models.BookV1).count()
-    total_books_v2 = db.query(models.BookV2).count()
-    total_authors = db.query(models.Author).count()
-    total_users = db.query(models.User).count()
+def compute_statistics(db: Session, tenant: str) -> schemas.StatisticsResponse:
+    """Агрегаты для статистики арендатора (выполняется через read_coalescer)"""
+    if BOOKS_V1_PROJECTION:
+        total_books_v1 = db.query(models.BookV2).filter(
+            models.BookV2.tenant_id == tenant, models.BookV2.v1_id.isnot(None)
+        ).count()
+    else:
+        total_books_v1 = db.query(models.BookV1).filter(models.BookV1.tenant_id == tenant).count()
+    total_books_v2 = db.query(models.BookV2).filter(models.BookV2.tenant_id == tenant).count()
+    total_authors = db.query(models.Author).filter(models.Author.tenant_id == tenant).count()
+    total_users = db.query(models.User).filter(models.User.tenant_id == tenant).count()
     
     genres = db.query(
         models.BookV2.genre,
         func.count(models.BookV2.id).label('count')
-    ).group_by(models.BookV2.genre).all()
+    ).filter(models.BookV2.tenant_id == tenant).group_by(models.BookV2.genre).all()
     
     genres_list = [{"genre": g[0] or "Unknown", "count": g[1]} for g in genres]
     
     books_by_year = db.query(
         models.BookV2.year,
         func.count(models.BookV2.id).label('count')
-    ).group_by(models.BookV2.year).order_by(models.BookV2.year.desc()).limit(10).all()
+    ).filter(models.BookV2.tenant_id == tenant).group_by(models.BookV2.year).order_by(models.BookV2.year.desc()).limit(10).all()
     
     books_by_year_list = [{"year": y[0], "count": y[1]} for y in books_by_year]
     
@@ -624,11 +1596,93 @@ async def get_statistics(
         books_by_year=books_by_year_list
     )
 
-@app_internal.get("/health/detailed", response_model=schemas.SystemHealthResponse, tags=["Internal"])
-async def detailed_health_check(
+@app_internal.patch("/books/v2/bulk-update", response_model=schemas.BulkUpdateResponse, tags=["Internal"])
+async def bulk_update_books(
+    request: schemas.BulkUpdateRequest,
     _: bool = Depends(verify_internal_api_key),
+    tenant: str = Query(DEFAULT_TENANT, description="Арендатор"),
     db: Session = Depends(get_db)
 ):
+    """
+    Массовое изменение жанра или автора книг (внутренний API).
+    
+    Книги выбираются по списку ids и/или по текущим where_genre и
+    where_author_id. Изменение выполняется одним множественным
+    UPDATE ... RETURNING, записи журнала изменений - одним INSERT.
+    """
+    data = request.dict(exclude_unset=True)
+    changes = {field: data[field] for field in ("genre", "author_id") if field in data}
+    if not changes:
+        raise HTTPException(status_code=400, detail="Nothing to update: set genre and/or author_id")
+    if "author_id" in changes:
+        if changes["author_id"] is None:
+            raise HTTPException(status_code=400, detail="Fields cannot be null: author_id")
+        if not queries.author_exists(db, tenant, changes["author_id"]):
+            raise HTTPException(status_code=400, detail="Author not found")
+    
+    table = models.BookV2.__table__
+    conditions = [table.c.tenant_id == tenant]
+    if request.ids is not None:
+        conditions.append(table.c.id.in_(request.ids))
+    if request.where_genre is not None:
+        conditions.append(table.c.genre == request.where_genre)
+    if request.where_author_id is not None:
+        conditions.append(table.c.author_id == request.where_author_id)
+    if len(conditions) == 1:
+        raise HTTPException(status_code=400, detail="Selection required: ids, where_genre or where_author_id")
+    
+    now = datetime.utcnow()
+    changes["updated_at"] = now
+    # смена автора меняет счетчики и прежних авторов выбранных книг
+    previous_author_ids = set()
+    if "author_id" in changes:
+        previous_author_ids = set(db.execute(
+            select(table.c.author_id).where(*conditions).distinct()
+        ).scalars())
+    rows = db.execute(
+        update(table).where(*conditions).values(**changes).returning(*table.c)
+    ).mappings().all()
+    
+    if rows:
+        db.execute(insert(models.ChangeLog.__table__), [
+            {"tenant_id": tenant, "entity_type": "book", "entity_id": row["id"], "operation": "update", "changed_at": now}
+            for row in rows
+        ])
+        if "author_id" in changes:
+            queries.refresh_author_stats(db, previous_author_ids | {changes["author_id"]})
+    db.commit()
+    list_cache.bump("books_v2", *(("authors",) if "author_id" in changes and rows else ()), tenant=tenant)
+    
+    for row in rows:
+        events.broker.publish("book", "update", schemas.BookV2Response(**row).dict(), tenant)
+    
+    updated_ids = {row["id"] for row in rows}
+    failed_ids = [book_id for book_id in request.ids if book_id not in updated_ids] if request.ids else []
+    
+    return schemas.BulkUpdateResponse(updated_count=len(rows), failed_ids=failed_ids)
+
+@app_internal.get("/statistics", response_model=schemas.StatisticsResponse, tags=["Internal"])
+async def get_statistics(
+    request: Request,
+    _: bool = Depends(verify_internal_api_key),
+    tenant: str = Query(DEFAULT_TENANT, description="Арендатор"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Получение статистики системы (внутренний API).
+    
+    **Почему внутренний:**
+    - Содержит агрегированные данные для мониторинга
+    - Может быть ресурсоемким при больших объемах данных
+    - Используется для дашбордов и аналитики
+    - Не требует пользовательской аутентификации
+    """
+    return await read_coalescer.run(
+        (tenant,) + request_key(request), request.url.path, compute_statistics, db, tenant
+    )
+
+@app_internal.get("/health/detailed", response_model=schemas.SystemHealthResponse, tags=["Internal"])
+async def detailed_health_check(_: bool = Depends(verify_internal_api_key)):
     """
     Расширенная проверка здоровья системы (внутренний API).
     
@@ -636,33 +1690,63 @@ async def detailed_health_check(
     - Содержит детальную информацию о системе
     - Может раскрывать внутреннюю архитектуру
     - Используется для мониторинга и алертинга
+    
+    Состояние БД и счетчики записей - из фоновой проверки
+    (DB_HEALTH_INTERVAL), эндпоинт к БД не обращается.
     """
-    try:
-        db.execute("SELECT 1")
-        db_status = "connected"
-    except Exception as e:
-        db_status = f"error: {str(e)}"
+    snapshot = await db_health.current()
     
     uptime = datetime.utcnow() - START_TIME
     uptime_str = str(uptime).split('.')[0]
     
-    rate_limit_count = db.query(models.RateLimit).count()
-    idempotency_count = db.query(models.IdempotencyKey).count()
-    
     return schemas.SystemHealthResponse(
-        status="healthy",
+        status="healthy" if snapshot.database == "connected" else "degraded",
         timestamp=datetime.utcnow(),
-        database=db_status,
+        database=snapshot.database,
         versions=["v1", "v2"],
         uptime=uptime_str,
-        rate_limit_records=rate_limit_count,
-        idempotency_records=idempotency_count
+        rate_limit_records=snapshot.rate_limit_records,
+        idempotency_records=snapshot.idempotency_records,
+        database_checked_at=snapshot.checked_at,
+        database_latency_ms=snapshot.latency_ms,
+        circuit_breaker=db_breaker.state
+    )
+
+CLEANUP_TABLES = (
+    ("rate_limit_deleted", models.RateLimit, models.RateLimit.request_time),
+    ("idempotency_deleted", models.IdempotencyKey, models.IdempotencyKey.created_at),
+)
+
+@job_runner.job_type("cleanup_old_records", max_concurrency=1)
+def cleanup_old_records_chunk(db: Session, params: dict, state: dict, result: dict) -> ChunkResult:
+    """Чанк фоновой очистки: до JOB_CHUNK_SIZE старых записей текущей таблицы"""
+    table_index = state.get("table_index", 0)
+    result_key, model, created_column = CLEANUP_TABLES[table_index]
+    old_date = datetime.fromisoformat(params["older_than"])
+    
+    chunk_ids = [
+        row[0] for row in db.query(model.id).filter(created_column < old_date).limit(JOB_CHUNK_SIZE)
+    ]
+    if chunk_ids:
+        db.query(model).filter(model.id.in_(chunk_ids)).delete(synchronize_session=False)
+    if len(chunk_ids) < JOB_CHUNK_SIZE:
+        table_index += 1
+    
+    result = {key: result.get(key, 0) for key, _, _ in CLEANUP_TABLES}
+    result[result_key] += len(chunk_ids)
+    result["older_than_days"] = params["days"]
+    return ChunkResult(
+        state={"table_index": table_index},
+        processed=len(chunk_ids),
+        done=table_index >= len(CLEANUP_TABLES),
+        result=result
     )
 
 @app_internal.delete("/cleanup/old-records", tags=["Internal"])
 async def cleanup_old_records(
     _: bool = Depends(verify_internal_api_key),
     days: int = Query(7, ge=1, description="Удалить записи старше N дней"),
+    background: bool = Query(False, description="Выполнить как фоновое задание (ответ 202 с ID задания)"),
     db: Session = Depends(get_db)
 ):
     """
@@ -672,9 +1756,17 @@ async def cleanup_old_records(
     - Техническая операция обслуживания
     - Не связана с бизнес-логикой
     - Может влиять на производительность
+    
+    **Фоновый режим:** при background=true записи удаляются заданием
+    частями по JOB_CHUNK_SIZE в отдельных транзакциях
     """
     old_date = datetime.utcnow() - timedelta(days=days)
     
+    if background:
+        return job_accepted(job_runner.submit(
+            db, "cleanup_old_records", {"days": days, "older_than": old_date.isoformat()}
+        ))
+    
     rate_limit_deleted = db.query(models.RateLimit).filter(
         models.RateLimit.request_time < old_date
     ).delete()
@@ -692,6 +1784,326 @@ async def cleanup_old_records(
         "older_than_days": days
     }
 
+@job_runner.job_type("export_books", max_concurrency=1)
+def export_books_chunk(db: Session, params: dict, state: dict, result: dict) -> ChunkResult:
+    """
+    Чанк выгрузки: следующие EXPORT_BATCH_SIZE книг дописываются в файл,
+    который появляется только после последней порции.
+    """
+    updated_since = params.get("updated_since")
+    state, processed, summary = export.write_export_chunk(
+        db,
+        params["path"],
+        params["format"],
+        state,
+        datetime.fromisoformat(updated_since) if updated_since else None,
+        params.get("tenant", DEFAULT_TENANT)
+    )
+    if summary is None:
+        return ChunkResult(state=state, processed=processed, done=False)
+    return ChunkResult(state=state, processed=processed, done=True, result=summary, total=summary["rows"])
+
+@app_internal.post("/exports/books", response_model=schemas.JobResponse, status_code=202, tags=["Internal"])
+async def export_books(
+    _: bool = Depends(verify_internal_api_key),
+    export_format: str = Query("parquet", alias="format", pattern="^(parquet|arrow)$"),
+    updated_since: Optional[datetime] = Query(
+        None, description="Только книги, созданные или измененные после отметки (max_changed_at прошлой выгрузки)"
+    ),
+    tenant: str = Query(DEFAULT_TENANT, description="Арендатор"),
+    db: Session = Depends(get_db)
+):
+    """
+    Выгрузка книг V2 с именами авторов в Parquet или Arrow IPC (внутренний API).
+    
+    Выполняется фоновым заданием; по завершении файл доступен по
+    /internal/exports/{job_id}/file, а в результате задания указаны число
+    строк и отметка max_changed_at для следующей инкрементальной выгрузки.
+    """
+    return job_accepted(job_runner.submit(db, "export_books", {
+        "format": export_format,
+        "path": export.export_path(export_format),
+        "updated_since": updated_since.isoformat() if updated_since else None,
+        "tenant": tenant,
+    }))
+
+@job_runner.job_type("backfill_books_v1", max_concurrency=1)
+def backfill_books_v1_chunk(db: Session, params: dict, state: dict, result: dict) -> ChunkResult:
+    """
+    Чанк переноса books_v1 в books_v2: следующие JOB_CHUNK_SIZE строк по id.
+    Порция переносится пачкой; при конфликте ISBN с другой книгой V2 она
+    повторяется построчно с точкой сохранения на строку, и конфликтующие
+    строки попадают в conflicts, не останавливая перенос.
+    """
+    after_id = state.get("after_id", 0)
+    total = result.get("total")
+    if total is None:
+        total = db.query(func.count(models.BookV1.id)).scalar()
+    rows = db.query(models.BookV1).filter(
+        models.BookV1.id > after_id
+    ).order_by(models.BookV1.id).limit(JOB_CHUNK_SIZE).all()
+    
+    conflicts = []
+    try:
+        with db.begin_nested():
+            changed = mirror_books_v1(db, rows) if rows else []
+    except IntegrityError:
+        changed = []
+        for row in rows:
+            data = {"title": row.title, "author": row.author, "year": row.year, "isbn": row.isbn}
+            try:
+                with db.begin_nested():
+                    book = mirror_book_v1(db, row.tenant_id, row.id, data, row.created_at)
+            except IntegrityError:
+                conflicts.append(row.id)
+                continue
+            if book is not None:
+                changed.append(book)
+    tenants = {book.tenant_id for book in changed}
+    
+    def after_commit():
+        for tenant in tenants:
+            list_cache.bump(*BOOKS_V1_WRITE_TABLES, tenant=tenant)
+    
+    return ChunkResult(
+        state={"after_id": rows[-1].id if rows else after_id},
+        processed=len(rows),
+        done=len(rows) < JOB_CHUNK_SIZE,
+        result={
+            "total": total,
+            "migrated": result.get("migrated", 0) + len(changed),
+            "unchanged": result.get("unchanged", 0) + len(rows) - len(changed) - len(conflicts),
+            "conflicts": result.get("conflicts", []) + conflicts,
+        },
+        total=total,
+        after_commit=after_commit,
+        # пауза ограничивает нагрузку переноса на основную БД
+        delay=BOOKS_V1_BACKFILL_THROTTLE
+    )
+
+@app_internal.post("/migrations/books-v1", response_model=schemas.JobResponse, status_code=202, tags=["Internal"])
+async def backfill_books_v1(
+    _: bool = Depends(verify_internal_api_key),
+    db: Session = Depends(get_db)
+):
+    """
+    Перенос books_v1 в books_v2/authors фоновым заданием (внутренний API).
+    
+    Строки переносятся порциями по JOB_CHUNK_SIZE с паузой
+    BOOKS_V1_BACKFILL_THROTTLE между ними; повторный запуск ничего не
+    меняет в уже перенесенных строках. Задание запускается только при
+    BOOKS_V1_DUAL_WRITE: изменения V1 во время и после переноса сразу
+    записываются в books_v2, так что после завершения задания
+    /api/v1/books можно переключать на проекцию.
+    
+    До включения BOOKS_V1_DUAL_WRITE книги V1 в books_v2 не попадают
+    (списки, авторы, фасеты и статистика V2 их не видят).
+    """
+    if BOOKS_V1_PROJECTION:
+        raise HTTPException(status_code=409, detail="Books V1 are already served from books_v2")
+    if not BOOKS_V1_DUAL_WRITE:
+        raise HTTPException(status_code=409, detail="Enable BOOKS_V1_DUAL_WRITE before migrating books V1")
+    return job_accepted(job_runner.submit(db, "backfill_books_v1", {}))
+
+@app_internal.get("/exports/{job_id}/file", tags=["Internal"])
+async def download_export(
+    job_id: int,
+    request: Request,
+    _: bool = Depends(verify_internal_api_key),
+    db: Session = Depends(get_db)
+):
+    """
+    Файл выгрузки (внутренний API). Поддерживает Range и If-Range -
+    прерванную загрузку можно продолжить с нужного байта.
+    """
+    job = db.get(models.Job, job_id)
+    if not job or job.job_type != "export_books":
+        raise HTTPException(status_code=404, detail="Export not found")
+    if job.status != jobs.COMPLETED:
+        raise HTTPException(status_code=409, detail=f"Export is {job.status}")
+    params = json.loads(job.params)
+    db.close()
+    if not os.path.exists(params["path"]):
+        raise HTTPException(status_code=410, detail="Export file no longer exists")
+    return export.file_response(request, params["path"], export.FORMATS[params["format"]][1])
+
+@app_internal.get("/jobs/{job_id}", response_model=schemas.JobResponse, tags=["Internal"])
+async def get_job(
+    job_id: int,
+    _: bool = Depends(verify_internal_api_key),
+    db: Session = Depends(get_db)
+):
+    """Состояние, прогресс и результат фонового задания (внутренний API)."""
+    job = db.get(models.Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return jobs.to_response(job)
+
+@app_internal.get("/jobs", response_model=List[schemas.JobResponse], tags=["Internal"])
+async def list_jobs(
+    _: bool = Depends(verify_internal_api_key),
+    job_status: Optional[str] = Query(None, alias="status", description="pending, running, completed, failed"),
+    job_type: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """Последние фоновые задания (внутренний API)."""
+    query = db.query(models.Job)
+    if job_status:
+        query = query.filter(models.Job.status == job_status)
+    if job_type:
+        query = query.filter(models.Job.job_type == job_type)
+    return [jobs.to_response(job) for job in query.order_by(models.Job.id.desc()).limit(limit)]
+
+@app_internal.get("/metrics", tags=["Internal"])
+async def get_metrics(_: bool = Depends(verify_internal_api_key)):
+    """
+    Метрики процесса (внутренний API).
+
+    Включает маршрутизацию запросов между primary и репликами
+    (`db_route_total`) и отставание реплик (`db_replica_lag_seconds`),
+    текущий лимит параллельности (`concurrency_limit`) и отклоненные
+    при перегрузке запросы (`concurrency_rejected_total`).
+    """
+    router.refresh_lag()
+    return metrics.snapshot()
+
+@app_internal.get("/profile/recent", tags=["Internal"])
+async def get_recent_slow_requests(
+    _: bool = Depends(verify_internal_api_key),
+    limit: int = Query(20, ge=1, le=100, description="Количество запросов")
+):
+    """
+    Самые медленные из недавних запросов (внутренний API).
+
+    Запрос попадает в буфер, если выполнялся дольше SLOW_REQUEST_MS.
+    Для каждого указана разбивка по SQL-выражениям: количество
+    выполнений, суммарное и максимальное время.
+    """
+    return {
+        "threshold_ms": profiler.SLOW_REQUEST_MS,
+        "requests": profiler.slow_requests.slowest(limit)
+    }
+
+def memory_group_by(group_by: str) -> str:
+    if group_by not in MEMORY_GROUP_BY:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of: {', '.join(MEMORY_GROUP_BY)}")
+    return group_by
+
+def require_memory_tracing():
+    if not memory_profiler.tracing:
+        raise HTTPException(status_code=409, detail="Memory tracing is not running")
+
+@app_internal.get("/profile/memory", tags=["Internal"])
+async def get_memory_profile(_: bool = Depends(verify_internal_api_key)):
+    """
+    Состояние профилирования памяти (внутренний API): включена ли
+    трассировка tracemalloc, отслеживаемая и резидентная память процесса,
+    сохраненные снимки.
+    """
+    return memory_profiler.status()
+
+@app_internal.post("/profile/memory/start", tags=["Internal"])
+async def start_memory_profile(
+    _: bool = Depends(verify_internal_api_key),
+    frames: int = Query(PROFILE_MEMORY_FRAMES, ge=1, le=50, description="Глубина стека выделения")
+):
+    """
+    Включить трассировку выделений памяти (внутренний API).
+    
+    Пока трассировка включена, выделения замедляются, а tracemalloc
+    расходует память на каждый живой блок (tracemalloc_overhead_bytes).
+    Снимки и замеры маршрутов предыдущей трассировки сбрасываются.
+    """
+    memory_profiler.start(frames)
+    return memory_profiler.status()
+
+@app_internal.post("/profile/memory/stop", tags=["Internal"])
+async def stop_memory_profile(_: bool = Depends(verify_internal_api_key)):
+    """Выключить трассировку выделений памяти (внутренний API). Замеры маршрутов сохраняются."""
+    memory_profiler.stop()
+    return memory_profiler.status()
+
+@app_internal.get("/profile/memory/top", tags=["Internal"])
+async def get_memory_top(
+    _: bool = Depends(verify_internal_api_key),
+    limit: int = Query(20, ge=1, le=200, description="Количество мест выделения"),
+    group_by: str = Query("lineno", description="lineno, filename или traceback")
+):
+    """
+    Места с наибольшим объемом живых выделений (внутренний API).
+    
+    Учитываются выделения, сделанные после включения трассировки.
+    Снимок строится в пуле потоков: при большом числе блоков это
+    занимает секунды.
+    """
+    require_memory_tracing()
+    return await run_in_threadpool(memory_profiler.top, limit, memory_group_by(group_by))
+
+@app_internal.get("/profile/memory/routes", tags=["Internal"])
+async def get_memory_routes(_: bool = Depends(verify_internal_api_key)):
+    """
+    Выделения памяти по маршрутам (внутренний API): пик за время запроса
+    сверх памяти на его начало и память, оставшаяся занятой после ответа.
+    
+    Замер точен для запросов, не пересекавшихся с другими; пересекшиеся
+    запросы только подсчитываются (overlapped).
+    """
+    return {"tracing": memory_profiler.tracing, "routes": memory_profiler.route_stats()}
+
+@app_internal.post("/profile/memory/snapshots", status_code=201, tags=["Internal"])
+async def take_memory_snapshot(
+    _: bool = Depends(verify_internal_api_key),
+    name: Optional[str] = Query(None, max_length=64, description="Имя снимка (по умолчанию - s<номер>)")
+):
+    """Сохранить снимок выделений для последующего сравнения (внутренний API)."""
+    require_memory_tracing()
+    name = await run_in_threadpool(memory_profiler.take_snapshot, name)
+    return {"name": name, "snapshots": memory_profiler.status()["snapshots"]}
+
+@app_internal.get("/profile/memory/snapshots/{name}/diff", tags=["Internal"])
+async def diff_memory_snapshot(
+    name: str,
+    _: bool = Depends(verify_internal_api_key),
+    target: Optional[str] = Query(None, description="Снимок для сравнения (по умолчанию - текущее состояние)"),
+    limit: int = Query(20, ge=1, le=200, description="Количество мест выделения"),
+    group_by: str = Query("lineno", description="lineno, filename или traceback")
+):
+    """
+    Что изменилось в выделениях памяти после снимка name (внутренний API).
+    
+    Места упорядочены по абсолютному изменению объема; size_diff_bytes -
+    суммарный прирост. Снимки - в GET /internal/profile/memory.
+    """
+    require_memory_tracing()
+    try:
+        return await run_in_threadpool(memory_profiler.diff, name, target, limit, memory_group_by(group_by))
+    except KeyError as exc:
+        raise HTTPException(status_code=404, detail=f"Snapshot not found: {exc.args[0]}")
+
+def use_prebuilt_openapi(api: FastAPI, name: str):
+    """
+    Схема OpenAPI из файла OPENAPI_DIR/<name>.json, если он есть.
+
+    Файлы создаются при сборке (scripts/export_openapi.py), и воркер не
+    строит схему при первом обращении к /docs. Без файла схема, как и
+    раньше, генерируется FastAPI при первом запросе.
+    """
+    generate = api.openapi
+    path = os.path.join(OPENAPI_DIR, f"{name}.json")
+
+    def openapi():
+        if api.openapi_schema is None and OPENAPI_DIR and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                api.openapi_schema = json.load(f)
+        return api.openapi_schema or generate()
+
+    api.openapi = openapi
+
+OPENAPI_APPS = {"main": app, "v1": app_v1, "v2": app_v2, "internal": app_internal}
+for openapi_name, openapi_app in OPENAPI_APPS.items():
+    use_prebuilt_openapi(openapi_app, openapi_name)
+
 app.mount("/api/v1", app_v1)
 app.mount("/api/v2", app_v2)
 app.mount("/internal", app_internal)
@@ -719,17 +2131,16 @@ async def root():
     }
 
 @app.get("/health", tags=["Health"])
-async def health_check(db: Session = Depends(get_db)):
-    """Базовая проверка здоровья API (публичный эндпоинт)."""
-    try:
-        db.execute("SELECT 1")
-        db_status = "connected"
-    except Exception as e:
-        db_status = f"error: {str(e)}"
+async def health_check():
+    """
+    Базовая проверка здоровья API (публичный эндпоинт).
+    Состояние БД - из фоновой проверки, запрос к БД не выполняется.
+    """
+    snapshot = await db_health.current()
     
     return {
-        "status": "healthy",
+        "status": "healthy" if snapshot.database == "connected" else "degraded",
         "timestamp": datetime.utcnow().isoformat(),
-        "database": db_status,
+        "database": snapshot.database,
         "versions": ["v1", "v2"]
     }
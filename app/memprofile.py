@@ -0,0 +1,256 @@
+"""
+Профилирование памяти процесса через tracemalloc.
+
+Трассировка включается и выключается во время работы (внутренний API
+или PROFILE_MEMORY_TRACING=true при старте): пока она выключена,
+накладных расходов нет. При включенной трассировке доступны:
+
+- места с наибольшим объемом живых выделений (снимок tracemalloc);
+- именованные снимки (до PROFILE_MEMORY_SNAPSHOTS) и их разница с
+  текущим состоянием или другим снимком - что выросло между ними;
+- по маршрутам: пик выделений за время запроса сверх памяти на его
+  начало и память, оставшаяся занятой после ответа.
+
+Пик tracemalloc общий для процесса, поэтому замер запроса точен, только
+если в это время не выполнялись другие запросы. Запросы, пересекшиеся
+по времени, учитываются отдельно (overlapped) и в пиках маршрута не
+участвуют. Выделения фоновых потоков (задания, загрузка индексов)
+попадают в замер запроса, выполнявшегося одновременно с ними.
+"""
+import linecache
+import os
+import threading
+import tracemalloc
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from app.metrics import metrics
+
+PROFILE_MEMORY_TRACING = os.getenv("PROFILE_MEMORY_TRACING", "false").lower() == "true"
+PROFILE_MEMORY_FRAMES = int(os.getenv("PROFILE_MEMORY_FRAMES", "1"))
+PROFILE_MEMORY_SNAPSHOTS = int(os.getenv("PROFILE_MEMORY_SNAPSHOTS", "5"))
+
+GROUP_BY = ("lineno", "filename", "traceback")
+
+# выделения самого профилировщика и импорта модулей - шум для отчета
+_NOISE_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, linecache.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def _statistic(stat, group_by: str) -> dict:
+    frames = [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback]
+    item = {
+        "site": frames[0] if group_by != "filename" else stat.traceback[0].filename,
+        "size_bytes": stat.size,
+        "count": stat.count,
+    }
+    if group_by == "traceback":
+        item["traceback"] = frames
+    if isinstance(stat, tracemalloc.StatisticDiff):
+        item["size_diff_bytes"] = stat.size_diff
+        item["count_diff"] = stat.count_diff
+    return item
+
+
+class RouteAllocations:
+    """Выделения запросов одного маршрута"""
+
+    __slots__ = ("requests", "overlapped", "peak_max", "peak_total", "retained_total", "last_peak")
+
+    def __init__(self):
+        self.requests = 0
+        self.overlapped = 0
+        self.peak_max = 0
+        self.peak_total = 0
+        self.retained_total = 0
+        self.last_peak = 0
+
+    def to_dict(self, route: str) -> dict:
+        measured = self.requests or 1
+        return {
+            "route": route,
+            "requests": self.requests,
+            "overlapped": self.overlapped,
+            "peak_max_bytes": self.peak_max,
+            "peak_avg_bytes": round(self.peak_total / measured),
+            "last_peak_bytes": self.last_peak,
+            "retained_avg_bytes": round(self.retained_total / measured),
+        }
+
+
+class RequestAllocation:
+    """Замер одного запроса: память на начало и признак пересечения с другими"""
+
+    __slots__ = ("start_current", "overlapped")
+
+    def __init__(self, start_current: int):
+        self.start_current = start_current
+        self.overlapped = False
+
+
+class MemoryProfiler:
+    """Управление tracemalloc, снимки и статистика выделений по маршрутам"""
+
+    def __init__(self, max_snapshots: int):
+        self.max_snapshots = max_snapshots
+        self._lock = threading.Lock()
+        self.frames = 0
+        self.started_at: Optional[datetime] = None
+        self.snapshots: "OrderedDict[str, tuple]" = OrderedDict()
+        self._snapshot_seq = 0
+        self.routes: Dict[str, RouteAllocations] = {}
+        self._active: List[RequestAllocation] = []
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = PROFILE_MEMORY_FRAMES):
+        """Включить трассировку (повторный вызов с другой глубиной стека перезапускает ее)"""
+        with self._lock:
+            if tracemalloc.is_tracing():
+                if tracemalloc.get_traceback_limit() == frames:
+                    return
+                tracemalloc.stop()
+            tracemalloc.start(frames)
+            self.frames = frames
+            self.started_at = datetime.utcnow()
+            # снимки и замеры прошлой трассировки несопоставимы с новой
+            self.snapshots.clear()
+            self.routes.clear()
+            self._active.clear()
+
+    def stop(self):
+        with self._lock:
+            tracemalloc.stop()
+            self.started_at = None
+            self.snapshots.clear()
+            self._active.clear()
+
+    def status(self) -> dict:
+        tracing = self.tracing
+        current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+        return {
+            "tracing": tracing,
+            "frames": self.frames if tracing else 0,
+            "started_at": self.started_at.isoformat() if tracing else None,
+            "traced_current_bytes": current,
+            "traced_peak_bytes": peak,
+            "tracemalloc_overhead_bytes": tracemalloc.get_tracemalloc_memory(),
+            "rss_bytes": rss_bytes(),
+            "snapshots": [
+                {"name": name, "taken_at": taken_at.isoformat()}
+                for name, (_, taken_at) in self.snapshots.items()
+            ],
+        }
+
+    # --- снимки ---
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        """Снимок без шума; при выключенной трассировке - RuntimeError"""
+        return tracemalloc.take_snapshot().filter_traces(_NOISE_FILTERS)
+
+    def top(self, limit: int, group_by: str = "lineno") -> dict:
+        """Места с наибольшим объемом живых выделений"""
+        snapshot = self._snapshot()
+        stats = snapshot.statistics(group_by)
+        return {
+            "group_by": group_by,
+            "total_bytes": sum(stat.size for stat in stats),
+            "top": [_statistic(stat, group_by) for stat in stats[:limit]],
+        }
+
+    def take_snapshot(self, name: Optional[str] = None) -> str:
+        """Сохранить снимок; самый старый вытесняется при превышении лимита"""
+        snapshot = self._snapshot()
+        with self._lock:
+            if name is None:
+                self._snapshot_seq += 1
+                name = f"s{self._snapshot_seq}"
+            self.snapshots.pop(name, None)
+            self.snapshots[name] = (snapshot, datetime.utcnow())
+            while len(self.snapshots) > self.max_snapshots:
+                self.snapshots.popitem(last=False)
+        return name
+
+    def diff(self, base: str, target: Optional[str], limit: int, group_by: str = "lineno") -> dict:
+        """
+        Разница снимка target (по умолчанию - текущего состояния) со снимком
+        base. Неизвестное имя снимка - KeyError.
+        """
+        with self._lock:
+            base_snapshot = self.snapshots[base][0]
+            target_snapshot = self.snapshots[target][0] if target is not None else None
+        if target_snapshot is None:
+            target_snapshot = self._snapshot()
+        stats = target_snapshot.compare_to(base_snapshot, group_by)
+        return {
+            "base": base,
+            "target": target or "current",
+            "group_by": group_by,
+            "size_diff_bytes": sum(stat.size_diff for stat in stats),
+            "top": [_statistic(stat, group_by) for stat in stats[:limit]],
+        }
+
+    # --- замеры запросов ---
+
+    def start_request(self) -> Optional[RequestAllocation]:
+        if not self.tracing:
+            return None
+        with self._lock:
+            if self._active:
+                for allocation in self._active:
+                    allocation.overlapped = True
+                allocation = RequestAllocation(tracemalloc.get_traced_memory()[0])
+                allocation.overlapped = True
+            else:
+                # пик сбрасывается, только когда других замеров нет
+                tracemalloc.reset_peak()
+                allocation = RequestAllocation(tracemalloc.get_traced_memory()[0])
+            self._active.append(allocation)
+        return allocation
+
+    def finish_request(self, allocation: Optional[RequestAllocation], route: str):
+        if allocation is None or not self.tracing:
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        with self._lock:
+            if allocation in self._active:
+                self._active.remove(allocation)
+            stats = self.routes.get(route)
+            if stats is None:
+                stats = self.routes[route] = RouteAllocations()
+            if allocation.overlapped:
+                stats.overlapped += 1
+                return
+            request_peak = max(peak - allocation.start_current, 0)
+            stats.requests += 1
+            stats.peak_max = max(stats.peak_max, request_peak)
+            stats.peak_total += request_peak
+            stats.last_peak = request_peak
+            stats.retained_total += current - allocation.start_current
+        metrics.set_gauge("request_alloc_peak_bytes", request_peak, route=route)
+
+    def route_stats(self) -> List[dict]:
+        with self._lock:
+            items = [stats.to_dict(route) for route, stats in self.routes.items()]
+        items.sort(key=lambda item: item["peak_max_bytes"], reverse=True)
+        return items
+
+
+def rss_bytes() -> Optional[int]:
+    """Резидентная память процесса (Linux, /proc); None, если недоступно"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+memory_profiler = MemoryProfiler(PROFILE_MEMORY_SNAPSHOTS)
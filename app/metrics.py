@@ -0,0 +1,39 @@
+import threading
+from typing import Dict
+
+
+def _metric_key(name: str, labels: dict) -> str:
+    """Имя метрики в формате name{label=value,...}"""
+    if not labels:
+        return name
+    label_str = ",".join(f"{k}={labels[k]}" for k in sorted(labels))
+    return f"{name}{{{label_str}}}"
+
+
+class Metrics:
+    """Простой потокобезопасный реестр счетчиков и измерителей процесса"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _metric_key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        key = _metric_key(name, labels)
+        with self._lock:
+            self._gauges[key] = value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges)
+            }
+
+
+metrics = Metrics()
@@ -0,0 +1,356 @@
+"""
+Конвейер обработки запросов на чистом ASGI.
+
+В отличие от @app.middleware("http") (BaseHTTPMiddleware) здесь нет
+дополнительной задачи и обертки потока ответа на каждый запрос,
+потоковые ответы (SSE) проходят без изменений, а служебные пути
+(документация, OpenAPI) пропускаются по правилам SkipRules.
+"""
+import gzip
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Iterable, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import func
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.database import get_db
+from app import models, profiler, admission, quotas
+from app.memprofile import memory_profiler
+from app.quotas import RATE_LIMIT_WINDOW
+
+
+# Сжатие ответов: меньше порога заголовки и CPU на сжатие дороже выигрыша
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
+DOCS_SUFFIXES = ("/docs", "/docs/oauth2-redirect", "/redoc", "/openapi.json")
+# Долгоживущие потоковые ответы (SSE, загрузка файлов) не занимают слот
+# ограничителя параллельности, не сжимаются и не профилируются: открытый
+# поток пересекался бы со всеми запросами и попадал в медленные целиком
+STREAM_SUFFIXES = ("/events", "/file")
+
+
+class SkipRules:
+    """Правила пропуска путей: по префиксу и по окончанию"""
+
+    def __init__(self, prefixes: Iterable[str] = (), suffixes: Iterable[str] = ()):
+        self.prefixes = tuple(prefixes)
+        self.suffixes = tuple(suffixes)
+
+    def matches(self, path: str) -> bool:
+        return path.startswith(self.prefixes) or path.endswith(self.suffixes)
+
+
+def add_response_headers(send, headers: Iterable[Tuple[bytes, bytes]]):
+    """Обертка send, добавляющая заголовки в http.response.start"""
+    extra = list(headers)
+
+    async def send_with_headers(message):
+        if message["type"] == "http.response.start":
+            message["headers"] = list(message.get("headers", [])) + extra
+        await send(message)
+
+    return send_with_headers
+
+
+def check_rate_limit(client_key: str, endpoint: str, cost: int, limit: int) -> Tuple[bool, int, int]:
+    """
+    Проверка и учет запроса стоимостью cost в окне RATE_LIMIT_WINDOW.
+
+    Возвращает (разрешен ли запрос, сколько единиц осталось, Retry-After в секундах).
+    """
+    current_time = datetime.utcnow()
+    # запрос дороже всего бюджета иначе не прошел бы никогда
+    cost = min(cost, limit)
+    db = next(get_db())
+
+    try:
+        old_time = current_time - timedelta(seconds=RATE_LIMIT_WINDOW)
+        db.query(models.RateLimit).filter(
+            models.RateLimit.client_ip == client_key,
+            models.RateLimit.request_time < old_time
+        ).delete()
+
+        used = db.query(func.coalesce(func.sum(models.RateLimit.cost), 0)).filter(
+            models.RateLimit.client_ip == client_key
+        ).scalar()
+
+        if used + cost > limit:
+            # ждать, пока из окна выйдет достаточно старых запросов
+            freed = 0
+            retry_after = RATE_LIMIT_WINDOW
+            for request_time, request_cost in db.query(
+                models.RateLimit.request_time, models.RateLimit.cost
+            ).filter(
+                models.RateLimit.client_ip == client_key
+            ).order_by(models.RateLimit.request_time):
+                freed += request_cost
+                if used - freed + cost <= limit:
+                    retry_after = int(RATE_LIMIT_WINDOW - (current_time - request_time).total_seconds())
+                    break
+            db.commit()
+            return False, max(limit - used, 0), max(retry_after, 1)
+
+        db.add(models.RateLimit(
+            client_ip=client_key,
+            request_time=current_time,
+            endpoint=endpoint,
+            cost=cost
+        ))
+        db.commit()
+
+        return True, limit - used - cost, 0
+    finally:
+        db.close()
+
+
+def charge_quota(scope, cost: int) -> Tuple[bool, dict]:
+    """Учесть запрос стоимостью cost в квоте клиента; (разрешен ли, заголовки X-Limit-*)"""
+    client_key, role = quotas.client_identity(scope)
+    limit = quotas.role_limit(role)
+    allowed, remaining, retry_after = check_rate_limit(client_key, scope["path"], cost, limit)
+    headers = {
+        "X-Limit-Limit": str(limit),
+        "X-Limit-Remaining": str(remaining),
+        "X-Limit-Cost": str(cost),
+    }
+    if not allowed:
+        headers["Retry-After"] = str(retry_after)
+    return allowed, headers
+
+
+def rate_limited_response(headers: dict) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": "Rate limit exceeded"},
+        headers=headers
+    )
+
+
+async def _buffer_json_body(receive):
+    """
+    Прочитать тело запроса целиком; возвращает receive, который отдает
+    его приложению заново, и разобранный JSON (None, если это не JSON).
+    """
+    messages = []
+    chunks = []
+    while True:
+        message = await receive()
+        messages.append(message)
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    try:
+        body = json.loads(b"".join(chunks))
+    except ValueError:
+        body = None
+
+    async def replay():
+        return messages.pop(0) if messages else await receive()
+
+    return replay, body
+
+
+class RateLimitMiddleware:
+    """Квоты по стоимости запросов на субъект JWT или IP клиента (app/quotas.py)"""
+
+    def __init__(self, app, skip: SkipRules = SkipRules()):
+        self.app = app
+        self.skip = skip
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.skip.matches(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        body = None
+        if quotas.needs_body(scope):
+            receive, body = await _buffer_json_body(receive)
+        try:
+            allowed, headers = charge_quota(scope, quotas.request_cost(scope, body))
+        except HTTPException as exc:
+            # БД недоступна (выключатель get_db разомкнут): 503 сразу
+            await JSONResponse(
+                status_code=exc.status_code, content={"detail": exc.detail}, headers=exc.headers
+            )(scope, receive, send)
+            return
+        if not allowed:
+            await rate_limited_response(headers)(scope, receive, send)
+            return
+
+        await self.app(scope, receive, add_response_headers(
+            send, [(name.lower().encode(), value.encode()) for name, value in headers.items()]
+        ))
+
+
+class ConcurrencyLimitMiddleware:
+    """Сброс нагрузки по адаптивному лимиту параллельности (app/admission.py)"""
+
+    def __init__(self, app, skip: SkipRules = SkipRules()):
+        self.app = app
+        self.skip = skip
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.skip.matches(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        priority = admission.classify(scope["path"], scope.get("query_string", b""))
+        if not admission.limiter.try_acquire(priority):
+            response = JSONResponse(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                content={"detail": "Server overloaded"},
+                headers={"Retry-After": str(admission.limiter.retry_after())}
+            )
+            await response(scope, receive, send)
+            return
+
+        status_code = None
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            admission.limiter.release(
+                time.perf_counter() - started,
+                failed=status_code is None or status_code >= 500
+            )
+
+
+class ProfilingMiddleware:
+    """
+    Профилирование SQL-запросов в рамках HTTP-запроса (внешний слой) и,
+    при включенной трассировке tracemalloc, выделений памяти запроса.
+    """
+
+    def __init__(self, app, skip: SkipRules = SkipRules()):
+        self.app = app
+        self.skip = skip
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.skip.matches(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        token = profiler.start_request(scope["method"], scope["path"])
+        allocation = memory_profiler.start_request()
+        status_code = None
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            memory_profiler.finish_request(allocation, profiler.route_path(scope) or "unmatched")
+            profiler.finish_request(token, scope, status_code)
+
+
+@lru_cache(maxsize=1)
+def brotli_available() -> bool:
+    try:
+        import brotli  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """br (если установлен brotli) или gzip из Accept-Encoding; None - без сжатия"""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        name, _, value = params.strip().partition("=")
+        if name == "q":
+            try:
+                q = float(value)
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip()] = q
+    if accepted.get("br", 0) > 0 and brotli_available():
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        import brotli
+        return brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=COMPRESSION_GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    """
+    Сжатие gzip/brotli ответов больше COMPRESSION_MIN_SIZE.
+
+    Сжимаются ответы, переданные одним сообщением (JSON, MessagePack);
+    потоковые ответы и уже сжатые тела проходят без изменений.
+    """
+
+    def __init__(self, app, skip: SkipRules = SkipRules()):
+        self.app = app
+        self.skip = skip
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.skip.matches(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start_message["headers"])
+            if (
+                message.get("more_body")
+                or len(body) < COMPRESSION_MIN_SIZE
+                or "content-encoding" in headers
+            ):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
@@ -1,7 +1,12 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
+from app.tenancy import DEFAULT_TENANT, TENANT_ID_LENGTH
+
+def tenant_column():
+    """Арендатор записи (app/tenancy.py)"""
+    return Column(String(TENANT_ID_LENGTH), nullable=False, default=DEFAULT_TENANT, server_default=DEFAULT_TENANT)
 
 class User(Base):
     __tablename__ = "users"
@@ -10,16 +15,27 @@ class User(Base):
     username = Column(String(50), unique=True, index=True, nullable=False)
     hashed_password = Column(String(255), nullable=False)
     role = Column(String(20), default="user")
+    tenant_id = tenant_column()
     created_at = Column(DateTime, default=datetime.utcnow)
 
 class Author(Base):
     __tablename__ = "authors"
     
     id = Column(Integer, primary_key=True, index=True)
+    tenant_id = tenant_column()
     name = Column(String(255), nullable=False)
     birth_year = Column(Integer, nullable=True)
     country = Column(String(100), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Денормализованные счетчики по books_v2 (queries.refresh_author_stats)
+    books_count = Column(Integer, nullable=False, default=0, server_default="0")
+    latest_book_year = Column(Integer, nullable=True)
+    
+    __table_args__ = (
+        Index("ix_authors_tenant_id_id", "tenant_id", "id"),
+        Index("ix_authors_tenant_name", "tenant_id", "name"),
+        Index("ix_authors_tenant_books_count_id", "tenant_id", "books_count", "id"),
+    )
     
     # Связь с книгами
     books_v2 = relationship("BookV2", back_populates="author")
@@ -28,24 +44,42 @@ class BookV1(Base):
     __tablename__ = "books_v1"
     
     id = Column(Integer, primary_key=True, index=True)
+    tenant_id = tenant_column()
     title = Column(String(255), nullable=False)
     author = Column(String(255), nullable=False)
     year = Column(Integer, nullable=False)
-    isbn = Column(String(20), unique=True, nullable=False)
+    isbn = Column(String(20), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_books_v1_tenant_id_id", "tenant_id", "id"),
+        Index("ix_books_v1_tenant_isbn", "tenant_id", "isbn", unique=True),
+    )
 
 class BookV2(Base):
     __tablename__ = "books_v2"
     
     id = Column(Integer, primary_key=True, index=True)
+    tenant_id = tenant_column()
     title = Column(String(255), nullable=False)
     author_id = Column(Integer, ForeignKey("authors.id"), nullable=False)
     year = Column(Integer, nullable=False)
-    isbn = Column(String(20), unique=True, nullable=False)
+    isbn = Column(String(20), nullable=False)
     pages = Column(Integer, nullable=True)
     genre = Column(String(100), nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, nullable=True, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    updated_at = Column(DateTime, nullable=True, onupdate=datetime.utcnow, index=True)
+    # ID книги в API V1: /api/v1/books - проекция строк books_v2 с v1_id
+    v1_id = Column(Integer, nullable=True)
+    
+    __table_args__ = (
+        Index("ix_books_v2_tenant_id_id", "tenant_id", "id"),
+        Index("ix_books_v2_v1_id", "v1_id", unique=True),
+        Index("ix_books_v2_tenant_v1_id", "tenant_id", "v1_id"),
+        Index("ix_books_v2_tenant_isbn", "tenant_id", "isbn", unique=True),
+        Index("ix_books_v2_tenant_genre_year", "tenant_id", "genre", "year"),
+        Index("ix_books_v2_tenant_author_id_id", "tenant_id", "author_id", "id"),
+    )
     
     # Связь с автором
     author = relationship("Author", back_populates="books_v2")
@@ -63,6 +97,41 @@ class RateLimit(Base):
     __tablename__ = "rate_limits"
     
     id = Column(Integer, primary_key=True, index=True)
-    client_ip = Column(String(50), index=True, nullable=False)
+    # ключ квоты: "sub:<имя пользователя>" или "ip:<адрес>" (app/quotas.py)
+    client_ip = Column(String(100), index=True, nullable=False)
     request_time = Column(DateTime, default=datetime.utcnow)
-    endpoint = Column(String(255), nullable=True)
\ No newline at end of file
+    endpoint = Column(String(255), nullable=True)
+    cost = Column(Integer, nullable=False, default=1, server_default="1")
+
+class ChangeLog(Base):
+    """Журнал изменений каталога для дельта-синхронизации (id служит водяным знаком)"""
+    __tablename__ = "change_log"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = tenant_column()
+    entity_type = Column(String(20), nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    operation = Column(String(10), nullable=False)
+    changed_at = Column(DateTime, default=datetime.utcnow, index=True)
+    
+    __table_args__ = (
+        Index("ix_change_log_tenant_id_id", "tenant_id", "id"),
+    )
+
+class Job(Base):
+    """Фоновое задание: параметры, курсор продолжения и прогресс (app/jobs.py)"""
+    __tablename__ = "jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    job_type = Column(String(50), nullable=False, index=True)
+    status = Column(String(20), nullable=False, default="pending", index=True)
+    params = Column(Text, nullable=False, default="{}")
+    state = Column(Text, nullable=False, default="{}")
+    result = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    processed = Column(Integer, nullable=False, default=0)
+    total = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
@@ -0,0 +1,24 @@
+"""
+Разбор параметров запроса вне обработчиков (ограничитель параллельности
+app/admission.py, стоимость квоты app/quotas.py) - так же, как их
+получит обработчик FastAPI.
+"""
+from typing import Optional
+from urllib.parse import parse_qsl
+
+# строки, которые pydantic принимает как True для bool-параметров (без учета регистра)
+TRUE_VALUES = frozenset(("1", "on", "t", "true", "y", "yes"))
+
+
+def query_param(query_string: bytes, name: str) -> Optional[str]:
+    """Значение параметра; из повторов обработчик получает последнее"""
+    if name.encode("latin-1") not in query_string:
+        return None
+    values = [value for key, value in parse_qsl(query_string.decode("latin-1")) if key == name]
+    return values[-1] if values else None
+
+
+def query_flag(query_string: bytes, name: str) -> bool:
+    """bool-параметр включен"""
+    value = query_param(query_string, name)
+    return value is not None and value.lower() in TRUE_VALUES
@@ -0,0 +1,161 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.metrics import metrics
+
+PROFILE_ENABLED = os.getenv("PROFILE_ENABLED", "true").lower() == "true"
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+PROFILE_RING_SIZE = int(os.getenv("PROFILE_RING_SIZE", "50"))
+PROFILE_MAX_SQL_LENGTH = 500
+
+logger = logging.getLogger("app.slow_requests")
+
+_current_profile: contextvars.ContextVar[Optional["RequestProfile"]] = contextvars.ContextVar(
+    "current_profile", default=None
+)
+
+
+class RequestProfile:
+    """Накопитель SQL-выражений и их длительности в рамках одного запроса"""
+
+    __slots__ = ("method", "path", "route", "started_at", "start", "duration_ms",
+                 "status_code", "db_time_ms", "statement_count", "statements")
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.route = None
+        self.started_at = datetime.utcnow()
+        self.start = time.perf_counter()
+        self.duration_ms = 0.0
+        self.status_code = None
+        self.db_time_ms = 0.0
+        self.statement_count = 0
+        # текст SQL -> [количество, суммарное время, максимальное время]
+        self.statements = {}
+
+    def record(self, statement: str, elapsed_ms: float):
+        self.statement_count += 1
+        self.db_time_ms += elapsed_ms
+        stats = self.statements.get(statement)
+        if stats is None:
+            self.statements[statement] = [1, elapsed_ms, elapsed_ms]
+        else:
+            stats[0] += 1
+            stats[1] += elapsed_ms
+            if elapsed_ms > stats[2]:
+                stats[2] = elapsed_ms
+
+    def to_dict(self) -> dict:
+        breakdown = sorted(self.statements.items(), key=lambda item: item[1][1], reverse=True)
+        return {
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status_code": self.status_code,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.duration_ms, 3),
+            "db_time_ms": round(self.db_time_ms, 3),
+            "statement_count": self.statement_count,
+            "statements": [
+                {
+                    "sql": sql[:PROFILE_MAX_SQL_LENGTH],
+                    "count": count,
+                    "total_ms": round(total, 3),
+                    "max_ms": round(max_ms, 3)
+                }
+                for sql, (count, total, max_ms) in breakdown
+            ]
+        }
+
+
+class SlowRequestLog:
+    """Кольцевой буфер последних медленных запросов"""
+
+    def __init__(self, size: int):
+        self._lock = threading.Lock()
+        self._items = deque(maxlen=size)
+
+    def add(self, profile: RequestProfile):
+        with self._lock:
+            self._items.append(profile)
+
+    def slowest(self, limit: int) -> list:
+        with self._lock:
+            items = list(self._items)
+        items.sort(key=lambda p: p.duration_ms, reverse=True)
+        return [p.to_dict() for p in items[:limit]]
+
+
+slow_requests = SlowRequestLog(PROFILE_RING_SIZE)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_profile.get() is not None:
+        conn.info.setdefault("profile_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile.get()
+    if profile is None:
+        return
+    starts = conn.info.get("profile_start")
+    if starts:
+        profile.record(statement, (time.perf_counter() - starts.pop()) * 1000)
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    connection = exception_context.connection
+    if connection is not None:
+        starts = connection.info.get("profile_start")
+        if starts:
+            starts.pop()
+
+
+def route_path(scope: dict) -> Optional[str]:
+    """Шаблон пути маршрута с префиксом смонтированного приложения (None - маршрут не найден)"""
+    route = scope.get("route")
+    if route is not None and getattr(route, "path", None):
+        return scope.get("root_path", "") + route.path
+    return None
+
+
+def start_request(method: str, path: str):
+    """Начать профилирование запроса; возвращает токен для finish_request"""
+    if not PROFILE_ENABLED:
+        return None
+    return _current_profile.set(RequestProfile(method, path))
+
+
+def finish_request(token, scope: dict, status_code: Optional[int]):
+    """Завершить профилирование и записать медленный запрос в лог и буфер"""
+    if token is None:
+        return
+    profile = _current_profile.get()
+    _current_profile.reset(token)
+    if profile is None:
+        return
+
+    profile.duration_ms = (time.perf_counter() - profile.start) * 1000
+    profile.status_code = status_code
+    profile.route = route_path(scope)
+
+    route_label = profile.route or "unmatched"
+    metrics.inc("sql_statements_total", profile.statement_count, route=route_label)
+    if profile.duration_ms >= SLOW_REQUEST_MS:
+        metrics.inc("slow_requests_total", route=route_label)
+        slow_requests.add(profile)
+        logger.warning("slow request %s", json.dumps(profile.to_dict(), ensure_ascii=False))
@@ -0,0 +1,120 @@
+"""
+Репозиторий горячих запросов.
+
+Выражения строятся один раз при импорте модуля с именованными
+параметрами (bindparam). На каждый вызов остается только подстановка
+значений, а скомпилированный SQL берется из кэша SQLAlchemy по ключу
+выражения - без повторной сборки цепочки db.query(...).filter(...).
+
+Выборки каталога ограничены арендатором (tenant): запись другого
+арендатора для запроса не существует.
+"""
+from sqlalchemy import select, exists, bindparam, update, func
+from sqlalchemy.orm import Session
+
+from app import models
+
+_USER_BY_USERNAME = select(models.User).where(
+    models.User.username == bindparam("username")
+).limit(1)
+
+_BOOK_V1_BY_ID = select(models.BookV1).where(
+    models.BookV1.tenant_id == bindparam("tenant"), models.BookV1.id == bindparam("id")
+)
+
+_BOOK_V2_BY_ID = select(models.BookV2).where(
+    models.BookV2.tenant_id == bindparam("tenant"), models.BookV2.id == bindparam("id")
+)
+
+# Книга V1 в проекции books_v2: строка с v1_id и имя автора
+_BOOK_V1_PROJECTION_BY_ID = select(models.BookV2, models.Author.name).join(
+    models.Author, models.Author.id == models.BookV2.author_id
+).where(
+    models.BookV2.tenant_id == bindparam("tenant"), models.BookV2.v1_id == bindparam("id")
+)
+
+_AUTHOR_BY_ID = select(models.Author).where(
+    models.Author.tenant_id == bindparam("tenant"), models.Author.id == bindparam("id")
+)
+
+_AUTHOR_EXISTS = select(exists().where(
+    models.Author.tenant_id == bindparam("tenant"), models.Author.id == bindparam("id")
+))
+
+_BOOK_V1_ISBN_EXISTS = select(exists().where(
+    models.BookV1.tenant_id == bindparam("tenant"), models.BookV1.isbn == bindparam("isbn")
+))
+
+_BOOK_V2_ISBN_EXISTS = select(exists().where(
+    models.BookV2.tenant_id == bindparam("tenant"), models.BookV2.isbn == bindparam("isbn")
+))
+
+_AUTHOR_BOOKS = select(models.BookV2.id, models.BookV2.year).where(
+    models.BookV2.tenant_id == models.Author.tenant_id,
+    models.BookV2.author_id == models.Author.id
+)
+
+_REFRESH_AUTHOR_STATS = update(models.Author).where(
+    models.Author.id.in_(bindparam("ids", expanding=True))
+).values(
+    books_count=_AUTHOR_BOOKS.with_only_columns(func.count(models.BookV2.id)).scalar_subquery(),
+    latest_book_year=_AUTHOR_BOOKS.with_only_columns(func.max(models.BookV2.year)).scalar_subquery()
+).execution_options(synchronize_session=False)
+
+_BOOK_V2_AUTHOR_IDS = select(models.BookV2.author_id).where(
+    models.BookV2.tenant_id == bindparam("tenant"),
+    models.BookV2.id.in_(bindparam("ids", expanding=True))
+).distinct()
+
+
+def user_by_username(db: Session, username: str):
+    return db.execute(_USER_BY_USERNAME, {"username": username}).scalars().first()
+
+
+def book_v1_by_id(db: Session, tenant: str, book_id: int):
+    return db.execute(_BOOK_V1_BY_ID, {"tenant": tenant, "id": book_id}).scalars().first()
+
+
+def book_v2_by_id(db: Session, tenant: str, book_id: int):
+    return db.execute(_BOOK_V2_BY_ID, {"tenant": tenant, "id": book_id}).scalars().first()
+
+
+def book_v1_projection_by_id(db: Session, tenant: str, v1_id: int):
+    """(книга V2, имя автора) по ID книги V1; None - книги нет"""
+    return db.execute(_BOOK_V1_PROJECTION_BY_ID, {"tenant": tenant, "id": v1_id}).first()
+
+
+def author_by_id(db: Session, tenant: str, author_id: int):
+    return db.execute(_AUTHOR_BY_ID, {"tenant": tenant, "id": author_id}).scalars().first()
+
+
+def author_exists(db: Session, tenant: str, author_id: int) -> bool:
+    return db.execute(_AUTHOR_EXISTS, {"tenant": tenant, "id": author_id}).scalar()
+
+
+def book_v1_isbn_exists(db: Session, tenant: str, isbn: str) -> bool:
+    return db.execute(_BOOK_V1_ISBN_EXISTS, {"tenant": tenant, "isbn": isbn}).scalar()
+
+
+def book_v2_isbn_exists(db: Session, tenant: str, isbn: str) -> bool:
+    return db.execute(_BOOK_V2_ISBN_EXISTS, {"tenant": tenant, "isbn": isbn}).scalar()
+
+
+def book_v2_author_ids(db: Session, tenant: str, book_ids) -> set:
+    """Авторы книг (до изменения, чтобы пересчитать и прежних авторов)"""
+    if not book_ids:
+        return set()
+    return set(db.execute(_BOOK_V2_AUTHOR_IDS, {"tenant": tenant, "ids": list(book_ids)}).scalars())
+
+
+def refresh_author_stats(db: Session, author_ids) -> None:
+    """
+    Пересчитать books_count и latest_book_year авторов в текущей
+    транзакции. Пересчет по индексу (tenant_id, author_id, id) вместо
+    инкремента: latest_book_year после удаления иначе не восстановить.
+    """
+    ids = [author_id for author_id in set(author_ids) if author_id is not None]
+    if ids:
+        # отложенные изменения книг (db.add / db.delete) должны попасть в подсчет
+        db.flush()
+        db.execute(_REFRESH_AUTHOR_STATS, {"ids": ids})
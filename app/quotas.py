@@ -0,0 +1,114 @@
+"""
+Квоты запросов, взвешенные по стоимости.
+
+Бюджет считается в единицах стоимости за окно RATE_LIMIT_WINDOW и
+привязан к субъекту JWT (sub), а без действительного токена - к IP.
+Роль берется из утверждения role токена (выдается при входе), лимит
+роли - из RATE_LIMIT_ROLE_LIMITS, для остальных ролей и анонимных
+клиентов - RATE_LIMIT_REQUESTS.
+
+Стоимость отражает работу БД: простой запрос - 1 единица, списки
+дороже пропорционально размеру страницы (page_size или limit, вдвое
+при include_author), выборка по ids (GET с ids или POST multi-get) - по
+числу ID, изменения данных - WRITE_COST.
+"""
+import math
+import os
+import re
+from typing import Tuple
+
+from app.params import query_flag, query_param
+from app.security import token_claims
+
+RATE_LIMIT_REQUESTS = int(os.getenv("RATE_LIMIT_REQUESTS", "10"))
+RATE_LIMIT_WINDOW = int(os.getenv("RATE_LIMIT_WINDOW", "60"))
+# Лимиты по ролям: "admin:1000,user:100"
+RATE_LIMIT_ROLE_LIMITS = {
+    role.strip(): int(limit)
+    for role, _, limit in (
+        item.partition(":") for item in os.getenv("RATE_LIMIT_ROLE_LIMITS", "").split(",") if item.strip()
+    )
+}
+# Сколько строк страницы стоят одну дополнительную единицу
+RATE_LIMIT_PAGE_COST_UNIT = int(os.getenv("RATE_LIMIT_PAGE_COST_UNIT", "25"))
+# Сколько ID выборки по списку стоят одну единицу
+RATE_LIMIT_IDS_COST_UNIT = int(os.getenv("RATE_LIMIT_IDS_COST_UNIT", "50"))
+
+WRITE_COST = 2
+
+# Списки: путь, параметр размера страницы и его значение по умолчанию
+LIST_ROUTES = (
+    (re.compile(r"/api/v1/books"), "page_size", 10),
+    (re.compile(r"/api/v2/books"), "page_size", 10),
+    (re.compile(r"/api/v2/authors"), "page_size", 10),
+    (re.compile(r"/api/v2/authors/\d+/books"), "limit", 20),
+    (re.compile(r"/api/v2/changes"), "limit", 100),
+)
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+
+
+def client_identity(scope) -> Tuple[str, str]:
+    """Ключ квоты и роль: sub из действительного JWT или IP клиента"""
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                claims = token_claims(token)
+                if claims and claims.get("sub"):
+                    return f"sub:{claims['sub']}", claims.get("role") or "user"
+            break
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}", "anonymous"
+
+
+def role_limit(role: str) -> int:
+    return RATE_LIMIT_ROLE_LIMITS.get(role, RATE_LIMIT_REQUESTS)
+
+
+def ids_cost(count: int) -> int:
+    """Стоимость выборки по списку из count ID"""
+    return max(1, math.ceil(count / RATE_LIMIT_IDS_COST_UNIT))
+
+
+def multi_get_ids(body) -> int:
+    """Число ID в теле POST multi-get (разобранный JSON); некорректное тело - 0"""
+    ids = body.get("ids") if isinstance(body, dict) else None
+    return len(ids) if isinstance(ids, list) else 0
+
+
+def request_cost(scope, body=None) -> int:
+    """
+    Стоимость запроса в единицах квоты. body - разобранное JSON-тело,
+    нужно только для POST multi-get (см. needs_body).
+    """
+    method = scope["method"]
+    path = scope["path"]
+
+    if path.endswith("/multi-get"):
+        return ids_cost(multi_get_ids(body))
+    if method in WRITE_METHODS:
+        return WRITE_COST
+    route = next((route for route in LIST_ROUTES if route[0].fullmatch(path)), None)
+    if route is None:
+        return 1
+
+    _, size_param, default_size = route
+    # параметры разбираются как в обработчике: иначе include_author=yes или
+    # повтор page_size дали бы дорогой ответ по цене дешевого
+    query_string = scope.get("query_string", b"")
+    ids = query_param(query_string, "ids")
+    if ids:
+        return ids_cost(ids.count(",") + 1)
+    try:
+        page_size = int(query_param(query_string, size_param) or default_size)
+    except ValueError:
+        page_size = default_size
+    rows_cost = math.ceil(max(page_size, 0) / RATE_LIMIT_PAGE_COST_UNIT)
+    if query_flag(query_string, "include_author"):
+        rows_cost *= 2
+    return max(1, rows_cost)
+
+
+def needs_body(scope) -> bool:
+    """Стоимость зависит от тела запроса (число ID в POST multi-get)"""
+    return scope["method"] == "POST" and scope["path"].endswith("/multi-get")
@@ -0,0 +1,427 @@
+"""
+Колоночная модель чтения books_v2 в памяти процесса.
+
+Числовые поля хранятся в массивах NumPy, жанры - кодами в словаре
+интернированных строк. Фильтры по жанру, году и автору вычисляются
+векторными масками, сортировка - по закэшированной перестановке.
+
+Модель догоняет изменения по журналу change_log, поэтому видит записи
+всех воркеров. Водяной знак - id последнего изменения, все
+предшественники которого заведомо зафиксированы (committed_prefix):
+более свежие изменения применяются сразу, но перечитываются при каждой
+синхронизации, пока не выйдут из окна CHANGE_LOG_COMMIT_LAG. Так
+изменение, зафиксированное позже изменения с большим id, не теряется.
+Если синхронизация не удается дольше READ_MODEL_MAX_LAG секунд, модель
+считается устаревшей и запрос выполняется через SQL.
+
+Модель общая для всех арендаторов: арендатор хранится кодом в
+отдельной колонке и входит в маску фильтров запроса.
+"""
+import os
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+
+from app import models
+from app.database import SessionLocal, change_log_horizon, committed_prefix
+from app.cache import list_cache
+from app.metrics import metrics
+
+READ_MODEL_ENABLED = os.getenv("READ_MODEL_ENABLED", "false").lower() == "true"
+READ_MODEL_SYNC_INTERVAL = float(os.getenv("READ_MODEL_SYNC_INTERVAL", "1"))
+READ_MODEL_MAX_LAG = float(os.getenv("READ_MODEL_MAX_LAG", "5"))
+READ_MODEL_RELOAD_THRESHOLD = int(os.getenv("READ_MODEL_RELOAD_THRESHOLD", "50000"))
+
+SOURCE_TABLES = ("books_v2", "authors")
+
+_BOOK_COLUMNS = (
+    models.BookV2.id, models.BookV2.title, models.BookV2.author_id, models.BookV2.year,
+    models.BookV2.isbn, models.BookV2.pages, models.BookV2.genre,
+    models.BookV2.created_at, models.BookV2.updated_at, models.BookV2.tenant_id,
+)
+_FETCH_CHUNK = 1000
+
+# NumPy импортируется при первой загрузке: при выключенной модели старт процесса его не ждет
+np = None
+
+
+def _import_numpy():
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+
+
+class BooksReadModel:
+    """Колоночная копия books_v2 и имен авторов"""
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self._lock = threading.RLock()
+        self.loaded = False
+        self.watermark = 0
+        self.synced_at = 0.0
+        self._seen_generation = None
+        self.size = 0
+
+    def _reset(self, capacity: int):
+        _import_numpy()
+        self.size = 0
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.author_ids = np.zeros(capacity, dtype=np.int64)
+        self.years = np.zeros(capacity, dtype=np.int16)
+        self.pages = np.full(capacity, -1, dtype=np.int32)
+        self.genres = np.full(capacity, -1, dtype=np.int32)
+        self.tenants = np.zeros(capacity, dtype=np.int32)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.titles: List[str] = []
+        self.isbns: List[str] = []
+        self.created: list = []
+        self.updated: list = []
+        self.positions = {}
+        self.genre_codes = {}
+        self.genre_names: List[str] = []
+        self.tenant_codes = {}
+        self.authors = {}
+        # id добавляются по возрастанию: порядок строк совпадает с сортировкой по id
+        self.ids_ascending = True
+        self._orders = {}
+
+    # --- загрузка и синхронизация ---
+
+    def _genre_code(self, genre: Optional[str]) -> int:
+        if genre is None:
+            return -1
+        code = self.genre_codes.get(genre)
+        if code is None:
+            code = len(self.genre_names)
+            self.genre_codes[genre] = code
+            self.genre_names.append(genre)
+        return code
+
+    def _tenant_code(self, tenant: str) -> int:
+        return self.tenant_codes.setdefault(tenant, len(self.tenant_codes))
+
+    def _grow(self, needed: int):
+        capacity = len(self.ids)
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, 1024)
+        for name, fill in (("ids", 0), ("author_ids", 0), ("years", 0),
+                           ("pages", -1), ("genres", -1), ("tenants", 0), ("alive", False)):
+            old = getattr(self, name)
+            new = np.full(new_capacity, fill, dtype=old.dtype)
+            new[:capacity] = old
+            setattr(self, name, new)
+
+    def _write_row(self, pos: int, row):
+        book_id, title, author_id, year, isbn, pages, genre, created_at, updated_at, tenant = row
+        self.ids[pos] = book_id
+        self.author_ids[pos] = author_id
+        self.years[pos] = year
+        self.pages[pos] = -1 if pages is None else pages
+        self.genres[pos] = self._genre_code(genre)
+        self.tenants[pos] = self._tenant_code(tenant)
+        self.alive[pos] = True
+        self.titles[pos] = title
+        self.isbns[pos] = isbn
+        self.created[pos] = created_at
+        self.updated[pos] = updated_at
+
+    def _upsert(self, row):
+        pos = self.positions.get(row[0])
+        if pos is None:
+            pos = self.size
+            self._grow(pos + 1)
+            if pos and row[0] < self.ids[pos - 1]:
+                self.ids_ascending = False
+            self.titles.append(None)
+            self.isbns.append(None)
+            self.created.append(None)
+            self.updated.append(None)
+            self.positions[row[0]] = pos
+            self.size += 1
+        self._write_row(pos, row)
+
+    def _delete(self, book_id: int):
+        pos = self.positions.pop(book_id, None)
+        if pos is not None:
+            self.alive[pos] = False
+
+    def _load_columns(self, rows):
+        """Построить колонки целиком из строк, упорядоченных по id"""
+        n = len(rows)
+        self._grow(n)
+        if n:
+            ids, titles, author_ids, years, isbns, pages, genres, created, updated, tenants = zip(*rows)
+            self.ids[:n] = ids
+            self.author_ids[:n] = author_ids
+            self.years[:n] = years
+            self.pages[:n] = [-1 if value is None else value for value in pages]
+            self.genres[:n] = [self._genre_code(value) for value in genres]
+            self.tenants[:n] = [self._tenant_code(value) for value in tenants]
+            self.alive[:n] = True
+            self.titles = list(titles)
+            self.isbns = list(isbns)
+            self.created = list(created)
+            self.updated = list(updated)
+            self.positions = dict(zip(ids, range(n)))
+        self.size = n
+
+    def load(self, db: Session):
+        """Полная загрузка books_v2 и авторов"""
+        started = time.perf_counter()
+        with self._lock:
+            generation = list_cache.generation(SOURCE_TABLES)
+            # водяной знак берется до чтения строк: изменения после него будут применены повторно;
+            # он останавливается перед первым изменением моложе окна фиксации
+            first_fresh = db.execute(
+                select(func.min(models.ChangeLog.id)).where(models.ChangeLog.changed_at > change_log_horizon())
+            ).scalar()
+            last_id = select(func.max(models.ChangeLog.id))
+            if first_fresh is not None:
+                last_id = last_id.where(models.ChangeLog.id < first_fresh)
+            watermark = db.execute(last_id).scalar() or 0
+            rows = db.execute(select(*_BOOK_COLUMNS).order_by(models.BookV2.id)).all()
+            authors = db.execute(select(models.Author.id, models.Author.name)).all()
+
+            self._reset(0)
+            self._load_columns(rows)
+            self.authors = dict(authors)
+            self.watermark = watermark
+            self._seen_generation = generation
+            self.synced_at = time.monotonic()
+            self.loaded = True
+
+        metrics.inc("read_model_loads_total")
+        metrics.set_gauge("read_model_rows", len(rows))
+        metrics.set_gauge("read_model_load_seconds", time.perf_counter() - started)
+
+    def warm_up(self):
+        """Загрузка при старте приложения в отдельной сессии"""
+        db = SessionLocal()
+        try:
+            self.load(db)
+        finally:
+            db.close()
+
+    def sync(self, db: Session):
+        """Применить изменения из change_log после водяного знака"""
+        with self._lock:
+            generation = list_cache.generation(SOURCE_TABLES)
+            changes = db.execute(
+                select(
+                    models.ChangeLog.id, models.ChangeLog.entity_type,
+                    models.ChangeLog.entity_id, models.ChangeLog.operation, models.ChangeLog.changed_at
+                ).where(models.ChangeLog.id > self.watermark)
+                .order_by(models.ChangeLog.id)
+                .limit(READ_MODEL_RELOAD_THRESHOLD + 1)
+            ).all()
+
+            if len(changes) > READ_MODEL_RELOAD_THRESHOLD:
+                self.load(db)
+                return
+
+            upserts, deletes, author_ids = set(), set(), set()
+            for _, entity_type, entity_id, operation, _ in changes:
+                if entity_type == "author":
+                    author_ids.add(entity_id)
+                elif operation == "delete":
+                    deletes.add(entity_id)
+                    upserts.discard(entity_id)
+                else:
+                    upserts.add(entity_id)
+                    deletes.discard(entity_id)
+
+            upserts = sorted(upserts)
+            for start in range(0, len(upserts), _FETCH_CHUNK):
+                chunk = upserts[start:start + _FETCH_CHUNK]
+                found = set()
+                for row in db.execute(select(*_BOOK_COLUMNS).where(models.BookV2.id.in_(chunk))):
+                    self._upsert(row)
+                    found.add(row[0])
+                deletes.update(set(chunk) - found)
+            for book_id in deletes:
+                self._delete(book_id)
+
+            if author_ids:
+                for author_id, name in db.execute(
+                    select(models.Author.id, models.Author.name).where(models.Author.id.in_(author_ids))
+                ):
+                    self.authors[author_id] = name
+
+            if changes:
+                # изменения в окне фиксации перечитываются при следующей синхронизации
+                committed = committed_prefix(changes)
+                if committed:
+                    self.watermark = changes[committed - 1].id
+                self._orders.clear()
+            self._seen_generation = generation
+            self.synced_at = time.monotonic()
+
+        metrics.inc("read_model_syncs_total")
+        metrics.inc("read_model_changes_applied_total", len(changes))
+
+    def ensure_fresh(self, db: Session) -> bool:
+        """Загрузить или догнать модель; False - модель устарела, нужен SQL"""
+        with self._lock:
+            try:
+                if not self.loaded:
+                    self.load(db)
+                elif (
+                    self._seen_generation != list_cache.generation(SOURCE_TABLES)
+                    or time.monotonic() - self.synced_at >= READ_MODEL_SYNC_INTERVAL
+                ):
+                    self.sync(db)
+            except Exception:
+                metrics.inc("read_model_sync_errors_total")
+            return self.loaded and time.monotonic() - self.synced_at < READ_MODEL_MAX_LAG
+
+    # --- запросы ---
+
+    def _order(self, field: str) -> "np.ndarray":
+        """Перестановка строк по полю (при равенстве - по id), кэшируется до изменения"""
+        order = self._orders.get(field)
+        if order is None:
+            n = self.size
+            if field == "id":
+                order = np.arange(n) if self.ids_ascending else np.argsort(self.ids[:n], kind="stable")
+            else:
+                column = self.years if field == "year" else self.pages
+                order = np.lexsort((self.ids[:n], column[:n]))
+            self._orders[field] = order
+        return order
+
+    def _row(self, pos: int, include_author: bool) -> dict:
+        genre_code = int(self.genres[pos])
+        pages = int(self.pages[pos])
+        author_id = int(self.author_ids[pos])
+        row = {
+            "title": self.titles[pos],
+            "author_id": author_id,
+            "year": int(self.years[pos]),
+            "isbn": self.isbns[pos],
+            "pages": None if pages < 0 else pages,
+            "genre": None if genre_code < 0 else self.genre_names[genre_code],
+            "id": int(self.ids[pos]),
+            "created_at": self.created[pos],
+            "updated_at": self.updated[pos],
+        }
+        if include_author:
+            name = self.authors.get(author_id)
+            row["author"] = {"id": author_id, "name": name} if name is not None else None
+        return row
+
+    def _mask(
+        self,
+        genre: Optional[str],
+        author_id: Optional[int],
+        year_from: Optional[int],
+        year_to: Optional[int],
+        tenant: Optional[str] = None
+    ) -> Optional["np.ndarray"]:
+        """Маска строк по фильтрам; None - неизвестный жанр или арендатор, строк нет"""
+        n = self.size
+        mask = self.alive[:n]
+        if tenant is not None:
+            code = self.tenant_codes.get(tenant)
+            if code is None:
+                return None
+            mask = mask & (self.tenants[:n] == code)
+        if genre:
+            code = self.genre_codes.get(genre)
+            if code is None:
+                return None
+            mask = mask & (self.genres[:n] == code)
+        if author_id is not None:
+            mask = mask & (self.author_ids[:n] == author_id)
+        if year_from is not None:
+            mask = mask & (self.years[:n] >= year_from)
+        if year_to is not None:
+            mask = mask & (self.years[:n] <= year_to)
+        return mask
+
+    def facet_groups(
+        self,
+        genre: Optional[str] = None,
+        author_id: Optional[int] = None,
+        year_from: Optional[int] = None,
+        year_to: Optional[int] = None,
+        tenant: Optional[str] = None
+    ) -> List[Tuple[Optional[str], int, int]]:
+        """Группы (genre, десятилетие, количество) по фильтрам, как GROUP BY в SQL"""
+        with self._lock:
+            mask = self._mask(genre, author_id, year_from, year_to, tenant)
+            if mask is None:
+                return []
+            n = self.size
+            # деление с округлением вниз: десятилетие как в SQL (app/facets.py)
+            decades = self.years[:n][mask].astype(np.int64) // 10
+            if not len(decades):
+                return []
+            # ячейка (жанр, десятилетие) - одно число, подсчет одним bincount без сортировки;
+            # код жанра -1 (нет жанра) сдвигается в 0
+            first = int(decades.min())
+            span = int(decades.max()) - first + 1
+            cells = (self.genres[:n][mask].astype(np.int64) + 1) * span + (decades - first)
+            counts = np.bincount(cells)
+            groups = []
+            for cell in np.flatnonzero(counts).tolist():
+                code, decade = divmod(cell, span)
+                genre = self.genre_names[code - 1] if code else None
+                groups.append((genre, (decade + first) * 10, int(counts[cell])))
+            return groups
+
+    def query(
+        self,
+        page: int,
+        page_size: int,
+        genre: Optional[str] = None,
+        author_id: Optional[int] = None,
+        year_from: Optional[int] = None,
+        year_to: Optional[int] = None,
+        sort: str = "id",
+        include_author: bool = False,
+        tenant: Optional[str] = None
+    ) -> Tuple[List[dict], int]:
+        """Страница книг и общее количество по фильтрам (tenant=None - все арендаторы)"""
+        with self._lock:
+            mask = self._mask(genre, author_id, year_from, year_to, tenant)
+            if mask is None:
+                return [], 0
+
+            order = self._order(sort.lstrip("-"))
+            if sort.startswith("-"):
+                order = order[::-1]
+            offset = (page - 1) * page_size
+            positions = self._page_positions(order, mask, offset + page_size)[offset:]
+            items = [self._row(int(pos), include_author) for pos in positions]
+            return items, int(np.count_nonzero(mask))
+
+    @staticmethod
+    def _page_positions(order: "np.ndarray", mask: "np.ndarray", needed: int) -> "np.ndarray":
+        """Первые needed строк перестановки, прошедших маску.
+
+        Перестановка просматривается блоками растущего размера, поэтому
+        первые страницы не требуют прохода по всей таблице.
+        """
+        found = []
+        count = 0
+        start = 0
+        chunk = max(4096, needed * 4)
+        while start < len(order) and count < needed:
+            part = order[start:start + chunk]
+            hits = part[mask[part]]
+            found.append(hits)
+            count += len(hits)
+            start += chunk
+            chunk *= 2
+        if not found:
+            return order[:0]
+        return np.concatenate(found)[:needed]
+
+
+books_read_model = BooksReadModel(READ_MODEL_ENABLED)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Any, Optional, List, Dict
 from datetime import datetime
 
 class PaginationParams(BaseModel):
@@ -17,6 +17,10 @@ class PaginatedResponse(BaseModel):
     has_next: bool = Field(..., description="Есть ли следующая страница")
     has_prev: bool = Field(..., description="Есть ли предыдущая страница")
 
+class FacetedPaginatedResponse(PaginatedResponse):
+    """Страница с фасетами: для каждого фасета - список {value, count}"""
+    facets: Dict[str, List[dict]] = Field(..., description="Количество книг по жанру и десятилетию (year)")
+
 class UserLogin(BaseModel):
     username: str
     password: str
@@ -45,6 +49,8 @@ class AuthorCreate(AuthorBase):
 class AuthorResponse(AuthorBase):
     id: int
     created_at: datetime
+    books_count: int = Field(0, description="Количество книг автора (V2)")
+    latest_book_year: Optional[int] = Field(None, description="Год последней публикации")
 
     class Config:
         from_attributes = True
@@ -73,6 +79,13 @@ class BookV1Response(BookV1Base):
     class Config:
         from_attributes = True
 
+class BookV1Update(BaseModel):
+    """Частичное обновление книги V1 (PATCH): передаются только изменяемые поля"""
+    title: Optional[str] = None
+    author: Optional[str] = None
+    year: Optional[int] = None
+    isbn: Optional[str] = None
+
 class BookV1Minimal(BaseModel):
     """Минимальная информация о книге V1"""
     id: int
@@ -101,6 +114,15 @@ class BookV2Response(BookV2Base):
     class Config:
         from_attributes = True
 
+class BookV2Update(BaseModel):
+    """Частичное обновление книги V2 (PATCH): передаются только изменяемые поля"""
+    title: Optional[str] = None
+    author_id: Optional[int] = None
+    year: Optional[int] = None
+    isbn: Optional[str] = None
+    pages: Optional[int] = None
+    genre: Optional[str] = None
+
 class BookV2Extended(BookV2Response):
     """Расширенная информация о книге с данными об авторе"""
     author: Optional[AuthorMinimal] = None
@@ -126,6 +148,22 @@ class BulkDeleteResponse(BaseModel):
     deleted_count: int = Field(..., description="Количество удаленных записей")
     failed_ids: List[int] = Field(default_factory=list, description="ID, которые не удалось удалить")
 
+class BulkUpdateRequest(BaseModel):
+    """
+    Массовое изменение жанра или автора книг V2 (внутренний API).
+    Книги выбираются по списку ID и/или по текущему жанру и автору.
+    """
+    ids: Optional[List[int]] = Field(None, description="Список ID книг")
+    where_genre: Optional[str] = Field(None, description="Текущий жанр книг")
+    where_author_id: Optional[int] = Field(None, description="Текущий автор книг")
+    genre: Optional[str] = Field(None, description="Новый жанр")
+    author_id: Optional[int] = Field(None, description="Новый автор")
+
+class BulkUpdateResponse(BaseModel):
+    """Ответ на массовое изменение"""
+    updated_count: int = Field(..., description="Количество измененных записей")
+    failed_ids: List[int] = Field(default_factory=list, description="ID из списка, которые не найдены")
+
 class StatisticsResponse(BaseModel):
     """Статистика (внутренний API)"""
     total_books_v1: int
@@ -144,3 +182,72 @@ class SystemHealthResponse(BaseModel):
     uptime: str
     rate_limit_records: int
     idempotency_records: int
+    database_checked_at: Optional[datetime] = Field(None, description="Время последней фоновой проверки БД")
+    database_latency_ms: Optional[float] = Field(None, description="Время SELECT 1 при последней проверке")
+    circuit_breaker: str = Field("closed", description="Состояние выключателя БД: closed, open или half_open")
+
+class ChangeEvent(BaseModel):
+    """Запись журнала изменений"""
+    change_id: int = Field(..., description="Порядковый номер изменения")
+    entity_type: str = Field(..., description="Тип сущности: book или author")
+    entity_id: int
+    operation: str = Field(..., description="create, update или delete")
+    changed_at: datetime
+    data: Optional[dict] = Field(None, description="Текущее состояние сущности (нет для delete)")
+
+class ChangesResponse(BaseModel):
+    """Пакет изменений с новым водяным знаком"""
+    changes: List[ChangeEvent]
+    next_since: str = Field(..., description="Токен для следующего запроса")
+    has_more: bool = Field(..., description="Есть ли еще изменения после этого пакета")
+
+class CursorPage(BaseModel):
+    """Страница с курсорной пагинацией"""
+    items: List[dict]
+    next_cursor: Optional[str] = Field(None, description="Курсор следующей страницы (нет - страница последняя)")
+    has_more: bool = Field(..., description="Есть ли еще элементы после этой страницы")
+
+class MultiGetRequest(BaseModel):
+    """Запрос нескольких сущностей по списку ID"""
+    ids: List[int] = Field(..., min_length=1, description="Список ID (не более 500)")
+    fields: Optional[str] = Field(None, description="Опциональные поля")
+    include_author: bool = Field(False, description="Включить информацию об авторе (только книги)")
+
+class MultiGetResponse(BaseModel):
+    """Найденные сущности в порядке запроса и ID, которых нет"""
+    items: List[dict]
+    missing_ids: List[int] = Field(default_factory=list, description="ID, которые не найдены")
+
+class JobResponse(BaseModel):
+    """Состояние фонового задания"""
+    id: int
+    job_type: str
+    status: str = Field(..., description="pending, running, completed или failed")
+    processed: int = Field(..., description="Сколько элементов обработано")
+    total: Optional[int] = Field(None, description="Сколько всего элементов, если известно")
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class BatchOperation(BaseModel):
+    """Подзапрос пакета: метод и путь существующего маршрута /api/v1 или /api/v2"""
+    method: str = Field(..., pattern="^(GET|POST|PUT|PATCH|DELETE)$")
+    path: str = Field(..., description="Путь с параметрами запроса, например /api/v2/books/1?fields=id,title")
+    body: Optional[Any] = Field(None, description="Тело запроса (JSON)")
+    headers: Dict[str, str] = Field(default_factory=dict, description="Дополнительные заголовки (Idempotency-Key)")
+
+class BatchRequest(BaseModel):
+    """Пакет подзапросов, выполняемых за один вызов"""
+    operations: List[BatchOperation] = Field(..., min_length=1)
+
+class BatchOperationResult(BaseModel):
+    """Результат подзапроса: статус, заголовки и тело ответа"""
+    status: int
+    headers: Dict[str, str] = Field(default_factory=dict)
+    body: Optional[Any] = None
+
+class BatchResponse(BaseModel):
+    """Результаты подзапросов в порядке операций пакета"""
+    results: List[BatchOperationResult]
@@ -0,0 +1,23 @@
+"""
+Настройки JWT, общие для обработчиков (app/main.py) и конвейера
+запросов (app/middleware.py).
+"""
+import os
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
+ALGORITHM = os.getenv("ALGORITHM", "HS256")
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+
+
+def token_claims(token: str) -> Optional[dict]:
+    """Проверенные утверждения токена; None - токен недействителен или истек"""
+    import jwt
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.PyJWTError:
+        return None
@@ -0,0 +1,74 @@
+import asyncio
+import os
+from typing import Callable, Dict, Tuple
+
+from fastapi import Request
+from starlette.concurrency import run_in_threadpool
+
+from app.metrics import metrics
+
+SINGLEFLIGHT_ENABLED = os.getenv("SINGLEFLIGHT_ENABLED", "true").lower() == "true"
+SINGLEFLIGHT_MAX_WAITERS = int(os.getenv("SINGLEFLIGHT_MAX_WAITERS", "100"))
+
+
+def request_key(request: Request) -> Tuple:
+    """
+    Нормализованный ключ запроса: версия API (root_path), путь,
+    отсортированные параметры запроса и цель маршрута чтения (get_read_db).
+    Разные fields/include_author дают разные ключи, поэтому ответы не
+    смешиваются; чтение в окне read-your-writes не присоединяется к
+    лидеру, читающему с реплики.
+    """
+    return (
+        request.scope.get("root_path", ""),
+        request.url.path,
+        tuple(sorted(request.query_params.multi_items())),
+        getattr(request.state, "db_route", "primary")
+    )
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Объединение одинаковых одновременных запросов на чтение.
+
+    Первый запрос (лидер) выполняет вычисление в пуле потоков, остальные
+    запросы с тем же ключом ждут его результата. Число ожидающих
+    ограничено: сверх лимита запрос выполняется самостоятельно.
+    """
+
+    def __init__(self, max_waiters: int, enabled: bool = True):
+        self.max_waiters = max_waiters
+        self.enabled = enabled
+        self._inflight: Dict[Tuple, _Call] = {}
+
+    async def run(self, key: Tuple, route: str, fn: Callable, *args):
+        """Результат fn(*args), общий для одновременных вызовов с ключом key; route - метка метрик"""
+        if not self.enabled:
+            return await run_in_threadpool(fn, *args)
+
+        call = self._inflight.get(key)
+        if call is not None:
+            if call.waiters < self.max_waiters:
+                call.waiters += 1
+                metrics.inc("singleflight_coalesced_total", route=route)
+                return await asyncio.shield(call.task)
+            metrics.inc("singleflight_overflow_total", route=route)
+            return await run_in_threadpool(fn, *args)
+
+        # отдельная задача: отмена лидера (обрыв соединения) не отменяет ожидающих
+        task = asyncio.ensure_future(run_in_threadpool(fn, *args))
+        self._inflight[key] = _Call(task)
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        metrics.inc("singleflight_leaders_total", route=route)
+        return await asyncio.shield(task)
+
+
+read_coalescer = SingleFlight(SINGLEFLIGHT_MAX_WAITERS, enabled=SINGLEFLIGHT_ENABLED)
@@ -0,0 +1,19 @@
+"""
+Арендаторы (филиалы библиотеки) одного развертывания.
+
+Каталог (authors, books_v1, books_v2) и журнал изменений хранят
+tenant_id; все индексы выборок начинаются с tenant_id, поэтому время
+запроса зависит от размера каталога арендатора, а не всей таблицы.
+Арендатор запроса определяется по пользователю из JWT (users.tenant_id)
+и передается в токене утверждением tenant. Внутренний API выбирает
+арендатора параметром tenant.
+"""
+import os
+
+DEFAULT_TENANT = os.getenv("DEFAULT_TENANT", "default")
+TENANT_ID_LENGTH = 50
+
+
+def user_tenant(user) -> str:
+    """Арендатор пользователя (для записей до разделения - арендатор по умолчанию)"""
+    return user.tenant_id or DEFAULT_TENANT
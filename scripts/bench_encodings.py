@@ -0,0 +1,83 @@
+"""
+Бенчмарк форматов ответа списка книг V2 (страница с include_author):
+размер тела и время кодирования для JSON, колоночного JSON и MessagePack,
+без сжатия и со сжатием gzip / brotli.
+
+Подготовка объекта (jsonable_encoder) общая для всех форматов и
+выводится отдельно, время кодирования - сериализация подготовленного объекта.
+
+Запуск: python scripts/bench_encodings.py [размер страницы] [количество итераций]
+"""
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+
+from app import schemas
+from app.encoding import encode, MEDIA_JSON, MEDIA_COLUMNAR, MEDIA_MSGPACK
+from app.middleware import compress, brotli_available
+
+GENRES = ["fiction", "science", "history", "poetry", "drama"]
+
+
+def make_page(page_size: int) -> schemas.PaginatedResponse:
+    now = datetime(2026, 1, 1)
+    items = []
+    for i in range(1, page_size + 1):
+        items.append({
+            "title": f"Book title number {i}",
+            "author_id": i % 40 + 1,
+            "year": 1950 + i % 70,
+            "isbn": f"978-{i:010d}",
+            "pages": 100 + i * 7 % 900,
+            "genre": GENRES[i % len(GENRES)],
+            "id": i,
+            "created_at": now + timedelta(minutes=i),
+            "updated_at": None,
+            "author": {"id": i % 40 + 1, "name": f"Author {i % 40 + 1}"},
+        })
+    return schemas.PaginatedResponse(
+        items=items, total=10_000, page=1, page_size=page_size,
+        total_pages=10_000 // page_size, has_next=True, has_prev=False
+    )
+
+
+def measure(fn, count: int) -> float:
+    """Среднее время вызова в микросекундах"""
+    fn()
+    start = time.perf_counter()
+    for _ in range(count):
+        fn()
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def main(page_size: int, count: int):
+    page = make_page(page_size)
+    encodings = ["identity", "gzip"] + (["br"] if brotli_available() else [])
+
+    data = jsonable_encoder(page)
+    prepare_us = measure(lambda: jsonable_encoder(page), count)
+
+    print(f"Страница: {page_size} книг с автором, {count} итераций")
+    print(f"Подготовка (jsonable_encoder): {prepare_us:.1f} мкс\n")
+    print(f"{'Формат':22} {'сжатие':>8} {'байт':>8} {'кодир., мкс':>12} {'сжатие, мкс':>12}")
+    for name, media in (("JSON", MEDIA_JSON), ("колоночный JSON", MEDIA_COLUMNAR), ("MessagePack", MEDIA_MSGPACK)):
+        body = encode(data, media)
+        encode_us = measure(lambda: encode(data, media), count)
+        for encoding in encodings:
+            if encoding == "identity":
+                size, compress_us = len(body), 0.0
+            else:
+                size = len(compress(body, encoding))
+                compress_us = measure(lambda: compress(body, encoding), count)
+            print(f"{name:22} {encoding:>8} {size:8d} {encode_us:12.1f} {compress_us:12.1f}")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 100,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    )
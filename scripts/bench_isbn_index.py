@@ -0,0 +1,125 @@
+"""
+Индекс занятых ISBN: память и точность фильтра Блума на объеме,
+стоимость проверки ISBN перед вставкой с индексом и без него.
+
+1. Фильтр на N ключей (по умолчанию 10 млн) с емкостью N: размер,
+   время загрузки пачками, доля ложных срабатываний на отсутствующих
+   ключах и время одной проверки. Для сравнения - память точного
+   множества ключей (set из bytes), измеренная tracemalloc на выборке
+   и пересчитанная на N.
+2. Импорт книг V2 в SQLite с уже загруженной таблицей: проверка
+   SELECT перед каждой вставкой против проверки через индекс (промах
+   фильтра - без запроса).
+
+Запуск: DATABASE_URL=sqlite:// python scripts/bench_isbn_index.py [ключей в фильтре] [строк в таблице] [вставок]
+"""
+import sys
+import os
+import time
+import tracemalloc
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app import models, queries
+from app.isbn_index import BloomFilter, IsbnIndex, index_key, ISBN_INDEX_FP_RATE
+
+TENANTS = ["default", "acme"]
+LOAD_CHUNK = 50_000
+SET_SAMPLE = 1_000_000
+PROBES = 200_000
+
+
+def isbn(i: int) -> str:
+    return f"978-{i:010d}"
+
+
+def key(i: int) -> bytes:
+    return index_key(TENANTS[i % len(TENANTS)], isbn(i))
+
+
+def bench_filter(keys: int):
+    bloom = BloomFilter(keys, ISBN_INDEX_FP_RATE)
+    start = time.perf_counter()
+    for offset in range(0, keys, LOAD_CHUNK):
+        bloom.add_many([key(i) for i in range(offset, min(offset + LOAD_CHUNK, keys))])
+    load_seconds = time.perf_counter() - start
+
+    absent = [key(i) for i in range(keys, keys + PROBES)]
+    start = time.perf_counter()
+    false_positives = sum(1 for item in absent if item in bloom)
+    lookup_us = (time.perf_counter() - start) / PROBES * 1e6
+    missing = sum(1 for i in range(0, keys, max(1, keys // PROBES)) if key(i) not in bloom)
+
+    tracemalloc.start()
+    sample = min(keys, SET_SAMPLE)
+    exact = {key(i) for i in range(sample)}
+    set_bytes = tracemalloc.get_traced_memory()[0] / sample * keys
+    tracemalloc.stop()
+    del exact
+
+    print(f"Фильтр Блума на {keys:,} ключей, целевая доля ложных срабатываний {ISBN_INDEX_FP_RATE}")
+    print(f"  бит: {bloom.size:,}, хешей: {bloom.hashes}, память: {bloom.nbytes / 2 ** 20:.1f} МиБ "
+          f"({bloom.nbytes * 8 / keys:.1f} бит на ключ), заполнено {bloom.fill_ratio():.1%} бит")
+    print(f"  загрузка: {load_seconds:.1f} с ({keys / load_seconds:,.0f} ключей/с)")
+    print(f"  проверка: {lookup_us:.2f} мкс, ложных срабатываний {false_positives / PROBES:.3%} "
+          f"на {PROBES:,} отсутствующих ключах, пропущено присутствующих: {missing}")
+    print(f"Точное множество (set из bytes) на {keys:,} ключей: ~{set_bytes / 2 ** 20:,.0f} МиБ "
+          f"(по выборке {sample:,})")
+
+
+def bench_import(rows: int, inserts: int):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    author = models.Author(name="Author", tenant_id=TENANTS[0])
+    db.add(author)
+    db.flush()
+    for offset in range(0, rows, LOAD_CHUNK):
+        db.execute(insert(models.BookV2), [
+            {"title": f"Book {i}", "author_id": author.id, "year": 2000, "isbn": isbn(i), "tenant_id": TENANTS[0]}
+            for i in range(offset, min(offset + LOAD_CHUNK, rows))
+        ])
+    db.commit()
+
+    index = IsbnIndex(True, ISBN_INDEX_FP_RATE, rows)
+    bloom = BloomFilter(rows * 2, ISBN_INDEX_FP_RATE)
+    bloom.add_many([index_key(TENANTS[0], isbn(i)) for i in range(rows)])
+    index.filters["books_v2"], index.stale["books_v2"] = bloom, 0
+
+    print(f"\nИмпорт {inserts:,} новых книг V2 в таблицу из {rows:,} строк (SQLite в памяти, вставка + commit)")
+    print(f"{'проверка':12} {'всего, с':>9} {'на книгу, мкс':>14} {'проверка, мкс':>14} {'SELECT':>8}")
+    for name, with_index in (("SELECT", False), ("индекс", True)):
+        first = rows + (inserts if with_index else 0)
+        selects = check_seconds = 0
+        start = time.perf_counter()
+        for i in range(first, first + inserts):
+            check_start = time.perf_counter()
+            if with_index:
+                exists = index.might_contain("books_v2", TENANTS[0], isbn(i)) is not False
+            else:
+                exists = True
+            if exists:
+                selects += 1
+                exists = queries.book_v2_isbn_exists(db, TENANTS[0], isbn(i))
+            check_seconds += time.perf_counter() - check_start
+            if exists:
+                continue
+            db.add(models.BookV2(title="New", author_id=author.id, year=2001, isbn=isbn(i), tenant_id=TENANTS[0]))
+            db.commit()
+            if with_index:
+                index.add("books_v2", TENANTS[0], isbn(i))
+        seconds = time.perf_counter() - start
+        print(f"{name:12} {seconds:9.2f} {seconds / inserts * 1e6:14.1f} "
+              f"{check_seconds / inserts * 1e6:14.1f} {selects:8,}")
+    db.close()
+
+
+if __name__ == "__main__":
+    bench_filter(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000)
+    bench_import(
+        int(sys.argv[2]) if len(sys.argv) > 2 else 200_000,
+        int(sys.argv[3]) if len(sys.argv) > 3 else 5_000
+    )
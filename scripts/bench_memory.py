@@ -0,0 +1,140 @@
+"""
+Память запросов списков с page_size=100: пик выделений за запрос
+и рост памяти процесса на серии запросов (tracemalloc, app/memprofile.py).
+
+Запросы выполняются последовательно через TestClient в одном цикле
+событий (как в воркере), поэтому замеры не пересекаются; фоновая
+проверка БД на время замера не запускается. Кэш списков по умолчанию выключен (LIST_CACHE_ENABLED),
+и каждый запрос проходит весь путь: SQL, объекты ORM, схемы Pydantic,
+кодирование ответа. Страницы перебираются по кругу.
+
+Проверки (код выхода 1 при нарушении):
+- пик выделений любого запроса маршрута не больше бюджета на запрос;
+- после прогрева память, оставшаяся занятой после серии запросов, на
+  запрос не больше RETAINED_BUDGET (нет накопления между запросами).
+
+Запуск: python scripts/bench_memory.py [количество запросов на маршрут] [бюджет пика на запрос, КиБ]
+"""
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "bench_memory.db")
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + DB_PATH)
+os.environ.setdefault("LIST_CACHE_ENABLED", "false")
+os.environ.setdefault("RATE_LIMIT_REQUESTS", "1000000")
+os.environ.setdefault("DB_HEALTH_INTERVAL", "3600")
+
+import gc
+import tracemalloc
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+from app.database import Base, engine, SessionLocal
+from app import models
+from app import main as app_main
+from app.memprofile import memory_profiler
+
+BOOKS = 20_000
+AUTHORS = 500
+PAGE_SIZE = 100
+WARM_UP = 20
+GENRES = ["fiction", "science", "history", "poetry", "drama"]
+# допустимый остаток памяти на запрос после серии (байт)
+RETAINED_BUDGET = 1024
+
+ROUTES = [
+    ("/api/v1/books", "/api/v1/books?page={page}&page_size=100"),
+    ("/api/v2/books", "/api/v2/books?page={page}&page_size=100"),
+    ("/api/v2/books", "/api/v2/books?page={page}&page_size=100&include_author=true"),
+    ("/api/v2/authors", "/api/v2/authors?page={page}&page_size=100"),
+]
+
+
+def seed():
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    now = datetime(2026, 1, 1)
+    db.add(models.User(username="bench", hashed_password="x", role="admin"))
+    db.execute(insert(models.Author), [{"name": f"Author {i}"} for i in range(1, AUTHORS + 1)])
+    db.execute(insert(models.BookV2), [
+        {
+            "title": f"Book title number {i}", "author_id": i % AUTHORS + 1, "year": 1950 + i % 70,
+            "isbn": f"978-{i:010d}", "pages": 100 + i * 7 % 900, "genre": GENRES[i % len(GENRES)],
+            "created_at": now + timedelta(minutes=i),
+        }
+        for i in range(1, BOOKS + 1)
+    ])
+    db.execute(insert(models.BookV1), [
+        {
+            "title": f"Book title number {i}", "author": f"Author {i % AUTHORS + 1}",
+            "year": 1950 + i % 70, "isbn": f"978-{i:010d}", "created_at": now + timedelta(minutes=i),
+        }
+        for i in range(1, BOOKS + 1)
+    ])
+    db.commit()
+    db.close()
+
+
+def run(client: TestClient, headers: dict, url: str, count: int, first_page: int = 1):
+    pages = BOOKS // PAGE_SIZE
+    for i in range(count):
+        response = client.get(url.format(page=(first_page + i) % pages + 1), headers=headers)
+        assert response.status_code == 200, (url, response.status_code)
+
+
+def main(requests: int, budget_kib: int):
+    seed()
+    with TestClient(app_main.app) as client:
+        measure(client, requests, budget_kib)
+
+
+def measure(client: TestClient, requests: int, budget_kib: int):
+    headers = {"Authorization": f"Bearer {app_main.create_access_token({'sub': 'bench'})}"}
+    budget = budget_kib * 1024
+    failures = []
+
+    print(f"{BOOKS} книг, page_size={PAGE_SIZE}, {requests} запросов на маршрут, кэш списков: "
+          f"{os.environ['LIST_CACHE_ENABLED']}, бюджет пика {budget_kib} КиБ на запрос\n")
+    print(f"{'запрос':62} {'пик max, КиБ':>13} {'пик avg, КиБ':>13} {'остаток/запрос, Б':>18}")
+    for route, url in ROUTES:
+        # прогрев: ленивые импорты, кэши SQLAlchemy и Pydantic до начала замера
+        run(client, headers, url, WARM_UP)
+        memory_profiler.stop()
+        memory_profiler.start(1)
+        gc.collect()
+        before = tracemalloc.get_traced_memory()[0]
+        run(client, headers, url, requests, WARM_UP)
+        # циклический мусор не считается удержанной памятью
+        gc.collect()
+        retained = (tracemalloc.get_traced_memory()[0] - before) / requests
+        stats = next(item for item in memory_profiler.route_stats() if item["route"] == route)
+        print(f"{url.format(page='N'):62} {stats['peak_max_bytes'] / 1024:13.1f} "
+              f"{stats['peak_avg_bytes'] / 1024:13.1f} {retained:18.0f}")
+        if stats["peak_max_bytes"] > budget:
+            failures.append(f"{url}: пик {stats['peak_max_bytes']} Б больше бюджета {budget} Б")
+        if retained > RETAINED_BUDGET:
+            failures.append(f"{url}: остаток {retained:.0f} Б на запрос больше {RETAINED_BUDGET} Б")
+
+    top = memory_profiler.top(5)
+    memory_profiler.stop()
+    print("\nКрупнейшие живые выделения после серии последнего маршрута:")
+    for item in top["top"]:
+        print(f"  {item['size_bytes'] / 1024:9.1f} КиБ  {item['count']:6} блоков  {item['site']}")
+
+    if failures:
+        print("\nНарушения:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("\nПамять запросов в пределах бюджета")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 2048
+    )
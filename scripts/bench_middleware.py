@@ -0,0 +1,117 @@
+"""
+Микробенчмарк накладных расходов middleware на один запрос.
+
+Сравнивает голое приложение, пустой BaseHTTPMiddleware
+(@app.middleware("http")) и ASGI-слои из app/middleware.py.
+База данных не используется: измеряется только стоимость конвейера.
+
+Запуск: python scripts/bench_middleware.py [количество запросов]
+"""
+import sys
+import os
+import asyncio
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from starlette.applications import Starlette
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from app.middleware import (
+    ProfilingMiddleware, RateLimitMiddleware, SkipRules, DOCS_SUFFIXES, add_response_headers
+)
+
+
+async def endpoint(request):
+    return PlainTextResponse("ok")
+
+
+def make_app():
+    return Starlette(routes=[Route("/books", endpoint), Route("/docs", endpoint)])
+
+
+class HeaderMiddleware:
+    """Пустой ASGI-слой, добавляющий один заголовок"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        await self.app(scope, receive, add_response_headers(send, [(b"x-test", b"1")]))
+
+
+async def noop_http_middleware(request, call_next):
+    return await call_next(request)
+
+
+def build_variants():
+    base_http = make_app()
+    base_http.add_middleware(BaseHTTPMiddleware, dispatch=noop_http_middleware)
+
+    asgi_headers = make_app()
+    asgi_headers.add_middleware(HeaderMiddleware)
+
+    profiling = make_app()
+    profiling.add_middleware(ProfilingMiddleware, skip=SkipRules(suffixes=DOCS_SUFFIXES))
+
+    rate_limit_skipped = make_app()
+    rate_limit_skipped.add_middleware(
+        RateLimitMiddleware, skip=SkipRules(prefixes=("/internal",), suffixes=DOCS_SUFFIXES)
+    )
+
+    return [
+        ("без middleware", make_app(), "/books"),
+        ("BaseHTTPMiddleware (пустой)", base_http, "/books"),
+        ("ASGI: добавление заголовка", asgi_headers, "/books"),
+        ("ASGI: ProfilingMiddleware", profiling, "/books"),
+        ("ASGI: RateLimitMiddleware, пропуск /docs", rate_limit_skipped, "/docs"),
+    ]
+
+
+async def run_requests(app, path: str, count: int) -> float:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "root_path": "", "query_string": b"", "headers": [], "client": ("127.0.0.1", 1),
+        "server": ("testserver", 80),
+    }
+
+    never = asyncio.Event()
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for _ in range(count):
+        request_sent = False
+
+        async def receive():
+            # тело запроса один раз, дальше ожидание отключения клиента
+            nonlocal request_sent
+            if request_sent:
+                await never.wait()
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        await app(dict(scope), receive, send)
+    return time.perf_counter() - start
+
+
+async def main(count: int):
+    variants = build_variants()
+    for _, app, path in variants:
+        await run_requests(app, path, 200)
+
+    baseline = None
+    print(f"{'Вариант':45} {'мкс/запрос':>12} {'накладные':>12}")
+    for name, app, path in variants:
+        elapsed = await run_requests(app, path, count)
+        per_request = elapsed / count * 1e6
+        if baseline is None:
+            baseline = per_request
+        print(f"{name:45} {per_request:12.1f} {per_request - baseline:12.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000))
@@ -0,0 +1,79 @@
+"""
+Бенчмарк построения горячих запросов: цепочка db.query(...).filter(...)
+против заранее построенных выражений из app/queries.py.
+
+Измеряется отдельно стоимость построения выражения на стороне Python
+и полный вызов (построение + выполнение) на SQLite в памяти.
+
+Запуск: python scripts/bench_queries.py [количество итераций]
+"""
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app import models, queries
+from app.tenancy import DEFAULT_TENANT
+
+
+def measure(fn, count: int) -> float:
+    """Среднее время вызова в микросекундах"""
+    for _ in range(min(count, 500)):
+        fn()
+    start = time.perf_counter()
+    for _ in range(count):
+        fn()
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def main(count: int):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    author = models.Author(name="Author")
+    db.add(author)
+    db.flush()
+    db.add(models.User(username="admin", hashed_password="x"))
+    db.add(models.BookV2(title="Book", author_id=author.id, year=2000, isbn="978-0"))
+    db.commit()
+
+    cases = [
+        (
+            "book_v2 по id",
+            lambda: db.query(models.BookV2).filter(models.BookV2.id == 1).statement,
+            lambda: queries._BOOK_V2_BY_ID,
+            lambda: db.query(models.BookV2).filter(models.BookV2.id == 1).first(),
+            lambda: queries.book_v2_by_id(db, DEFAULT_TENANT, 1),
+        ),
+        (
+            "user по username",
+            lambda: db.query(models.User).filter(models.User.username == "admin").statement,
+            lambda: queries._USER_BY_USERNAME,
+            lambda: db.query(models.User).filter(models.User.username == "admin").first(),
+            lambda: queries.user_by_username(db, "admin"),
+        ),
+        (
+            "проверка ISBN",
+            lambda: db.query(models.BookV2).filter(models.BookV2.isbn == "978-0").statement,
+            lambda: queries._BOOK_V2_ISBN_EXISTS,
+            lambda: db.query(models.BookV2).filter(models.BookV2.isbn == "978-0").first() is not None,
+            lambda: queries.book_v2_isbn_exists(db, DEFAULT_TENANT, "978-0"),
+        ),
+    ]
+
+    print(f"{'Запрос':20} {'построение до':>14} {'после':>8} {'вызов до':>10} {'после':>8}  (мкс)")
+    for name, build_old, build_new, call_old, call_new in cases:
+        print(
+            f"{name:20} {measure(build_old, count):14.1f} {measure(build_new, count):8.2f}"
+            f" {measure(call_old, count):10.1f} {measure(call_new, count):8.1f}"
+        )
+    db.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
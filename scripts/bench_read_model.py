@@ -0,0 +1,118 @@
+"""
+Бенчмарк списка книг V2: SQL-запрос (count + страница с сортировкой)
+против колоночной модели чтения из app/read_model.py.
+
+Таблица books_v2 заполняется синтетическими данными в SQLite в памяти.
+Для модели отдельно измеряется время полной загрузки. Отдельно
+сравнивается подсчет фасетов (genre, десятилетие) из app/facets.py.
+
+Запуск: python scripts/bench_read_model.py [количество книг]
+"""
+import sys
+import os
+import time
+import random
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.read_model import BooksReadModel
+from app.facets import _sql_groups
+from app import models
+
+GENRES = ["fiction", "science", "history", "poetry", "drama", "fantasy", "biography", None]
+
+CASES = [
+    ("без фильтров", {}),
+    ("genre", {"genre": "science"}),
+    ("genre + годы, sort=-year", {"genre": "history", "year_from": 1950, "year_to": 1970, "sort": "-year"}),
+    ("author_id", {"author_id": 42}),
+    ("sort=pages, страница 500", {"sort": "pages", "page": 500}),
+]
+
+
+def fill(db, count: int):
+    authors = [{"id": i, "name": f"Author {i}"} for i in range(1, 1001)]
+    db.execute(insert(models.Author), authors)
+    now = datetime.utcnow()
+    rnd = random.Random(1)
+    batch = []
+    for i in range(1, count + 1):
+        batch.append({
+            "id": i, "title": f"Book {i}", "author_id": rnd.randint(1, 1000),
+            "year": rnd.randint(1900, 2024), "isbn": f"978-{i:010d}",
+            "pages": rnd.choice([None, rnd.randint(50, 1500)]), "genre": rnd.choice(GENRES),
+            "created_at": now,
+        })
+        if len(batch) == 50000:
+            db.execute(insert(models.BookV2), batch)
+            batch = []
+    if batch:
+        db.execute(insert(models.BookV2), batch)
+    db.commit()
+
+
+def sql_page(db, page=1, page_size=10, genre=None, author_id=None, year_from=None, year_to=None, sort="id"):
+    query = db.query(models.BookV2)
+    if genre:
+        query = query.filter(models.BookV2.genre == genre)
+    if author_id is not None:
+        query = query.filter(models.BookV2.author_id == author_id)
+    if year_from is not None:
+        query = query.filter(models.BookV2.year >= year_from)
+    if year_to is not None:
+        query = query.filter(models.BookV2.year <= year_to)
+    total = query.count()
+    column = getattr(models.BookV2, sort.lstrip("-"))
+    if sort.startswith("-"):
+        query = query.order_by(column.desc().nulls_last(), models.BookV2.id.desc())
+    else:
+        query = query.order_by(column.asc().nulls_first(), models.BookV2.id)
+    books = query.offset((page - 1) * page_size).limit(page_size).all()
+    return books, total
+
+
+def measure(fn, repeat: int) -> float:
+    """Среднее время вызова в миллисекундах"""
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main(count: int):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    print(f"Заполнение books_v2: {count} строк...")
+    fill(db, count)
+
+    model = BooksReadModel(enabled=True)
+    start = time.perf_counter()
+    model.load(db)
+    print(f"Загрузка модели: {time.perf_counter() - start:.2f} с\n")
+
+    print(f"{'Запрос':30} {'SQL, мс':>10} {'модель, мс':>12} {'ускорение':>10}")
+    for name, params in CASES:
+        sql_ms = measure(lambda: sql_page(db, **params), 3)
+        model_ms = measure(lambda: model.query(params.get("page", 1), 10, **{
+            k: v for k, v in params.items() if k != "page"
+        }), 50)
+        print(f"{name:30} {sql_ms:10.1f} {model_ms:12.3f} {sql_ms / model_ms:9.0f}x")
+
+    print(f"\n{'Фасеты':30} {'SQL, мс':>10} {'модель, мс':>12} {'ускорение':>10}")
+    for name, params in CASES[:4]:
+        filters = {k: params.get(k) for k in ("genre", "author_id", "year_from", "year_to")}
+        sql_ms = measure(lambda: _sql_groups(db, **filters), 3)
+        model_ms = measure(lambda: model.facet_groups(**filters), 20)
+        print(f"{name:30} {sql_ms:10.1f} {model_ms:12.3f} {sql_ms / model_ms:9.0f}x")
+    db.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,89 @@
+"""
+Бенчмарк холодного старта: время импорта app.main по python -X importtime.
+
+Каждый запуск - отдельный процесс, выводится медиана полного времени
+импорта и самые тяжелые модули (по собственному и накопленному времени).
+Дополнительно измеряется генерация схем OpenAPI, которую заменяет
+чтение файлов из OPENAPI_DIR.
+
+Запуск: python scripts/bench_startup.py [количество запусков]
+"""
+import sys
+import os
+import re
+import json
+import statistics
+import subprocess
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+MEASURE_OPENAPI = """
+import json, os, time
+from app.main import OPENAPI_APPS
+start = time.perf_counter()
+for api in OPENAPI_APPS.values():
+    api.openapi_schema = None
+    api.openapi()
+print(json.dumps(time.perf_counter() - start))
+"""
+
+
+def run_importtime(env) -> dict:
+    """Время импорта по модулям (мкс): имя -> (собственное, накопленное, уровень)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules[name] = (int(self_us), int(cumulative_us), len(indent) // 2)
+    return modules
+
+
+def run_python(code: str, env) -> float:
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(runs: int):
+    env = dict(os.environ)
+    # импорт не подключается к БД, но URL должен указывать на доступный драйвер
+    env.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "bench_startup.db"))
+    env["OPENAPI_DIR"] = ""
+
+    totals = []
+    samples = []
+    for _ in range(runs):
+        modules = run_importtime(env)
+        totals.append(modules["app.main"][1] / 1000)
+        samples.append(modules)
+
+    print(f"Импорт app.main: медиана {statistics.median(totals):.0f} мс, "
+          f"мин {min(totals):.0f} мс, макс {max(totals):.0f} мс ({runs} запусков)\n")
+
+    last = samples[-1]
+    print(f"{'Модуль':40} {'накопл., мс':>12} {'собств., мс':>12}")
+    top_level = [(name, data) for name, data in last.items() if data[2] <= 1]
+    for name, (self_us, cumulative_us, _) in sorted(top_level, key=lambda item: -item[1][1])[:15]:
+        print(f"{name:40} {cumulative_us / 1000:12.1f} {self_us / 1000:12.1f}")
+
+    for name in ("numpy", "jwt", "passlib.context", "bcrypt"):
+        print(f"{name} импортирован при старте: {'да' if name in last else 'нет'}")
+
+    openapi_seconds = run_python(MEASURE_OPENAPI, env)
+    print(f"\nГенерация OpenAPI всех приложений: {openapi_seconds * 1000:.0f} мс "
+          f"(при OPENAPI_DIR - чтение готовых файлов)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,136 @@
+"""
+Перенос books_v1 в books_v2 на объеме: скорость чанков задания
+backfill_books_v1, повторный (холостой) проход и сверка ответов V1.
+
+После переноса каждая книга V1 сравнивается с ее проекцией в books_v2
+по сериализованному JSON ответа (должны совпадать байт в байт), а
+страницы /api/v1/books из books_v1 и из проекции - по содержимому и
+времени построения. Часть ISBN заранее заведена в books_v2 (объединение
+с существующими книгами V2). Пауза BOOKS_V1_BACKFILL_THROTTLE в замер
+не входит.
+
+Запуск: DATABASE_URL=sqlite:// python scripts/bench_v1_projection.py [количество книг] [количество авторов]
+"""
+import sys
+import os
+import json
+import time
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import create_engine, insert, func
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app import models, schemas
+from app import main as app_main
+
+TENANTS = ["default", "acme"]
+# доля книг V1, уже существующих в books_v2 с тем же ISBN
+MERGED_SHARE = 100
+PAGE_SIZE = 100
+
+
+def seed(db, rows: int, authors: int):
+    now = datetime(2026, 1, 1)
+    db.execute(insert(models.BookV1), [
+        {
+            "title": f"Book {i}",
+            "author": f"Author {i % authors}",
+            "year": 1900 + i % 120,
+            "isbn": f"978-{i:010d}",
+            "tenant_id": TENANTS[i % len(TENANTS)],
+            "created_at": now + timedelta(seconds=i),
+        }
+        for i in range(1, rows + 1)
+    ])
+    for i in range(1, rows + 1, MERGED_SHARE):
+        author = models.Author(name=f"Author {i % authors}", tenant_id=TENANTS[i % len(TENANTS)])
+        db.add(author)
+        db.flush()
+        db.add(models.BookV2(
+            title=f"Book {i}", author_id=author.id, year=1900, isbn=f"978-{i:010d}",
+            tenant_id=author.tenant_id, created_at=now
+        ))
+    db.commit()
+
+
+def backfill(db) -> tuple:
+    """Все чанки задания подряд; (секунды, результат задания)"""
+    state, result = {}, {}
+    start = time.perf_counter()
+    while True:
+        chunk = app_main.backfill_books_v1_chunk(db, {}, state, result)
+        db.commit()
+        state, result = chunk.state, chunk.result
+        if chunk.done:
+            return time.perf_counter() - start, result
+
+
+def encoded(value) -> bytes:
+    return json.dumps(jsonable_encoder(value), separators=(",", ":")).encode()
+
+
+def verify_rows(db) -> int:
+    """Число книг V1, ответ которых из проекции отличается от ответа из books_v1"""
+    projected = {
+        book.v1_id: encoded(app_main.v1_response(book, author_name))
+        for book, author_name in db.query(models.BookV2, models.Author.name).join(
+            models.Author, models.Author.id == models.BookV2.author_id
+        ).filter(models.BookV2.v1_id.isnot(None))
+    }
+    mismatches = 0
+    for book in db.query(models.BookV1).yield_per(10_000):
+        if projected.pop(book.id, None) != encoded(schemas.BookV1Response.from_orm(book)):
+            mismatches += 1
+    return mismatches + len(projected)
+
+
+def measure_page(fn, db, tenant: str, page: int, count: int = 20) -> tuple:
+    """(среднее время страницы в мс, ответ)"""
+    result = fn(db, tenant, page, PAGE_SIZE, None)
+    start = time.perf_counter()
+    for _ in range(count):
+        fn(db, tenant, page, PAGE_SIZE, None)
+    return (time.perf_counter() - start) / count * 1000, result
+
+
+def main(rows: int, authors: int):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    seed(db, rows, authors)
+
+    print(f"books_v1: {rows} строк, {authors} авторов, {len(TENANTS)} арендатора, чанк {app_main.JOB_CHUNK_SIZE}")
+    seconds, result = backfill(db)
+    print(
+        f"Перенос: {seconds:.2f} с ({rows / seconds:,.0f} строк/с), "
+        f"перенесено {result['migrated']}, без изменений {result['unchanged']}, конфликтов {len(result['conflicts'])}"
+    )
+    seconds, result = backfill(db)
+    print(f"Повторный проход: {seconds:.2f} с, перенесено {result['migrated']}, без изменений {result['unchanged']}")
+
+    unlinked = db.query(func.count(models.BookV2.id)).filter(models.BookV2.v1_id.is_(None)).scalar()
+    print(f"Книг V2 без v1_id после переноса: {unlinked} (книги V2 с ISBN из V1 объединены с ними)")
+    print(f"Расхождений ответа книги V1: {verify_rows(db)}")
+
+    counted = db.query(func.sum(models.Author.books_count)).scalar()
+    print(f"Сумма books_count авторов: {counted}, книг V2: {db.query(func.count(models.BookV2.id)).scalar()}")
+
+    print(f"\n{'Страница':10} {'books_v1, мс':>13} {'проекция, мс':>13}  совпадает")
+    tenant = TENANTS[0]
+    last_page = (rows // len(TENANTS) + PAGE_SIZE - 1) // PAGE_SIZE
+    for page in (1, last_page // 2, last_page):
+        table_ms, table_page = measure_page(app_main.list_books_v1, db, tenant, page)
+        projection_ms, projection_page = measure_page(app_main.list_books_v1_projection, db, tenant, page)
+        same = encoded(table_page) == encoded(projection_page)
+        print(f"{page:<10} {table_ms:13.2f} {projection_ms:13.2f}  {'да' if same else 'НЕТ'}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 100_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 2_000
+    )
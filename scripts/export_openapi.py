@@ -0,0 +1,39 @@
+"""
+Генерация схем OpenAPI всех приложений в файлы при сборке образа.
+
+Для вложенных приложений в servers записывается префикс монтирования,
+как это делает FastAPI при отдаче /openapi.json под root_path.
+Приложение читает файлы из каталога OPENAPI_DIR.
+
+Запуск: python scripts/export_openapi.py [каталог, по умолчанию openapi]
+"""
+import sys
+import os
+import json
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Схемы генерируются FastAPI, а не читаются из ранее созданных файлов
+os.environ["OPENAPI_DIR"] = ""
+
+from starlette.routing import Mount
+
+from app.main import app, OPENAPI_APPS
+
+
+def main(target: str):
+    os.makedirs(target, exist_ok=True)
+    mounts = {id(route.app): route.path for route in app.routes if isinstance(route, Mount)}
+
+    for name, api in OPENAPI_APPS.items():
+        prefix = mounts.get(id(api))
+        if prefix and api.root_path_in_servers:
+            api.servers = [{"url": prefix}]
+        api.openapi_schema = None
+        path = os.path.join(target, f"{name}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(api.openapi(), f, ensure_ascii=False)
+        print(f"✓ {path}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "openapi")
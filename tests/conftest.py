@@ -0,0 +1,92 @@
+"""
+Общие фикстуры тестов: приложение на SQLite-файлах во временном каталоге.
+
+Настройки приложения читаются из окружения при импорте модулей, поэтому
+окружение задается здесь, до первого импорта app. Перед каждым тестом
+схема primary пересоздается, а состояние процесса (кэш списков, окно
+read-your-writes, выключатель БД) сбрасывается.
+
+Запуск: pytest tests/ -v
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TEST_DIR = tempfile.mkdtemp(prefix="library-tests-")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(TEST_DIR, "primary.db")
+os.environ["DATABASE_REPLICA_URLS"] = ""
+os.environ.setdefault("RATE_LIMIT_REQUESTS", "1000000")
+os.environ.setdefault("ISBN_INDEX_ENABLED", "false")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+
+from app import main as app_main  # noqa: E402
+from app import database, models  # noqa: E402
+from app.cache import list_cache  # noqa: E402
+from app.database import Base, SessionLocal, db_breaker  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fresh_state():
+    Base.metadata.drop_all(bind=database.engine)
+    Base.metadata.create_all(bind=database.engine)
+    list_cache.clear()
+    database.router._recent_writes.clear()
+    db_breaker.record_success()
+    with SessionLocal() as db:
+        db.add(models.User(username="admin", hashed_password="x", role="admin"))
+        db.add(models.User(username="reader", hashed_password="x", role="user"))
+        db.commit()
+    yield
+
+
+@pytest.fixture
+def client():
+    return TestClient(app_main.app)
+
+
+def auth(username: str) -> dict:
+    return {"Authorization": f"Bearer {app_main.create_access_token({'sub': username})}"}
+
+
+@pytest.fixture
+def admin_headers():
+    return auth("admin")
+
+
+@pytest.fixture
+def reader_headers():
+    return auth("reader")
+
+
+@pytest.fixture
+def internal_headers():
+    return {"X-Internal-API-Key": app_main.INTERNAL_API_KEY}
+
+
+@pytest.fixture
+def replica(monkeypatch):
+    """
+    Вторая SQLite-база как реплика, на которую ничего не реплицируется:
+    чтение с нее не видит записей primary. Пользователи скопированы,
+    чтобы проходила авторизация.
+    """
+    path = os.path.join(TEST_DIR, "replica.db")
+    if os.path.exists(path):
+        os.remove(path)
+    replica_engine = create_engine("sqlite:///" + path)
+    Base.metadata.create_all(bind=replica_engine)
+    with replica_engine.begin() as connection:
+        connection.execute(models.User.__table__.insert(), [
+            {"username": "admin", "hashed_password": "x", "role": "admin"},
+            {"username": "reader", "hashed_password": "x", "role": "user"},
+        ])
+    monkeypatch.setattr(database.router, "engines", [replica_engine])
+    monkeypatch.setattr(database.router, "_lag", {})
+    yield replica_engine
+    replica_engine.dispose()
@@ -0,0 +1,28 @@
+"""Классы приоритета ограничителя параллельности (app/admission.py)."""
+import pytest
+
+from app.admission import CRITICAL, LOW, NORMAL, classify
+
+
+@pytest.mark.parametrize("query", [
+    b"include_author=true", b"include_author=True", b"include_author=1", b"include_author=yes",
+    b"include_author=on", b"include_author=t", b"include_author=Y", b"page=2&include_author=TRUE",
+    b"include_author=false&include_author=1", b"include_author=%74rue",
+])
+def test_include_author_is_low(query):
+    assert classify("/api/v2/books", query) == LOW
+
+
+@pytest.mark.parametrize("query", [
+    b"", b"include_author=false", b"include_author=0", b"include_author=off",
+    b"include_author=true&include_author=no", b"xinclude_author=true", b"fields=include_author=true",
+])
+def test_without_include_author_is_normal(query):
+    assert classify("/api/v2/books", query) == NORMAL
+
+
+def test_paths():
+    assert classify("/internal/statistics", b"") == LOW
+    assert classify("/health", b"") == CRITICAL
+    assert classify("/internal/jobs", b"") == CRITICAL
+    assert classify("/", b"") == CRITICAL
@@ -0,0 +1,50 @@
+"""
+POST /api/v2/batch (app/batch.py): операции выполняются по порядку в
+сессии пакета и не берут из пула дополнительных соединений.
+"""
+from sqlalchemy import event
+
+from app.database import engine
+
+
+def run_batch(client, headers, operations):
+    response = client.post("/api/v2/batch", json={"operations": operations}, headers=headers)
+    assert response.status_code == 200
+    return response.json()["results"]
+
+
+def checkouts(client, headers, operations):
+    count = 0
+
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        nonlocal count
+        count += 1
+
+    event.listen(engine, "checkout", checkout)
+    try:
+        run_batch(client, headers, operations)
+    finally:
+        event.remove(engine, "checkout", checkout)
+    return count
+
+
+def test_reads_see_preceding_write(client, admin_headers):
+    results = run_batch(client, admin_headers, [
+        {"method": "GET", "path": "/api/v2/authors"},
+        {"method": "POST", "path": "/api/v2/authors", "body": {"name": "Author"}},
+        {"method": "GET", "path": "/api/v2/authors"},
+        {"method": "GET", "path": "/api/v2/authors/1"},
+        {"method": "GET", "path": "/api/v2/events"},
+    ])
+    assert [result["status"] for result in results] == [200, 201, 200, 200, 400]
+    assert results[0]["body"]["total"] == 0
+    assert results[2]["body"]["total"] == 1
+    assert results[3]["body"]["name"] == "Author"
+
+
+def test_reads_share_batch_connection(client, reader_headers):
+    single = checkouts(client, reader_headers, [{"method": "GET", "path": "/api/v2/authors"}])
+    many = checkouts(client, reader_headers, [
+        {"method": "GET", "path": f"/api/v2/authors?page={page}"} for page in range(1, 9)
+    ])
+    assert many == single
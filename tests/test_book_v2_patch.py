@@ -0,0 +1,47 @@
+"""
+PATCH /api/v2/books/{id}: одно UPDATE ... RETURNING и пересчет
+денормализованных счетчиков прежнего и нового автора.
+"""
+from app import models
+from app.database import SessionLocal
+
+
+def seed():
+    with SessionLocal() as db:
+        first = models.Author(name="First")
+        second = models.Author(name="Second")
+        db.add_all([first, second])
+        db.flush()
+        db.add_all([
+            models.BookV2(title="Old", author_id=first.id, year=1990, isbn="978-0000000001"),
+            models.BookV2(title="New", author_id=first.id, year=2010, isbn="978-0000000002"),
+        ])
+        db.commit()
+        return first.id, second.id
+
+
+def author_stats(client, headers, author_id):
+    author = client.get(f"/api/v2/authors/{author_id}", headers=headers).json()
+    return author["books_count"], author["latest_book_year"]
+
+
+def test_author_change_refreshes_previous_and_new_author(client, admin_headers):
+    first, second = seed()
+    # счетчики заполняются пересчетом при изменении книг
+    client.patch("/api/v2/books/1", json={"year": 1991}, headers=admin_headers)
+    assert author_stats(client, admin_headers, first) == (2, 2010)
+
+    response = client.patch("/api/v2/books/2", json={"author_id": second}, headers=admin_headers)
+    assert response.status_code == 200
+    assert response.json()["author_id"] == second
+    assert "previous_author_id" not in response.json()
+    assert author_stats(client, admin_headers, first) == (1, 1991)
+    assert author_stats(client, admin_headers, second) == (1, 2010)
+
+
+def test_unknown_author_and_missing_book(client, admin_headers):
+    first, _ = seed()
+    response = client.patch("/api/v2/books/1", json={"author_id": 999}, headers=admin_headers)
+    assert response.status_code == 400
+    response = client.patch("/api/v2/books/999", json={"author_id": first}, headers=admin_headers)
+    assert response.status_code == 404
@@ -0,0 +1,129 @@
+"""
+Перенос книг V1 в books_v2: по умолчанию V1 пишет только books_v1,
+двойная запись включается BOOKS_V1_DUAL_WRITE, после переноса заданием
+ответы /api/v1/books из проекции совпадают с ответами из books_v1 байт
+в байт.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app import main as app_main
+from app import models
+from app.cache import list_cache
+from app.database import SessionLocal, engine
+
+BOOK = {"title": "Dune", "author": "Frank Herbert", "year": 1965, "isbn": "978-0441013593"}
+
+
+def set_mode(monkeypatch, dual_write: bool, projection: bool = False):
+    monkeypatch.setattr(app_main, "BOOKS_V1_DUAL_WRITE", dual_write)
+    monkeypatch.setattr(app_main, "BOOKS_V1_PROJECTION", projection)
+    monkeypatch.setattr(app_main, "BOOKS_V1_TABLES", ("books_v2", "authors") if projection else ("books_v1",))
+    monkeypatch.setattr(
+        app_main, "BOOKS_V1_WRITE_TABLES",
+        ("books_v1", "books_v2", "authors") if dual_write or projection else ("books_v1",)
+    )
+    list_cache.clear()
+
+
+def v2_counts():
+    with SessionLocal() as db:
+        return db.query(models.BookV2).count(), db.query(models.Author).count()
+
+
+def run_backfill(chunks=None):
+    """Чанки задания переноса подряд (как их выполняет JobRunner); chunks - сколько выполнить"""
+    state, result = {}, {}
+    done = False
+    while not done and chunks != 0:
+        with SessionLocal() as db:
+            chunk = app_main.backfill_books_v1_chunk(db, {}, state, result)
+            db.commit()
+        chunk.after_commit()
+        state, result, done = chunk.state, chunk.result, chunk.done
+        chunks = None if chunks is None else chunks - 1
+    return state, result
+
+
+def test_v1_writes_do_not_touch_v2_by_default(client, admin_headers, monkeypatch):
+    set_mode(monkeypatch, dual_write=False)
+    book_id = client.post("/api/v1/books", json=BOOK, headers=admin_headers).json()["id"]
+    assert client.put(f"/api/v1/books/{book_id}", json={**BOOK, "year": 1966}, headers=admin_headers).status_code == 200
+    assert client.patch(f"/api/v1/books/{book_id}", json={"year": 1967}, headers=admin_headers).json()["year"] == 1967
+
+    assert v2_counts() == (0, 0)
+    assert client.get("/api/v2/books", headers=admin_headers).json()["total"] == 0
+    assert client.get("/api/v2/authors", headers=admin_headers).json()["total"] == 0
+    assert client.delete(f"/api/v1/books/{book_id}", headers=admin_headers).status_code == 204
+
+
+def test_v1_patch_is_single_statement(client, admin_headers, monkeypatch):
+    set_mode(monkeypatch, dual_write=False)
+    book_id = client.post("/api/v1/books", json=BOOK, headers=admin_headers).json()["id"]
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        # учет квоты и проверка токена не относятся к изменению книги
+        if "rate_limits" not in statement and "users" not in statement:
+            statements.append(statement.split()[0])
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.patch(f"/api/v1/books/{book_id}", json={"title": "Dune Messiah"}, headers=admin_headers)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert response.json()["title"] == "Dune Messiah"
+    assert statements == ["UPDATE"]
+
+
+def test_backfill_requires_dual_write(client, internal_headers, monkeypatch):
+    set_mode(monkeypatch, dual_write=False)
+    assert client.post("/internal/migrations/books-v1", headers=internal_headers).status_code == 409
+
+
+@pytest.fixture
+def legacy_books():
+    """Книги V1, записанные до переноса; одна совпадает по ISBN с книгой V2"""
+    created = datetime(2026, 1, 1)
+    with SessionLocal() as db:
+        db.add_all([
+            models.BookV1(
+                title=f"Book {i}", author=f"Author {i % 3}", year=1950 + i,
+                isbn=f"978-{i:010d}", created_at=created + timedelta(minutes=i)
+            )
+            for i in range(1, 8)
+        ])
+        author = models.Author(name="Author 1")
+        db.add(author)
+        db.flush()
+        db.add(models.BookV2(title="Book 1", author_id=author.id, year=1900, isbn="978-0000000001"))
+        db.commit()
+
+
+def test_migration_keeps_v1_responses(client, admin_headers, legacy_books, monkeypatch):
+    monkeypatch.setattr(app_main, "JOB_CHUNK_SIZE", 3)
+    set_mode(monkeypatch, dual_write=True)
+
+    run_backfill(chunks=1)
+    # изменения во время переноса записываются в обе таблицы
+    client.patch("/api/v1/books/2", json={"title": "Renamed"}, headers=admin_headers)
+    client.patch("/api/v1/books/6", json={"author": "New Author"}, headers=admin_headers)
+    client.delete("/api/v1/books/7", headers=admin_headers)
+    new_id = client.post("/api/v1/books", json=BOOK, headers=admin_headers).json()["id"]
+    _, result = run_backfill()
+    assert result["conflicts"] == []
+
+    urls = ["/api/v1/books?page_size=100", "/api/v1/books?page=2&page_size=3",
+            "/api/v1/books?fields=id,author", f"/api/v1/books/{new_id}", "/api/v1/books/2", "/api/v1/books/7"]
+    expected = [client.get(url, headers=admin_headers) for url in urls]
+    assert expected[0].json()["total"] == 7
+
+    set_mode(monkeypatch, dual_write=True, projection=True)
+    for url, before in zip(urls, expected):
+        after = client.get(url, headers=admin_headers)
+        assert (after.status_code, after.content) == (before.status_code, before.content), url
+
+    # книга V2 с тем же ISBN объединена с книгой V1, а не продублирована
+    assert v2_counts()[0] == 7
@@ -0,0 +1,50 @@
+"""
+Дельта-синхронизация GET /api/v2/changes: водяной знак не пропускает
+изменение транзакции, зафиксированной позже изменения с большим id.
+"""
+import time
+from datetime import datetime
+
+from app import database, models
+from app.database import SessionLocal
+
+
+def commit_change(change_id: int, entity_id: int, changed_at: datetime):
+    with SessionLocal() as db:
+        db.add(models.ChangeLog(
+            id=change_id, tenant_id="default", entity_type="author",
+            entity_id=entity_id, operation="delete", changed_at=changed_at
+        ))
+        db.commit()
+
+
+def poll(client, headers, since="0"):
+    body = client.get(f"/api/v2/changes?since={since}", headers=headers).json()
+    return [change["change_id"] for change in body["changes"]], body["next_since"], body["has_more"]
+
+
+def test_out_of_order_commit_is_not_skipped(client, reader_headers, monkeypatch):
+    monkeypatch.setattr(database, "CHANGE_LOG_COMMIT_LAG", 0.2)
+    # SQLite не допускает двух пишущих транзакций одновременно, поэтому
+    # порядок воспроизводится явными id: первая транзакция получила id 1
+    # при flush, вторая - id 2, а зафиксировалась вторая раньше
+    first_flushed = datetime.utcnow()
+    commit_change(2, 20, datetime.utcnow())
+    assert poll(client, reader_headers) == ([], "0", False)
+
+    commit_change(1, 10, first_flushed)
+    time.sleep(0.25)
+    assert poll(client, reader_headers) == ([1, 2], "2", False)
+
+
+def test_watermark_stops_before_fresh_rows(client, reader_headers, monkeypatch):
+    monkeypatch.setattr(database, "CHANGE_LOG_COMMIT_LAG", 60)
+    old = datetime(2026, 1, 1)
+    for change_id in (1, 2):
+        commit_change(change_id, change_id, old)
+    commit_change(3, 3, datetime.utcnow())
+    commit_change(4, 4, old)
+
+    assert poll(client, reader_headers) == ([1, 2], "2", False)
+    monkeypatch.setattr(database, "CHANGE_LOG_COMMIT_LAG", 0)
+    assert poll(client, reader_headers, "2") == ([3, 4], "4", False)
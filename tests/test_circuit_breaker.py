@@ -0,0 +1,90 @@
+"""
+Выключатель обращений к БД (CircuitBreaker) и проверка здоровья при
+отказе БД (fault_injector, app/dbhealth.py).
+"""
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main as app_main
+from app.database import CircuitBreaker, db_breaker
+from app.dbhealth import HealthSnapshot, db_health, fault_injector
+
+
+@pytest.fixture(autouse=True)
+def restore_database():
+    yield
+    fault_injector.set("")
+    db_breaker.record_success()
+    db_health.snapshot = HealthSnapshot(database="unknown")
+
+
+def test_state_transitions():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.1)
+    assert breaker.allow() and breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    time.sleep(0.12)
+    # один пробный запрос за reset_timeout
+    assert breaker.allow() and breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_failed_trial_reopens():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.1)
+    breaker.record_failure()
+    time.sleep(0.12)
+    assert breaker.allow() and breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert breaker.retry_after() >= 1
+
+
+def test_open_breaker_answers_503_with_retry_after(client, reader_headers):
+    for _ in range(db_breaker.failure_threshold):
+        db_breaker.record_failure()
+    response = client.get("/api/v2/authors/1", headers=reader_headers)
+    assert response.status_code == 503
+    assert response.json()["detail"] == "Database unavailable"
+    assert 1 <= int(response.headers["Retry-After"]) <= db_breaker.reset_timeout
+
+
+def test_connection_errors_open_breaker(reader_headers):
+    client = TestClient(app_main.app, raise_server_exceptions=False)
+    fault_injector.set("down")
+    statuses = [
+        client.get("/api/v2/authors/1", headers=reader_headers).status_code
+        for _ in range(db_breaker.failure_threshold + 1)
+    ]
+    assert db_breaker.state == CircuitBreaker.OPEN
+    # после размыкания запросы отклоняются сразу, без попытки подключения
+    assert statuses[-1] == 503
+    response = client.get("/api/v2/authors/1", headers=reader_headers)
+    assert response.status_code == 503 and "Retry-After" in response.headers
+
+
+def test_health_degraded_during_outage(client):
+    fault_injector.set("down")
+    db_health.check()
+    response = client.get("/health")
+    assert response.status_code == 200
+    assert response.json()["status"] == "degraded"
+    assert response.json()["database"].startswith("error")
+
+    fault_injector.set("")
+    for _ in range(db_breaker.failure_threshold):
+        db_breaker.record_failure()
+    # успешная фоновая проверка замыкает выключатель
+    db_health.check()
+    assert db_breaker.state == CircuitBreaker.CLOSED
+    assert client.get("/health").json()["status"] == "healthy"
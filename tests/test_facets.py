@@ -0,0 +1,38 @@
+"""
+Фасеты списка книг (app/facets.py): десятилетия из SQL и из модели
+чтения совпадают, в том числе для годов до нашей эры.
+"""
+from app import models
+from app.database import SessionLocal
+from app.facets import _sql_groups, facet_counts
+from app.read_model import BooksReadModel
+
+YEARS = (-1995, -1990, -5, 0, 5, 9, 10, 1995, 2000)
+
+
+def seed():
+    with SessionLocal() as db:
+        author = models.Author(name="Author")
+        db.add(author)
+        db.flush()
+        db.add_all([
+            models.BookV2(title=f"Book {year}", author_id=author.id, year=year, isbn=f"978-{i:010d}", genre="history")
+            for i, year in enumerate(YEARS)
+        ])
+        db.commit()
+
+
+def decades(groups):
+    return {item["value"]: item["count"] for item in facet_counts(groups, ("year",))["year"]}
+
+
+def test_decades_match_between_sql_and_read_model():
+    seed()
+    model = BooksReadModel(True)
+    with SessionLocal() as db:
+        sql = decades(_sql_groups(db, None, None, None, None, "default"))
+        model.load(db)
+    in_memory = decades(model.facet_groups(tenant="default"))
+
+    assert sql == {-2000: 1, -1990: 1, -10: 1, 0: 3, 10: 1, 1990: 1, 2000: 1}
+    assert in_memory == sql
@@ -0,0 +1,65 @@
+"""Ключи идемпотентности в пространстве арендатора и ключи до разделения по арендаторам."""
+import json
+from datetime import datetime
+
+import pytest
+
+from app import models
+from app.database import SessionLocal
+from tests.conftest import auth
+
+
+STORED = {"id": 42, "name": "Stored before tenants", "created_at": "2026-01-01T00:00:00",
+          "books_count": 0, "latest_book_year": None}
+
+
+@pytest.fixture(autouse=True)
+def branch_user():
+    with SessionLocal() as db:
+        db.add(models.User(username="branch", hashed_password="x", role="user", tenant_id="branch"))
+        db.commit()
+
+
+def store_legacy_key(key: str):
+    with SessionLocal() as db:
+        db.add(models.IdempotencyKey(
+            key=key, resource_type="author", created_at=datetime.utcnow(), response_data=json.dumps(STORED)
+        ))
+        db.commit()
+
+
+def author_count() -> int:
+    with SessionLocal() as db:
+        return db.query(models.Author).count()
+
+
+def test_repeated_key_returns_stored_response(client, admin_headers):
+    headers = {**admin_headers, "Idempotency-Key": "create-1"}
+    first = client.post("/api/v2/authors", json={"name": "Once"}, headers=headers)
+    second = client.post("/api/v2/authors", json={"name": "Once"}, headers=headers)
+    assert second.json()["id"] == first.json()["id"]
+    assert author_count() == 1
+    # тот же ключ другого арендатора - другой запрос
+    client.post("/api/v2/authors", json={"name": "Once"}, headers={**auth("branch"), "Idempotency-Key": "create-1"})
+    assert author_count() == 2
+
+
+def test_legacy_key_belongs_to_default_tenant(client, admin_headers):
+    store_legacy_key("legacy-1")
+    response = client.post(
+        "/api/v2/authors", json={"name": "Again"}, headers={**admin_headers, "Idempotency-Key": "legacy-1"}
+    )
+    assert response.json()["name"] == STORED["name"]
+    assert author_count() == 0
+
+    response = client.post(
+        "/api/v2/authors", json={"name": "Branch"}, headers={**auth("branch"), "Idempotency-Key": "legacy-1"}
+    )
+    assert response.json()["name"] == "Branch"
+    assert author_count() == 1
+
+
+def test_default_tenant_cannot_reach_other_tenant_keys(client, admin_headers):
+    store_legacy_key("branch:create-1")
+    client.post("/api/v2/authors", json={"name": "Default"}, headers={**admin_headers, "Idempotency-Key": "branch:create-1"})
+    assert author_count() == 1
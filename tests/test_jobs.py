@@ -0,0 +1,122 @@
+"""
+Фоновые задания (app/jobs.py): паузы между чанками без занятого потока
+и выгрузка каталога по чанкам с обновлением heartbeat.
+"""
+import json
+import threading
+import time
+
+import pytest
+
+from app import export, models
+from app.database import SessionLocal
+from app.jobs import COMPLETED, ChunkResult, JobRunner
+
+
+def wait_for(job_ids, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with SessionLocal() as db:
+            jobs = [(db.get(models.Job, job_id).status, db.get(models.Job, job_id).processed) for job_id in job_ids]
+            if all(status not in ("pending", "running") for status, _ in jobs):
+                return jobs
+        time.sleep(0.02)
+    raise AssertionError("jobs did not finish")
+
+
+def test_chunk_delay_releases_worker():
+    runner = JobRunner(workers=1)
+    finished = {}
+
+    @runner.job_type("slow")
+    def slow(db, params, state, result):
+        step = state.get("step", 0) + 1
+        return ChunkResult(state={"step": step}, processed=1, done=step == 3, delay=0.3)
+
+    @runner.job_type("quick")
+    def quick(db, params, state, result):
+        finished["quick"] = time.monotonic()
+        return ChunkResult(state={}, processed=1, done=True)
+
+    try:
+        with SessionLocal() as db:
+            slow_job = runner.submit(db, "slow", {}).id
+            started = time.monotonic()
+            quick_job = runner.submit(db, "quick", {}).id
+        jobs = wait_for([slow_job, quick_job])
+        assert jobs == [(COMPLETED, 3), (COMPLETED, 1)]
+        # единственный воркер выполнил другое задание во время паузы
+        assert finished["quick"] - started < 0.3
+    finally:
+        runner.shutdown()
+
+
+def test_paused_job_returns_to_pending_on_shutdown():
+    runner = JobRunner(workers=1)
+    ran = threading.Event()
+
+    @runner.job_type("paused")
+    def paused(db, params, state, result):
+        ran.set()
+        return ChunkResult(state={}, processed=1, done=False, delay=60)
+
+    with SessionLocal() as db:
+        job = runner.submit(db, "paused", {})
+    assert ran.wait(5)
+    time.sleep(0.1)
+    runner.shutdown()
+    with SessionLocal() as db:
+        assert db.get(models.Job, job.id).status == "pending"
+
+
+@pytest.fixture
+def books():
+    with SessionLocal() as db:
+        author = models.Author(name="Author")
+        db.add(author)
+        db.flush()
+        db.add_all([
+            models.BookV2(title=f"Book {i}", author_id=author.id, year=2000 + i, isbn=f"978-{i:010d}")
+            for i in range(10)
+        ])
+        db.commit()
+
+
+def test_export_is_written_in_chunks(books, tmp_path, monkeypatch):
+    pa = pytest.importorskip("pyarrow")
+    monkeypatch.setattr(export, "EXPORT_BATCH_SIZE", 4)
+    path = str(tmp_path / "books.arrow")
+    state, chunks, summary = {}, 0, None
+    while summary is None:
+        with SessionLocal() as db:
+            state, _, summary = export.write_export_chunk(db, path, "arrow", json.loads(json.dumps(state)))
+        chunks += 1
+        # до последней порции файл не отдается
+        assert (summary is None) != (tmp_path / "books.arrow").exists()
+
+    assert chunks == 3
+    assert summary["rows"] == 10
+    table = pa.ipc.open_file(path).read_all()
+    assert table.column("id").to_pylist() == list(range(1, 11))
+    assert table.column("author_name").to_pylist() == ["Author"] * 10
+
+
+def test_export_restarts_without_open_file(books, tmp_path, monkeypatch):
+    pa = pytest.importorskip("pyarrow")
+    monkeypatch.setattr(export, "EXPORT_BATCH_SIZE", 4)
+    path = str(tmp_path / "books.parquet")
+    with SessionLocal() as db:
+        state, processed, _ = export.write_export_chunk(db, path, "parquet", {})
+    assert processed == 4
+    # процесс перезапущен: файл, который писался, потерян
+    export._discard(path)
+
+    with SessionLocal() as db:
+        state, processed, summary = export.write_export_chunk(db, path, "parquet", state)
+        # строки прошлого процесса вычитаются из прогресса
+        assert processed == 0
+        while summary is None:
+            state, _, summary = export.write_export_chunk(db, path, "parquet", state)
+    import pyarrow.parquet as pq
+    assert pq.read_table(path).column("id").to_pylist() == list(range(1, 11))
+    assert summary["rows"] == 10
@@ -0,0 +1,71 @@
+"""
+Профилирование памяти по маршрутам (app/memprofile.py): открытый поток
+событий не делает остальные запросы пересекшимися.
+"""
+import asyncio
+
+import pytest
+
+from app import main as app_main
+from app.memprofile import memory_profiler
+
+
+@pytest.fixture
+def tracing():
+    memory_profiler.start()
+    yield
+    memory_profiler.stop()
+    memory_profiler.routes.clear()
+
+
+def http_scope(path: str, headers: dict) -> dict:
+    return {
+        "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+        "client": ("testclient", 50000), "server": ("testserver", 80),
+    }
+
+
+async def call(scope, disconnected: asyncio.Event, started: asyncio.Event = None):
+    """Запрос к ASGI-приложению; клиент отключается по disconnected"""
+    body_sent = False
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            assert message["status"] == 200
+            if started is not None:
+                started.set()
+
+    await app_main.app(scope, receive, send)
+
+
+def test_open_stream_does_not_overlap_requests(tracing, reader_headers):
+    async def scenario():
+        stream_closed = asyncio.Event()
+        stream_started = asyncio.Event()
+        stream = asyncio.ensure_future(
+            call(http_scope("/api/v2/events", reader_headers), stream_closed, stream_started)
+        )
+        await asyncio.wait_for(stream_started.wait(), 5)
+
+        done = asyncio.Event()
+        done.set()
+        await call(http_scope("/api/v2/authors", reader_headers), done)
+
+        stream_closed.set()
+        await asyncio.wait_for(stream, 5)
+
+    asyncio.run(scenario())
+    routes = {item["route"]: item for item in memory_profiler.route_stats()}
+    assert routes["/api/v2/authors"]["requests"] == 1
+    assert routes["/api/v2/authors"]["overlapped"] == 0
+    assert not any(route.endswith("/events") for route in routes)
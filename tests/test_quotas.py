@@ -0,0 +1,54 @@
+"""Стоимость запросов в единицах квоты (app/quotas.py)."""
+import pytest
+
+from app import models
+from app.database import SessionLocal
+from app.quotas import WRITE_COST, request_cost
+
+
+def cost(path, query=b"", method="GET", body=None):
+    return request_cost({"method": method, "path": path, "query_string": query}, body)
+
+
+@pytest.mark.parametrize("path, query, expected", [
+    ("/api/v2/books", b"", 1),
+    ("/api/v2/books", b"page_size=100", 4),
+    ("/api/v2/books", b"page_size=100&include_author=true", 8),
+    # include_author разбирается как в обработчике и ограничителе параллельности
+    ("/api/v2/books", b"page_size=100&include_author=1", 8),
+    ("/api/v2/books", b"page_size=100&include_author=Yes", 8),
+    ("/api/v2/books", b"page_size=100&include_author=true&include_author=off", 4),
+    # из повторов параметра обработчик получает последнее значение
+    ("/api/v2/books", b"page_size=1&page_size=100", 4),
+    ("/api/v1/books", b"page_size=50", 2),
+    ("/api/v2/authors/7/books", b"", 1),
+    ("/api/v2/authors/7/books", b"limit=100", 4),
+    ("/api/v2/changes", b"", 4),
+    ("/api/v2/changes", b"limit=1000", 40),
+    ("/api/v2/books/7", b"page_size=100", 1),
+    ("/api/v2/books", b"ids=" + b",".join(str(i).encode() for i in range(120)), 3),
+])
+def test_read_cost(path, query, expected):
+    assert cost(path, query) == expected
+
+
+def test_multi_get_cost_by_id_count():
+    assert cost("/api/v2/books/multi-get", method="POST", body={"ids": [1]}) == 1
+    assert cost("/api/v2/books/multi-get", method="POST", body={"ids": list(range(500))}) == 10
+    assert cost("/api/v2/authors/multi-get", method="POST", body={"ids": list(range(51))}) == 2
+    assert cost("/api/v2/books/multi-get", method="POST", body=None) == 1
+    assert cost("/api/v2/books", method="POST") == WRITE_COST
+
+
+def test_multi_get_cost_header(client, reader_headers):
+    with SessionLocal() as db:
+        db.add_all([models.Author(name=f"Author {i}") for i in range(3)])
+        db.commit()
+    response = client.post(
+        "/api/v2/authors/multi-get", json={"ids": list(range(1, 121))}, headers=reader_headers
+    )
+    assert response.status_code == 200
+    assert response.headers["X-Limit-Cost"] == "3"
+    # тело, прочитанное ограничителем, дошло до обработчика
+    assert len(response.json()["items"]) == 3
+    assert len(response.json()["missing_ids"]) == 117
@@ -0,0 +1,65 @@
+"""
+Колоночная модель чтения (app/read_model.py): изменение, зафиксированное
+позже изменения с большим id, попадает в модель при синхронизации.
+"""
+import time
+from datetime import datetime
+
+from app import database, models
+from app.database import SessionLocal
+from app.read_model import BooksReadModel
+
+
+def commit_book(book_id: int, change_id: int, changed_at: datetime):
+    with SessionLocal() as db:
+        if db.get(models.Author, 1) is None:
+            db.add(models.Author(id=1, name="Author"))
+        db.add(models.BookV2(id=book_id, title=f"Book {book_id}", author_id=1, year=2000, isbn=f"978-{book_id:010d}"))
+        db.add(models.ChangeLog(
+            id=change_id, tenant_id="default", entity_type="book",
+            entity_id=book_id, operation="create", changed_at=changed_at
+        ))
+        db.commit()
+
+
+def model_ids(model):
+    items, _ = model.query(1, 10, tenant="default")
+    return [item["id"] for item in items]
+
+
+def test_late_commit_is_applied(monkeypatch):
+    monkeypatch.setattr(database, "CHANGE_LOG_COMMIT_LAG", 0.2)
+    model = BooksReadModel(True)
+    with SessionLocal() as db:
+        model.load(db)
+
+    # SQLite сериализует пишущие транзакции: id 1 получила первая
+    # транзакция, а зафиксировалась она после второй
+    first_flushed = datetime.utcnow()
+    commit_book(2, 2, datetime.utcnow())
+    with SessionLocal() as db:
+        model.sync(db)
+    assert model_ids(model) == [2]
+    assert model.watermark == 0
+
+    commit_book(1, 1, first_flushed)
+    with SessionLocal() as db:
+        model.sync(db)
+    assert model_ids(model) == [1, 2]
+
+    time.sleep(0.25)
+    with SessionLocal() as db:
+        model.sync(db)
+    assert model.watermark == 2
+
+
+def test_load_watermark_stops_before_fresh_changes(monkeypatch):
+    monkeypatch.setattr(database, "CHANGE_LOG_COMMIT_LAG", 60)
+    commit_book(1, 1, datetime(2026, 1, 1))
+    commit_book(2, 2, datetime.utcnow())
+    commit_book(3, 3, datetime(2026, 1, 1))
+    model = BooksReadModel(True)
+    with SessionLocal() as db:
+        model.load(db)
+    assert model.watermark == 1
+    assert model_ids(model) == [1, 2, 3]
@@ -0,0 +1,88 @@
+"""
+Маршрутизация чтений между primary и репликой (ReplicaRouter, RoutingSession).
+
+Реплика - отдельная SQLite-база без репликации, поэтому по ответу видно,
+откуда прочитаны данные: запись есть только на primary.
+"""
+import time
+
+from sqlalchemy import select
+
+from app import models
+from app.cache import list_cache
+from app.database import SessionLocal, router
+
+
+def create_author(client, headers, name="Primary Author"):
+    response = client.post("/api/v2/authors", json={"name": name}, headers=headers)
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def test_reads_go_to_replica(client, reader_headers, replica):
+    with SessionLocal() as db:
+        db.add(models.Author(name="Only on primary"))
+        db.commit()
+
+    response = client.get("/api/v2/authors/1", headers=reader_headers)
+    assert response.status_code == 404
+
+    with replica.begin() as connection:
+        connection.execute(models.Author.__table__.insert(), [{"name": "Only on replica"}])
+    response = client.get("/api/v2/authors/1", headers=reader_headers)
+    assert response.json()["name"] == "Only on replica"
+
+
+def test_writer_reads_own_writes_from_primary(client, admin_headers, reader_headers, replica, monkeypatch):
+    monkeypatch.setattr(list_cache, "enabled", False)
+    author_id = create_author(client, admin_headers)
+
+    assert client.get(f"/api/v2/authors/{author_id}", headers=admin_headers).status_code == 200
+    assert client.get("/api/v2/authors", headers=admin_headers).json()["total"] == 1
+    # другой клиент не писал и читает с реплики
+    assert client.get(f"/api/v2/authors/{author_id}", headers=reader_headers).status_code == 404
+    assert client.get("/api/v2/authors", headers=reader_headers).json()["total"] == 0
+
+
+def test_sticky_window_expires(client, admin_headers, replica, monkeypatch):
+    author_id = create_author(client, admin_headers)
+    assert client.get(f"/api/v2/authors/{author_id}", headers=admin_headers).status_code == 200
+
+    monkeypatch.setitem(router._recent_writes, admin_headers["Authorization"], time.monotonic() - 1)
+    assert client.get(f"/api/v2/authors/{author_id}", headers=admin_headers).status_code == 404
+
+
+def test_lagging_replica_is_skipped(client, reader_headers, replica, monkeypatch):
+    with SessionLocal() as db:
+        db.add(models.Author(name="Only on primary"))
+        db.commit()
+    monkeypatch.setattr(router, "_lag", {0: router.max_lag + 1})
+    monkeypatch.setattr(router, "_lag_checked_at", time.monotonic())
+
+    assert client.get("/api/v2/authors/1", headers=reader_headers).status_code == 200
+
+
+def test_writes_in_read_session_go_to_primary(replica):
+    with SessionLocal() as db:
+        db.info["replica"] = replica
+        db.add(models.Author(name="Written via read session"))
+        db.commit()
+
+    with SessionLocal() as db:
+        assert db.scalar(select(models.Author.name)) == "Written via read session"
+    with replica.connect() as connection:
+        assert connection.execute(select(models.Author.name)).first() is None
+
+
+def test_list_cache_keeps_read_your_writes(client, admin_headers, reader_headers, replica):
+    create_author(client, admin_headers)
+    # другой клиент заполняет кэш результатом с реплики, куда запись еще не дошла
+    assert client.get("/api/v2/authors", headers=reader_headers).json()["total"] == 0
+    assert client.get("/api/v2/authors", headers=admin_headers).json()["total"] == 1
+    assert client.get("/api/v2/authors", headers=reader_headers).json()["total"] == 0
+    # чтение в окне read-your-writes в кэш не попадает
+    assert len(list_cache._partitions["default"]) == 1
+
+    router._recent_writes.clear()
+    # вне окна автор читает с реплики, как все
+    assert client.get("/api/v2/authors", headers=admin_headers).json()["total"] == 0
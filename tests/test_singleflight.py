@@ -0,0 +1,111 @@
+"""
+Ключи объединения запросов (app/singleflight.py): варианты одного
+маршрута (fields, include_author) и чтения с разных целей маршрута не
+получают чужой результат ни через read_coalescer, ни через кэш списков.
+"""
+import asyncio
+import threading
+
+from starlette.requests import Request
+
+from app import models
+from app.database import SessionLocal
+from app.metrics import metrics
+from app.singleflight import SingleFlight, request_key
+
+
+def make_request(query: str, db_route=None) -> Request:
+    request = Request({
+        "type": "http", "method": "GET", "root_path": "/api/v2", "path": "/books",
+        "query_string": query.encode(), "headers": [],
+    })
+    if db_route is not None:
+        request.state.db_route = db_route
+    return request
+
+
+def seed_book():
+    with SessionLocal() as db:
+        author = models.Author(name="Author")
+        db.add(author)
+        db.flush()
+        db.add(models.BookV2(title="Book", author_id=author.id, year=2000, isbn="978-0000000001", genre="fiction"))
+        db.commit()
+
+
+def test_variant_keys_differ():
+    keys = {
+        request_key(make_request(query))
+        for query in ("", "fields=title", "fields=id", "include_author=true", "include_author=false")
+    }
+    assert len(keys) == 5
+    # порядок параметров не важен
+    assert request_key(make_request("fields=title&page=2")) == request_key(make_request("page=2&fields=title"))
+
+
+def test_route_target_in_key():
+    replica_key = request_key(make_request("fields=title", ("replica", 0)))
+    sticky_key = request_key(make_request("fields=title", ("read_your_writes", "client")))
+    assert replica_key != sticky_key
+    assert request_key(make_request("fields=title")) == request_key(make_request("fields=title", "primary"))
+
+
+def test_concurrent_variants_are_not_coalesced():
+    release = threading.Event()
+    calls = []
+
+    def compute(variant):
+        calls.append(variant)
+        release.wait(5)
+        return {"variant": variant}
+
+    async def scenario():
+        coalescer = SingleFlight(max_waiters=10)
+        requests = [
+            make_request("fields=title"),
+            make_request("fields=id"),
+            make_request("include_author=true"),
+            make_request("fields=title"),
+            make_request("fields=title", ("read_your_writes", "client")),
+        ]
+        variants = ["title", "id", "author", "title-joined", "sticky"]
+        tasks = [
+            asyncio.ensure_future(coalescer.run(request_key(request), "/api/v2/books", compute, variant))
+            for request, variant in zip(requests, variants)
+        ]
+        while len(calls) < 4:
+            await asyncio.sleep(0.01)
+        release.set()
+        return await asyncio.gather(*tasks)
+
+    results = asyncio.run(scenario())
+    # одинаковый запрос получил результат лидера, остальные вычислены отдельно
+    assert [result["variant"] for result in results] == ["title", "id", "author", "title", "sticky"]
+    assert sorted(calls) == ["author", "id", "sticky", "title"]
+
+
+def test_variant_responses_through_cache(client, reader_headers):
+    seed_book()
+
+    def first_item(query):
+        response = client.get(f"/api/v2/books?{query}", headers=reader_headers)
+        assert response.status_code == 200
+        return response.json()["items"][0]
+
+    # повторы обслуживаются из кэша и должны сохранить форму своего варианта
+    for _ in range(2):
+        assert set(first_item("fields=title")) == {"title"}
+        assert set(first_item("fields=id,year")) == {"id", "year"}
+        assert first_item("include_author=true")["author"]["name"] == "Author"
+        assert "author" not in first_item("")
+        assert "author" not in first_item("include_author=false")
+
+
+def test_metrics_labelled_with_request_path(client, reader_headers, internal_headers):
+    def leaders(route):
+        return metrics.snapshot()["counters"].get(f"singleflight_leaders_total{{route={route}}}", 0)
+
+    before = leaders("/api/v2/authors"), leaders("/internal/statistics")
+    client.get("/api/v2/authors", headers=reader_headers)
+    client.get("/internal/statistics", headers=internal_headers)
+    assert (leaders("/api/v2/authors"), leaders("/internal/statistics")) == (before[0] + 1, before[1] + 1)